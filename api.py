@@ -1,9 +1,13 @@
 from flask import Flask, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timedelta
+import base64
 import os
+import threading
 from typing import Dict, List, Optional
 
+from config import Config
+
 # Initialize Flask app
 app = Flask(__name__)
 
@@ -14,17 +18,72 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 db = SQLAlchemy(app)
 
+# Sort order of statuses by severity (worst first); applications without a scan sort last,
+# together with unreachable ones (whose TLS posture is unknown as well)
+UNKNOWN_STATUS_RANK = 3
+STATUS_RANKS = {'FAIL': 0, 'WARN': 1, 'PASS': 2, 'UNREACHABLE': UNKNOWN_STATUS_RANK}
+
 # Database Models
 class Application(db.Model):
     __tablename__ = 'applications'
+    __table_args__ = (
+        # Keyset pagination orders
+        db.Index('ix_applications_status_rank_id', 'latest_status_rank', 'id'),
+        db.Index('ix_applications_last_scan_time_id', 'last_scan_time', 'id'),
+        # Name/URL substring search (PostgreSQL, needs the pg_trgm extension)
+        db.Index('ix_applications_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_applications_url_trgm', 'url', postgresql_using='gin', postgresql_ops={'url': 'gin_trgm_ops'}),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     url = db.Column(db.String(255), nullable=False, unique=True)
     name = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Denormalized copy of the latest scan, maintained by scan_store in the transaction that saves the scan
+    latest_scan_id = db.Column(db.Integer, db.ForeignKey('scans.id', use_alter=True, name='fk_applications_latest_scan_id'))
+    latest_status = db.Column(db.String(12), index=True)  # PASS, WARN, FAIL, UNREACHABLE
+    latest_status_rank = db.Column(db.SmallInteger, nullable=False, default=UNKNOWN_STATUS_RANK)  # See STATUS_RANKS
+    latest_issue_count = db.Column(db.Integer, nullable=False, default=0)
+    last_scan_time = db.Column(db.DateTime)
+
+    # host:port actually scanned; applications sharing it are scanned once (see targets.py)
+    scan_target_id = db.Column(db.Integer, db.ForeignKey('scan_targets.id'), index=True)
+
+    # Scan cadence: the scheduler picks up applications whose next_scan_at has passed
+    scan_profile = db.Column(db.String(20), nullable=False, default=Config.DEFAULT_SCAN_PROFILE)  # See scan_profiles.py
+    scan_interval = db.Column(db.Integer, nullable=False, default=Config.DEFAULT_SCAN_INTERVAL)  # Seconds
+    next_scan_at = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     
-    scans = db.relationship('Scan', backref='application', lazy=True, cascade='all, delete-orphan')
+    scans = db.relationship('Scan', backref='application', lazy=True, cascade='all, delete-orphan',
+                            foreign_keys='Scan.application_id')
+    scan_target = db.relationship('ScanTarget', backref='applications')
+
+# The trigram indexes above need pg_trgm; create it before the tables on PostgreSQL
+db.event.listen(
+    Application.__table__, 'before_create',
+    db.DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+
+class ScanTarget(db.Model):
+    __tablename__ = 'scan_targets'
+    __table_args__ = (
+        db.UniqueConstraint('host', 'port', 'sni', name='uq_scan_targets_host_port_sni'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    host = db.Column(db.String(255), nullable=False)  # Lowercase, IDNA-encoded host name or IP address
+    port = db.Column(db.Integer, nullable=False)
+    sni = db.Column(db.String(255), nullable=False, default='')  # Server name sent in the ClientHello; empty for IP addresses
+    resolved_ips = db.Column(db.Text)  # JSON list of the addresses seen by the last fingerprint probe
+    fingerprint = db.Column(db.String(64), index=True)  # Hash of the last fingerprint probe
+    probed_at = db.Column(db.DateTime)
+    unreachable_count = db.Column(db.Integer, nullable=False, default=0)  # Consecutive failed pre-flight checks
+    unreachable_since = db.Column(db.DateTime)  # First of those failures
+    timeout_count = db.Column(db.Integer, nullable=False, default=0)  # Consecutive testssl.sh timeouts
+    circuit_open_until = db.Column(db.DateTime)  # Not scanned on schedule before then after repeated timeouts
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 import json
 
@@ -32,65 +91,202 @@ class Scan(db.Model):
     __tablename__ = 'scans'
 
     id = db.Column(db.Integer, primary_key=True)
-    application_id = db.Column(db.Integer, db.ForeignKey('applications.id'), nullable=False)
-    status = db.Column(db.String(10), nullable=False)  # PASS, WARN, FAIL
+    application_id = db.Column(db.Integer, db.ForeignKey('applications.id'), nullable=False, index=True)
+    status = db.Column(db.String(12), nullable=False)  # PASS, WARN, FAIL, UNREACHABLE (failed pre-flight check)
     started_at = db.Column(db.DateTime, nullable=False)
     completed_at = db.Column(db.DateTime)
     raw_output_path = db.Column(db.String(500))  # Optional reference to raw JSON scan output
-    detailed_ssl_info = db.Column(db.Text)  # Store detailed SSL information as JSON
+    policy_version = db.Column(db.String(64), index=True)  # Version of the policy the scan was evaluated with
+    fingerprint = db.Column(db.String(64), index=True)  # Hash of the pre-scan TLS probe (see TestSSLScanner.probe_fingerprint)
+    carried_from_scan_id = db.Column(db.Integer, db.ForeignKey('scans.id'), index=True)  # Full scan this result was copied from when the target was unchanged
+    scan_profile = db.Column(db.String(20))  # cert, policy, fast or full (NULL: fast, see scan_profiles.py)
+    scan_checks = db.Column(db.String(255))  # Space-separated testssl.sh checks run, NULL if every check ran
+    failed_policy_version = db.Column(db.String(64))  # Policy version re-evaluating the scan last failed with (see reevaluate.py)
+    split_scan = db.Column(db.Boolean, nullable=False, default=False)  # Check groups ran in parallel (see ScannerBackend.scan_url_split)
 
     findings = db.relationship('Finding', backref='scan', lazy=True, cascade='all, delete-orphan')
 
+# Large per-scan payloads, 1:1 with scans but kept off that table so scan queries stay cheap (see scan_details.py)
+class ScanDetails(db.Model):
+    __tablename__ = 'scan_details'
+
+    scan_id = db.Column(db.Integer, db.ForeignKey('scans.id'), primary_key=True)
+    summary = db.Column(db.LargeBinary)  # Compressed JSON of the entries shown before a section is opened
+    protocol_info = db.deferred(db.Column(db.LargeBinary))  # Compressed JSON of each DetailedSSLInfo section
+    cipher_info = db.deferred(db.Column(db.LargeBinary))
+    certificate_info = db.deferred(db.Column(db.LargeBinary))
+    vulnerabilities = db.deferred(db.Column(db.LargeBinary))
+    handshake_simulation = db.deferred(db.Column(db.LargeBinary))
+    misc_info = db.deferred(db.Column(db.LargeBinary))
+    raw_results = db.deferred(db.Column(db.LargeBinary))  # Compressed raw testssl.sh JSON, kept for re-evaluation
+
 class Finding(db.Model):
     __tablename__ = 'findings'
     
     id = db.Column(db.Integer, primary_key=True)
-    scan_id = db.Column(db.Integer, db.ForeignKey('scans.id'), nullable=False)
+    scan_id = db.Column(db.Integer, db.ForeignKey('scans.id'), nullable=False, index=True)
     category = db.Column(db.String(50), nullable=False)  # protocol, cipher, certificate, configuration
     severity = db.Column(db.String(10), nullable=False)  # FAIL, WARN, INFO
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     details = db.Column(db.Text)  # Additional details about the finding
 
+class ScanJob(db.Model):
+    __tablename__ = 'scan_jobs'
+    __table_args__ = (
+        db.Index('ix_scan_jobs_claim', 'status', 'run_after'),
+        # At most one active job per application, so repeated scan requests merge
+        db.Index('uq_scan_jobs_active_application', 'application_id', unique=True,
+                 postgresql_where=db.text("status IN ('QUEUED', 'RUNNING', 'RETRY')"),
+                 sqlite_where=db.text("status IN ('QUEUED', 'RUNNING', 'RETRY')")),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    application_id = db.Column(db.Integer, db.ForeignKey('applications.id'), nullable=False, index=True)
+    status = db.Column(db.String(10), nullable=False, default='QUEUED')  # QUEUED, RUNNING, RETRY, DONE, FAILED
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Earliest time a worker may claim the job
+    worker_id = db.Column(db.String(255))  # Worker currently (or last) holding the job
+    heartbeat_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    scan_id = db.Column(db.Integer, db.ForeignKey('scans.id'))  # Scan produced by the job
+    full_scan = db.Column(db.Boolean, nullable=False, default=False)  # Always run testssl.sh, even if the target looks unchanged
+    scan_profile = db.Column(db.String(20), nullable=False, default='fast')  # Checks to run, see scan_profiles.py
+    planned_start = db.Column(db.DateTime, index=True)  # Set for jobs queued by the scan window planner (see scan_planner.py)
+    planned_finish = db.Column(db.DateTime)  # planned_start + predicted scan duration
+    error = db.Column(db.Text)
+
 # API Routes
+APPLICATIONS_PAGE_SIZE = 100
+APPLICATIONS_MAX_PAGE_SIZE = 500
+
+def _encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def _decode_cursor(cursor, sort):
+    """
+    Decode a next_cursor of get_applications into the (sort value, id) of the
+    last row of the previous page, with last_scan values parsed to datetimes.
+
+    Raises:
+        ValueError: If the cursor is not one get_applications issued for this sort
+    """
+    padded = cursor + '=' * (-len(cursor) % 4)
+    values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    if not isinstance(values, list) or len(values) != 2 or not _is_int(values[1]):
+        raise ValueError('malformed cursor')
+    sort_value, last_id = values
+    if sort == 'status':
+        if not _is_int(sort_value):
+            raise ValueError('malformed cursor')
+    elif sort == 'last_scan':
+        if sort_value is not None:
+            if not isinstance(sort_value, str):
+                raise ValueError('malformed cursor')
+            sort_value = datetime.fromisoformat(sort_value)
+            if sort_value.tzinfo is not None:  # Scan times are naive UTC
+                raise ValueError('malformed cursor')
+    elif sort_value is not None:
+        raise ValueError('malformed cursor')
+    return sort_value, last_id
+
 @app.route('/api/applications', methods=['GET'])
 def get_applications():
     """
-    Get all applications with their latest scan status.
-    Returns a list of applications with PASS/WARN/FAIL status.
+    Get applications with their latest scan status, one page at a time.
+
+    Query parameters (all optional):
+        limit: Page size (default 100, max 500)
+        cursor: next_cursor value from the previous page
+        status: Comma-separated statuses to include (PASS, WARN, FAIL, UNKNOWN)
+        q: Case-insensitive substring of the name or URL
+        max_age: Only applications scanned within the last N hours
+        min_age: Only applications not scanned within the last N hours (including never scanned)
+        sort: 'id' (default), 'status' (worst first) or 'last_scan' (most recent first)
+
+    Returns:
+        {"items": [...], "next_cursor": "..." or null}
     """
-    from sqlalchemy import func
+    from sqlalchemy import and_, or_
 
-    # Subquery to get the latest scan ID for each application
-    latest_scan_subq = db.session.query(
-        Scan.application_id,
-        func.max(Scan.id).label('latest_scan_id')
-    ).group_by(Scan.application_id).subquery()
+    sort = request.args.get('sort', 'id')
+    if sort not in ('id', 'status', 'last_scan'):
+        return jsonify({'error': "sort must be one of 'id', 'status', 'last_scan'"}), 400
 
-    # Join applications with their latest scan and count findings
-    applications = db.session.query(
-        Application.id,
-        Application.url,
-        Application.name,
-        Scan.status,
-        Scan.completed_at.label('last_scan_time'),
-        func.count(Finding.id).label('issue_count')
-    ).outerjoin(
-        latest_scan_subq,
-        Application.id == latest_scan_subq.c.application_id
-    ).outerjoin(
-        Scan,
-        Scan.id == latest_scan_subq.c.latest_scan_id
-    ).outerjoin(
-        Finding,
-        Finding.scan_id == Scan.id
-    ).group_by(
+    try:
+        limit = min(max(int(request.args.get('limit', APPLICATIONS_PAGE_SIZE)), 1), APPLICATIONS_MAX_PAGE_SIZE)
+        max_age = float(request.args['max_age']) if 'max_age' in request.args else None
+        min_age = float(request.args['min_age']) if 'min_age' in request.args else None
+        cursor = _decode_cursor(request.args['cursor'], sort) if request.args.get('cursor') else None
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid limit, age or cursor parameter'}), 400
+
+    query = db.session.query(
         Application.id,
         Application.url,
         Application.name,
-        Scan.status,
-        Scan.completed_at
-    ).all()
+        Application.latest_status,
+        Application.latest_status_rank,
+        Application.last_scan_time,
+        Application.latest_issue_count,
+        Application.scan_profile,
+        Application.scan_interval,
+        Application.next_scan_at
+    )
+
+    # Filters
+    statuses = [status.strip().upper() for status in request.args.get('status', '').split(',') if status.strip()]
+    if statuses:
+        conditions = [Application.latest_status.in_([status for status in statuses if status != 'UNKNOWN'])]
+        if 'UNKNOWN' in statuses:
+            conditions.append(Application.latest_status.is_(None))
+        query = query.filter(or_(*conditions))
+
+    search = request.args.get('q', '').strip()
+    if search:
+        pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        query = query.filter(or_(Application.name.ilike(pattern, escape='\\'),
+                                 Application.url.ilike(pattern, escape='\\')))
+
+    now = datetime.utcnow()
+    if max_age is not None:
+        query = query.filter(Application.last_scan_time >= now - timedelta(hours=max_age))
+    if min_age is not None:
+        query = query.filter(or_(Application.last_scan_time < now - timedelta(hours=min_age),
+                                 Application.last_scan_time.is_(None)))
+
+    # Keyset pagination: continue strictly after the (sort key, id) of the previous page's last row
+    if sort == 'status':
+        if cursor:
+            rank, last_id = cursor
+            query = query.filter(or_(Application.latest_status_rank > rank,
+                                     and_(Application.latest_status_rank == rank, Application.id > last_id)))
+        query = query.order_by(Application.latest_status_rank, Application.id)
+    elif sort == 'last_scan':
+        # Most recent first, never-scanned applications last
+        if cursor:
+            last_scan, last_id = cursor
+            if last_scan is None:
+                query = query.filter(Application.last_scan_time.is_(None), Application.id < last_id)
+            else:
+                query = query.filter(or_(Application.last_scan_time < last_scan,
+                                         and_(Application.last_scan_time == last_scan, Application.id < last_id),
+                                         Application.last_scan_time.is_(None)))
+        query = query.order_by(Application.last_scan_time.desc().nulls_last(), Application.id.desc())
+    else:
+        if cursor:
+            query = query.filter(Application.id > cursor[1])
+        query = query.order_by(Application.id)
+
+    applications = query.limit(limit + 1).all()
+    has_more = len(applications) > limit
+    applications = applications[:limit]
 
     result = []
     for app in applications:
@@ -98,23 +294,36 @@ def get_applications():
             'id': app.id,
             'url': app.url,
             'name': app.name or app.url,
-            'status': app.status or 'UNKNOWN',
+            'status': app.latest_status or 'UNKNOWN',
             'last_scan_time': app.last_scan_time.isoformat() if app.last_scan_time else None,
-            'issue_count': app.issue_count or 0
+            'issue_count': app.latest_issue_count or 0,
+            'scan_profile': app.scan_profile,
+            'scan_interval': app.scan_interval,
+            'next_scan_at': app.next_scan_at.isoformat() if app.next_scan_at else None
         })
 
-    return jsonify(result)
+    next_cursor = None
+    if has_more:
+        last = applications[-1]
+        sort_value = {
+            'status': last.latest_status_rank,
+            'last_scan': last.last_scan_time.isoformat() if last.last_scan_time else None,
+        }.get(sort)
+        next_cursor = _encode_cursor([sort_value, last.id])
+
+    return jsonify({'items': result, 'next_cursor': next_cursor})
 
 @app.route('/api/applications/<int:app_id>', methods=['GET'])
 def get_application_detail(app_id):
     """
     Get detailed information for a specific application.
-    Includes scan history and findings.
+    Includes scan history, findings and the summary of the latest scan's
+    detailed SSL info, with links to its sections (get_scan_details).
     """
     application = Application.query.get_or_404(app_id)
 
     # Get the latest scan for this application
-    latest_scan = Scan.query.filter_by(application_id=app_id).order_by(Scan.completed_at.desc()).first()
+    latest_scan = db.session.get(Scan, application.latest_scan_id) if application.latest_scan_id else None
 
     if not latest_scan:
         return jsonify({
@@ -123,8 +332,11 @@ def get_application_detail(app_id):
             'name': application.name or application.url,
             'status': 'UNKNOWN',
             'last_scan_time': None,
+            'scan_profile': application.scan_profile,
+            'scan_interval': application.scan_interval,
+            'next_scan_at': application.next_scan_at.isoformat() if application.next_scan_at else None,
             'findings': [],
-            'detailed_ssl_info': {},
+            'details': {'scan_id': None, 'summary': {}, 'sections': {}},
             'scan_history': []
         })
 
@@ -134,13 +346,13 @@ def get_application_detail(app_id):
     # Get recent scan history (last 10 scans)
     scan_history = Scan.query.filter_by(application_id=app_id).order_by(Scan.completed_at.desc()).limit(10).all()
 
-    # Parse detailed SSL info if available
-    detailed_ssl_info = {}
-    if latest_scan.detailed_ssl_info:
-        try:
-            detailed_ssl_info = json.loads(latest_scan.detailed_ssl_info)
-        except json.JSONDecodeError:
-            detailed_ssl_info = {}
+    # Only the summary of the detailed SSL info; sections are fetched on their own (get_scan_details)
+    from scan_details import SECTIONS, SUMMARY, load_section
+    details = {
+        'scan_id': latest_scan.id,
+        'summary': load_section(latest_scan, SUMMARY),
+        'sections': {section: f'/api/scans/{latest_scan.id}/details/{section}' for section in SECTIONS}
+    }
 
     return jsonify({
         'id': application.id,
@@ -148,6 +360,9 @@ def get_application_detail(app_id):
         'name': application.name or application.url,
         'status': latest_scan.status,
         'last_scan_time': latest_scan.completed_at.isoformat() if latest_scan.completed_at else None,
+        'scan_profile': application.scan_profile,
+        'scan_interval': application.scan_interval,
+        'next_scan_at': application.next_scan_at.isoformat() if application.next_scan_at else None,
         'findings': [
             {
                 'category': f.category,
@@ -157,22 +372,59 @@ def get_application_detail(app_id):
                 'details': f.details
             } for f in findings
         ],
-        'detailed_ssl_info': detailed_ssl_info,
+        'details': details,
         'scan_history': [
             {
                 'id': scan.id,
                 'status': scan.status,
                 'started_at': scan.started_at.isoformat(),
-                'completed_at': scan.completed_at.isoformat() if scan.completed_at else None
+                'completed_at': scan.completed_at.isoformat() if scan.completed_at else None,
+                'carried_from_scan_id': scan.carried_from_scan_id,
+                'scan_profile': scan.scan_profile or 'fast'
             } for scan in scan_history
         ]
     })
 
+@app.route('/api/scans/<int:scan_id>/details/<section>', methods=['GET'])
+def get_scan_details(scan_id, section):
+    """
+    Get one section of a scan's detailed SSL info (protocol_info,
+    cipher_info, certificate_info, vulnerabilities, handshake_simulation,
+    misc_info or summary).
+
+    Sections are stored compressed and serialized (see scan_details.py):
+    the stored blob is sent as it is when the client accepts its encoding,
+    and decompressed otherwise.
+    """
+    from scan_details import SECTIONS, SUMMARY, content_encoding, decompress, load_section_data
+    if section not in SECTIONS + (SUMMARY,):
+        return jsonify({'error': f'Unknown section: {section}'}), 404
+    scan = Scan.query.get_or_404(scan_id)
+
+    data = load_section_data(scan, section)
+    if not data:
+        return jsonify({})
+    encoding = content_encoding(data)
+    if request.accept_encodings.quality(encoding) > 0:
+        response = app.response_class(data, mimetype='application/json')
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = app.response_class(decompress(data), mimetype='application/json')
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
 @app.route('/api/applications', methods=['POST'])
 def add_application():
     """
     Add a new application to be monitored.
+
+    Optional scan_profile (cert, policy, fast or full) and scan_interval
+    (seconds) default to Config.DEFAULT_SCAN_PROFILE and
+    Config.DEFAULT_SCAN_INTERVAL. The first scan is due right away.
     """
+    from targets import assign_scan_target
+    from scan_schedule import validate_schedule
+
     data = request.get_json()
     
     if not data or 'url' not in data:
@@ -183,39 +435,73 @@ def add_application():
     if existing_app:
         return jsonify({'error': 'Application already exists'}), 409
     
+    try:
+        scan_profile = data.get('scan_profile') or Config.DEFAULT_SCAN_PROFILE
+        scan_interval = int(data.get('scan_interval') or Config.DEFAULT_SCAN_INTERVAL)
+        validate_schedule(scan_profile, scan_interval)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
     # Create new application
     application = Application(
         url=data['url'],
-        name=data.get('name', data['url'])
+        name=data.get('name', data['url']),
+        scan_profile=scan_profile,
+        scan_interval=scan_interval
     )
     
+    try:
+        assign_scan_target(application)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     db.session.add(application)
     db.session.commit()
     
     return jsonify({
         'id': application.id,
         'url': application.url,
-        'name': application.name
+        'name': application.name,
+        'scan_profile': application.scan_profile,
+        'scan_interval': application.scan_interval
     }), 201
 
 @app.route('/api/applications/<int:app_id>', methods=['PUT'])
 def update_application(app_id):
     """
-    Update an application's details (currently just name).
+    Update an application's name, scan_profile or scan_interval.
     """
+    from scan_schedule import validate_schedule, reschedule
+
     application = Application.query.get_or_404(app_id)
     data = request.get_json()
 
+    try:
+        scan_interval = int(data['scan_interval']) if 'scan_interval' in data else None
+        validate_schedule(data.get('scan_profile'), scan_interval)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
     try:
         if 'name' in data:
             application.name = data['name']
             application.updated_at = datetime.utcnow()
+        if data.get('scan_profile'):
+            application.scan_profile = data['scan_profile']
+            application.updated_at = datetime.utcnow()
+        if scan_interval is not None and scan_interval != application.scan_interval:
+            application.scan_interval = scan_interval
+            application.updated_at = datetime.utcnow()
+            reschedule(application)
 
         db.session.commit()
         return jsonify({
             'id': application.id,
             'name': application.name,
-            'url': application.url
+            'url': application.url,
+            'scan_profile': application.scan_profile,
+            'scan_interval': application.scan_interval,
+            'next_scan_at': application.next_scan_at.isoformat() if application.next_scan_at else None
         }), 200
     except Exception as e:
         db.session.rollback()
@@ -230,6 +516,10 @@ def delete_application(app_id):
     application = Application.query.get_or_404(app_id)
 
     try:
+        # Drop the latest-scan pointer so the scans can be deleted
+        application.latest_scan_id = None
+        db.session.flush()
+
         # Get all scans for this application
         scans = Scan.query.filter_by(application_id=app_id).all()
 
@@ -237,7 +527,15 @@ def delete_application(app_id):
         for scan in scans:
             Finding.query.filter_by(scan_id=scan.id).delete()
 
-        # Now delete the scans
+        # Copies of these scans kept by applications on the same target become standalone,
+        # with their own copy of the details
+        from scan_details import detach_copies, delete_scan_details
+        scan_ids = [scan.id for scan in scans]
+        detach_copies(scan_ids)
+        delete_scan_details(scan_ids)
+
+        # Now delete the scan jobs and scans
+        ScanJob.query.filter_by(application_id=app_id).delete()
         Scan.query.filter_by(application_id=app_id).delete()
 
         # Finally delete the application
@@ -249,78 +547,150 @@ def delete_application(app_id):
         db.session.rollback()
         return jsonify({'error': f'Failed to delete application: {str(e)}'}), 500
 
+_manual_scan_executor = None
+_manual_scan_worker = None
+_manual_scan_lock = threading.Lock()
+
+def _submit_manual_scan(job_id):
+    """
+    Run a queued scan job on this process's bounded manual-scan executor.
+
+    Used when Config.SCAN_DISPATCH is 'local' (no scan workers deployed); at most
+    Config.API_SCAN_CONCURRENCY scans run per API process, further jobs wait in
+    the executor queue instead of competing with request handling.
+    """
+    global _manual_scan_executor, _manual_scan_worker
+    from concurrent.futures import ThreadPoolExecutor
+    from worker import ScanWorker
+
+    with _manual_scan_lock:
+        if _manual_scan_executor is None:
+            _manual_scan_worker = ScanWorker(concurrency=Config.API_SCAN_CONCURRENCY)
+            _manual_scan_executor = ThreadPoolExecutor(
+                max_workers=Config.API_SCAN_CONCURRENCY,
+                thread_name_prefix='manual-scan'
+            )
+
+    worker_id = f"api:{os.getpid()}"
+
+    def run_manual_scan():
+        try:
+            _manual_scan_worker.run_job(job_id, worker_id)
+        except Exception as e:
+            print(f"Error running manual scan job: {str(e)}")
+
+    _manual_scan_executor.submit(run_manual_scan)
+
+def _serialize_scan_job(job):
+    return {
+        'job_id': job.id,
+        'application_id': job.application_id,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'scan_id': job.scan_id,
+        'scan_profile': job.scan_profile,
+        'planned_start': job.planned_start.isoformat() if job.planned_start else None,
+        'planned_finish': job.planned_finish.isoformat() if job.planned_finish else None,
+        'error': job.error
+    }
+
 @app.route('/api/scan/<int:app_id>', methods=['POST'])
 def trigger_scan(app_id):
     """
     Manually trigger a scan for a specific application (runs asynchronously).
+
+    The scan is queued as a ScanJob. If the application already has a scan
+    queued or running, that job is returned instead of starting another one.
     """
-    from scanner import TestSSLScanner
-    from rule_engine import evaluate_ssl_policy
-    import threading
+    import job_queue
+    import scan_profiles
 
     application = Application.query.get_or_404(app_id)
 
-    def run_scan_async():
-        with app.app_context():  # Ensure Flask application context is available
-            try:
-                # Initialize scanner
-                scanner = TestSSLScanner()
-
-                # Perform scan
-                scan_start_time = datetime.utcnow()
-                scan_results = scanner.scan_url(application.url)
-                scan_end_time = datetime.utcnow()
-
-                # Evaluate results using rule engine
-                status, findings, detailed_info = evaluate_ssl_policy(scan_results)
-
-                # Create scan record
-                scan = Scan(
-                    application_id=app_id,
-                    status=status.value,
-                    started_at=scan_start_time,
-                    completed_at=scan_end_time,
-                    detailed_ssl_info=json.dumps({
-                        'protocol_info': detailed_info.protocol_info,
-                        'cipher_info': detailed_info.cipher_info,
-                        'certificate_info': detailed_info.certificate_info,
-                        'vulnerabilities': detailed_info.vulnerabilities,
-                        'handshake_simulation': detailed_info.handshake_simulation,
-                        'misc_info': detailed_info.misc_info
-                    })
-                )
-
-                db.session.add(scan)
-                db.session.flush()  # Get the scan ID for findings
-
-                # Create finding records
-                for finding in findings:
-                    db_finding = Finding(
-                        scan_id=scan.id,
-                        category=finding.category,
-                        severity=finding.severity.value,
-                        name=finding.name,
-                        description=finding.description,
-                        details=finding.details
-                    )
-                    db.session.add(db_finding)
-
-                db.session.commit()
-                print(f"Scan completed for {application.url} with status: {status.value}")
-
-            except Exception as e:
-                db.session.rollback()
-                print(f"Error during scan of {application.url}: {str(e)}")
-
-    # Start the scan in a background thread
-    scan_thread = threading.Thread(target=run_scan_async)
-    scan_thread.daemon = True
-    scan_thread.start()
+    queue_mode = Config.SCAN_DISPATCH == 'queue'
+    # Without workers there is nobody to pick up a delayed retry, so run manual scans once
+    # A manual scan is an explicit request for fresh results, so never reuse an unchanged scan
+    # Manual scans are at least fast scans, whatever the application's scheduled profile
+    job, created = job_queue.enqueue_scan(app_id, max_attempts=None if queue_mode else 1, full_scan=True,
+                                          profile=scan_profiles.broadest(application.scan_profile, scan_profiles.FAST),
+                                          return_created=True)
+
+    # An existing job is already running or waiting for the run started when it was queued
+    if created and job.status == job_queue.QUEUED and not queue_mode:
+        try:
+            _submit_manual_scan(job.id)
+        except Exception as e:
+            job_queue.fail_job(job, f'Failed to start scan: {str(e)}')
+            return jsonify({'error': f'Failed to start scan: {str(e)}'}), 500
 
     return jsonify({
-        'message': 'Scan initiated successfully',
+        'message': 'Scan initiated successfully' if created else 'Scan already in progress',
         'application_id': app_id,
-        'url': application.url
+        'url': application.url,
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/api/scans/jobs/{job.id}'
+    }), 202
+
+@app.route('/api/scans/jobs/<int:job_id>', methods=['GET'])
+def get_scan_job(job_id):
+    """
+    Get the status of a scan job.
+    """
+    job = ScanJob.query.get_or_404(job_id)
+    return jsonify(_serialize_scan_job(job))
+
+@app.route('/api/scans/plan', methods=['GET'])
+def get_scan_plan():
+    """
+    Planned versus actual start and finish of the scans queued by the scan
+    window planner, for tuning the window and its concurrency.
+
+    Query parameters (all optional):
+        since: ISO timestamp; jobs planned to start from then on (default: 24 hours ago)
+        limit: Most jobs to list (default 500, at most 5000)
+    """
+    try:
+        since = datetime.fromisoformat(request.args['since']) if 'since' in request.args \
+            else datetime.utcnow() - timedelta(hours=24)
+        limit = min(max(int(request.args.get('limit', 500)), 1), 5000)
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid since or limit parameter'}), 400
+
+    jobs = ScanJob.query.filter(ScanJob.planned_start >= since).order_by(
+        ScanJob.planned_start, ScanJob.id).limit(limit).all()
+
+    items, start_delays, duration_errors = [], [], []
+    for job in jobs:
+        item = _serialize_scan_job(job)
+        item['start_delay'] = None
+        item['duration_error'] = None
+        if job.started_at:
+            item['start_delay'] = (job.started_at - job.planned_start).total_seconds()
+            start_delays.append(item['start_delay'])
+        if job.started_at and job.finished_at and job.planned_finish:
+            # Positive when the scan took longer than predicted
+            item['duration_error'] = ((job.finished_at - job.started_at) -
+                                      (job.planned_finish - job.planned_start)).total_seconds()
+            duration_errors.append(item['duration_error'])
+        items.append(item)
+
+    return jsonify({
+        'window': Config.SCAN_WINDOW or None,
+        'concurrency': Config.SCAN_WINDOW_CONCURRENCY,
+        'summary': {
+            'planned': len(jobs),
+            'started': len(start_delays),
+            'finished': len(duration_errors),
+            'finished_late': sum(1 for job in jobs if job.finished_at and job.finished_at > job.planned_finish),
+            'mean_start_delay': sum(start_delays) / len(start_delays) if start_delays else None,
+            'mean_duration_error': sum(duration_errors) / len(duration_errors) if duration_errors else None
+        },
+        'items': items
     })
 
 @app.route('/api/summary', methods=['GET'])
@@ -330,35 +700,23 @@ def get_summary():
     """
     from sqlalchemy import func
 
-    # Subquery to get the latest scan for each application
-    latest_scan_subq = db.session.query(
-        Scan.application_id,
-        func.max(Scan.id).label('latest_scan_id')
-    ).group_by(Scan.application_id).subquery()
-
     # Count applications by their latest scan status
     status_counts = db.session.query(
-        Scan.status,
+        Application.latest_status,
         func.count(Application.id)
-    ).select_from(Application).outerjoin(
-        latest_scan_subq,
-        Application.id == latest_scan_subq.c.application_id
-    ).outerjoin(
-        Scan,
-        Scan.id == latest_scan_subq.c.latest_scan_id
-    ).group_by(Scan.status).all()
-    
+    ).group_by(Application.latest_status).all()
+
     # Calculate total applications
-    total_apps = Application.query.count()
-    
+    total_apps = sum(count for _, count in status_counts)
+
     # Format counts
     counts = {status: count for status, count in status_counts if status}
     counts['TOTAL'] = total_apps
-    counts['UNKNOWN'] = counts.get('UNKNOWN', 0) + (total_apps - sum(count for _, count in status_counts if count))
-    
+    counts['UNKNOWN'] = counts.get('UNKNOWN', 0) + sum(count for status, count in status_counts if not status)
+
     # Calculate last scan time for the entire system
-    latest_scan = db.session.query(db.func.max(Scan.completed_at)).scalar()
-    
+    latest_scan = db.session.query(func.max(Application.last_scan_time)).scalar()
+
     return jsonify({
         'total_applications': total_apps,
         'status_counts': counts,
@@ -395,8 +753,9 @@ def wait_for_db(max_retries=30, delay=1):
 if __name__ == '__main__':
     # Wait for database to be ready before proceeding
     if wait_for_db():
+        from schema import upgrade_database
         with app.app_context():
-            db.create_all()
+            upgrade_database()
         app.run(debug=False, host='0.0.0.0', port=5000)
     else:
         print("Failed to connect to database after multiple attempts. Exiting.")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark for writing scans and findings to the configured database.
+
+Compares the rows per second of the ORM path (a Scan and a Finding object
+per row added with db.session.add) with the bulk path of bulk_insert.py
+(Core executemany, and COPY on PostgreSQL). Everything is written in one
+transaction that is rolled back at the end, so nothing is left behind.
+
+Usage:
+    python bench_bulk_insert.py [scans] [findings per scan]
+"""
+import sys
+import os
+import time
+from datetime import datetime
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+from api import app, db, Application, Scan, Finding
+from bulk_insert import copy_supported, insert_scans, insert_findings
+
+
+def scan_row(application_id: int) -> dict:
+    now = datetime.utcnow()
+    return {'application_id': application_id, 'status': 'WARN', 'started_at': now, 'completed_at': now,
+            'policy_version': 'bench', 'scan_profile': 'fast'}
+
+
+def finding_rows(scan_id: int, count: int) -> list:
+    return [{'scan_id': scan_id, 'category': 'cipher', 'severity': 'WARN', 'name': f'WEAK_CIPHER_{index}',
+             'description': 'Weak cipher suite offered', 'details': 'TLS1_2  xc013  ECDHE-RSA-AES128-SHA'}
+            for index in range(count)]
+
+
+def write_orm(application_id: int, scans: int, findings: int) -> None:
+    for _ in range(scans):
+        scan = Scan(**scan_row(application_id))
+        db.session.add(scan)
+        db.session.flush()  # Get the scan ID for findings
+        for row in finding_rows(scan.id, findings):
+            db.session.add(Finding(**row))
+    db.session.flush()
+
+
+def write_bulk(application_id: int, scans: int, findings: int, copy: bool) -> None:
+    scan_ids = insert_scans([scan_row(application_id) for _ in range(scans)])
+    insert_findings([row for scan_id in scan_ids for row in finding_rows(scan_id, findings)], copy=copy)
+
+
+def main():
+    scans = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    findings = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    rows = scans * (findings + 1)
+
+    with app.app_context():
+        db.create_all()
+        application = Application(name='bench_bulk_insert', url=f'https://bench-{time.time_ns()}.invalid')
+        db.session.add(application)
+        db.session.flush()
+
+        paths = [('ORM add', lambda: write_orm(application.id, scans, findings)),
+                 ('Core executemany', lambda: write_bulk(application.id, scans, findings, copy=False))]
+        if copy_supported():
+            Config.BULK_COPY_MIN_ROWS = 1
+            paths.append(('PostgreSQL COPY', lambda: write_bulk(application.id, scans, findings, copy=True)))
+
+        print(f"{db.engine.dialect.name}: {scans} scans x {findings} findings ({rows} rows) per path")
+        try:
+            for name, write in paths:
+                start = time.perf_counter()
+                write()
+                elapsed = time.perf_counter() - start
+                print(f"{name:17s} {elapsed:7.3f} s  {rows / elapsed:9.0f} rows/s")
+        finally:
+            db.session.rollback()
+
+
+if __name__ == "__main__":
+    main()
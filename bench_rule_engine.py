@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the rule engine on a full testssl.sh --full result.
+
+Builds a synthetic --jsonfile-pretty document with the sections and
+finding ids testssl.sh emits for a --full run (including the per-cipher,
+per-protocol and client simulation entries) and times evaluate_ssl_policy.
+
+Usage:
+    python bench_rule_engine.py [iterations]
+"""
+import sys
+import os
+import time
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from rule_engine import evaluate_ssl_policy, ScanDocument
+
+PROTOCOLS = [('SSLv2', 'OK', 'not offered'), ('SSLv3', 'OK', 'not offered'),
+             ('TLS1', 'LOW', 'offered (deprecated)'), ('TLS1_1', 'LOW', 'offered (deprecated)'),
+             ('TLS1_2', 'OK', 'offered'), ('TLS1_3', 'OK', 'offered with final')]
+
+CIPHER_NAMES = ['TLS_AES_256_GCM_SHA384', 'TLS_CHACHA20_POLY1305_SHA256', 'TLS_AES_128_GCM_SHA256',
+                'ECDHE-RSA-AES256-GCM-SHA384', 'ECDHE-RSA-CHACHA20-POLY1305', 'ECDHE-RSA-AES128-GCM-SHA256',
+                'ECDHE-RSA-AES256-SHA384', 'ECDHE-RSA-AES128-SHA256', 'ECDHE-RSA-AES256-SHA',
+                'ECDHE-RSA-AES128-SHA', 'AES256-GCM-SHA384', 'AES128-GCM-SHA256', 'AES256-SHA256',
+                'AES128-SHA256', 'AES256-SHA', 'AES128-SHA', 'DES-CBC3-SHA', 'RC4-SHA']
+
+VULNERABILITIES = ['heartbleed', 'CCS', 'ticketbleed', 'ROBOT', 'secure_renego', 'secure_client_renego',
+                   'CRIME_TLS', 'BREACH', 'POODLE_SSL', 'fallback_SCSV', 'SWEET32', 'FREAK', 'DROWN',
+                   'DROWN_hint', 'LOGJAM', 'LOGJAM-common_primes', 'BEAST_CBC_TLS1', 'BEAST', 'LUCKY13',
+                   'winshock', 'RC4']
+
+CLIENTS = ['android_60', 'android_70', 'android_81', 'android_90', 'android_X', 'android_11', 'android_12',
+           'chrome_79_win10', 'chrome_101_win10', 'chromium_101_win10', 'edge_101_win10_21h2',
+           'firefox_66_win81', 'firefox_100_win10', 'ie_6_xp', 'ie_8_win7', 'ie_8_xp', 'ie_11_win7',
+           'ie_11_win81', 'ie_11_winphone81', 'ie_11_win10', 'opera_66_win10', 'safari_121_ios_122',
+           'safari_130_osx_10146', 'safari_154_osx_1231', 'java_7u25', 'java_8u161', 'java1102',
+           'java1703', 'go_1178', 'libressl_3_3_3', 'openssl_102e', 'openssl_110l', 'openssl_111d',
+           'openssl_303', 'apple_mail_16_0', 'thunderbird_91_9']
+
+
+def _entry(entry_id, severity, finding, **extra):
+    entry = {'id': entry_id, 'severity': severity, 'finding': finding}
+    entry.update(extra)
+    return entry
+
+
+def build_full_scan_results() -> dict:
+    """Build a synthetic testssl.sh --full --jsonfile-pretty result for one target."""
+    pretest = [_entry('pre_128cipher', 'INFO', 'No 128 cipher limit bug')]
+    protocols = [_entry(*protocol) for protocol in PROTOCOLS]
+    protocols += [_entry('NPN', 'INFO', 'offered with h2, http/1.1'), _entry('ALPN_HTTP2', 'OK', 'h2'),
+                  _entry('ALPN', 'INFO', 'h2 http/1.1')]
+    grease = [_entry('GREASE', 'OK', 'No issues')]
+
+    ciphers = [_entry(f'cipherlist_{name}', severity, finding, cwe='CWE-327') for name, severity, finding in [
+        ('NULL', 'OK', 'not offered'), ('aNULL', 'OK', 'not offered'), ('EXPORT', 'OK', 'not offered'),
+        ('LOW', 'OK', 'not offered'), ('3DES_IDEA', 'MEDIUM', 'offered'),
+        ('OBSOLETED', 'LOW', 'offered'), ('STRONG_NOFS', 'OK', 'offered'), ('STRONG_FS', 'OK', 'offered')]]
+
+    server_preferences = [_entry('cipher_order', 'OK', 'server'), _entry('protocol_negotiated', 'OK', 'TLSv1.3'),
+                          _entry('cipher_negotiated', 'OK', 'TLS_AES_256_GCM_SHA384, 253 bit ECDH (X25519)')]
+    for protocol_id, _, _ in PROTOCOLS[2:]:
+        server_preferences.append(_entry(f'cipherorder_{protocol_id}', 'INFO', ' '.join(CIPHER_NAMES[:8])))
+        for index, name in enumerate(CIPHER_NAMES):
+            server_preferences.append(_entry(f'cipher-{protocol_id.lower()}_x{index:02x}', 'OK',
+                                             f'{protocol_id}  x{index:02x}  {name}  ECDH 253  AESGCM  256'))
+
+    fs = [_entry('FS', 'OK', 'offered'), _entry('FS_ciphers', 'INFO', ' '.join(CIPHER_NAMES[:10])),
+          _entry('FS_ECDHE_curves', 'OK', 'prime256v1 secp384r1 X25519 X448'),
+          _entry('FS_TLS12_sig_algs', 'INFO', 'RSA-PSS-RSAE+SHA256 RSA+SHA256 RSA+SHA384 RSA+SHA512')]
+
+    server_defaults = [_entry('TLS_extensions', 'INFO', '"server name/#0" "renegotiation info/#65281"'),
+                       _entry('TLS_session_ticket', 'INFO', 'valid for 7200 seconds only (<daily)'),
+                       _entry('SSL_sessionID_support', 'INFO', 'yes'),
+                       _entry('sessionresumption_ticket', 'INFO', 'supported'),
+                       _entry('sessionresumption_ID', 'INFO', 'supported'),
+                       _entry('TLS_timestamp', 'INFO', 'random'),
+                       _entry('cert_numbers', 'INFO', '2')]
+    for cert_number in (1, 2):
+        for cert_id, severity, finding in [
+                ('cert_signatureAlgorithm', 'OK', 'SHA256 with RSA'), ('cert_keySize', 'INFO', 'RSA 2048 bits'),
+                ('cert_keyUsage', 'INFO', 'Digital Signature, Key Encipherment'),
+                ('cert_extKeyUsage', 'INFO', 'TLS Web Server Authentication, TLS Web Client Authentication'),
+                ('cert_serialNumber', 'INFO', '0A1B2C3D4E5F'), ('cert_serialNumberLen', 'INFO', '16'),
+                ('cert_fingerprintSHA1', 'INFO', '0123456789ABCDEF0123456789ABCDEF01234567'),
+                ('cert_fingerprintSHA256', 'INFO', '0123456789ABCDEF' * 4),
+                ('cert_commonName', 'OK', 'example.com'), ('cert_subjectAltName', 'INFO', 'example.com www.example.com'),
+                ('cert_trust', 'OK', 'Ok via SAN (same w/o SNI)'), ('cert_chain_of_trust', 'OK', 'passed.'),
+                ('cert_certificatePolicies_EV', 'INFO', 'no'), ('cert_expirationStatus', 'OK', '62 >= 60 days'),
+                ('cert_notBefore', 'INFO', '2025-01-01 00:00'), ('cert_notAfter', 'OK', '2026-12-31 23:59'),
+                ('cert_extlifeSpan', 'OK', 'certificate has no extended life time according to browser forum'),
+                ('cert_eTLS', 'INFO', 'not present'), ('cert_crlDistributionPoints', 'INFO', 'http://crl.example.com'),
+                ('cert_ocspURL', 'INFO', 'http://ocsp.example.com'), ('OCSP_stapling', 'LOW', 'not offered'),
+                ('cert_mustStapleExtension', 'INFO', '--'), ('DNS_CAArecord', 'LOW', '--'),
+                ('certificate_transparency', 'INFO', 'yes (certificate extension)'),
+                ('certs_countServer', 'INFO', '3'), ('certs_list_ordering_problem', 'INFO', 'no'),
+                ('cert_caIssuers', 'INFO', 'Example CA')]:
+            server_defaults.append(_entry(f'{cert_id} <cert#{cert_number}>', severity, finding))
+
+    header_response = [_entry(header_id, 'INFO', finding) for header_id, finding in [
+        ('HTTP_status_code', '200 OK'), ('HTTP_clock_skew', '0 seconds from localtime'),
+        ('HSTS_time', '365 days (=31536000 seconds) > 15552000 seconds'), ('HSTS_subdomains', 'includes subdomains'),
+        ('HSTS_preload', 'domain is marked for preloading'), ('HPKP', 'No support for HTTP Public Key Pinning'),
+        ('banner_server', 'nginx'), ('banner_application', 'No application banner found'),
+        ('cookie_count', '0 at "/"'), ('X-Frame-Options', 'SAMEORIGIN'), ('X-Content-Type-Options', 'nosniff'),
+        ('Content-Security-Policy', "default-src 'self'"), ('banner_reverseproxy', '--')]]
+
+    vulnerabilities = [_entry(vuln_id, 'OK', 'not vulnerable', cve='CVE-2014-0160') for vuln_id in VULNERABILITIES]
+
+    cipher_tests = []
+    for index, name in enumerate(CIPHER_NAMES * 2):
+        cipher_tests.append(_entry(f'cipher_x{index:02x}', 'OK', f'x{index:02x}  {name}  ECDH 253  AESGCM  256'))
+
+    browser_simulations = [_entry(f'clientsimulation-{client}', 'INFO', 'TLSv1.3 TLS_AES_256_GCM_SHA384')
+                           for client in CLIENTS]
+
+    rating = [_entry(rating_id, 'INFO', finding) for rating_id, finding in [
+        ('rating_spec', 'SSL Labs\'s \'SSL Server Rating Guide\' (version 2009q from 2020-01-30)'),
+        ('rating_doc', 'https://github.com/ssllabs/research/wiki/SSL-Server-Rating-Guide'),
+        ('protocol_support_score', '95'), ('protocol_support_score_weighted', '28'),
+        ('key_exchange_score', '90'), ('key_exchange_score_weighted', '27'),
+        ('cipher_strength_score', '90'), ('cipher_strength_score_weighted', '36'),
+        ('final_score', '91'), ('overall_grade', 'B'), ('grade_cap_reason_1', 'Grade capped to B. TLS 1.1 offered')]]
+
+    return {
+        'Invocation': 'testssl.sh --full --jsonfile-pretty /tmp/full.json https://example.com',
+        'at': 'scanner:/usr/bin/openssl',
+        'version': '3.2.0 ',
+        'openssl': 'OpenSSL 3.0.13 from Tue Jan 30 14:37:56 2024',
+        'startTime': '1768248476',
+        'scanResult': [{
+            'targetHost': 'example.com', 'ip': '93.184.216.34', 'port': '443',
+            'rDNS': 'example.com.', 'service': 'HTTP',
+            'pretest': pretest, 'protocols': protocols, 'grease': grease, 'ciphers': ciphers,
+            'serverPreferences': server_preferences, 'fs': fs, 'serverDefaults': server_defaults,
+            'headerResponse': header_response, 'vulnerabilities': vulnerabilities,
+            'cipherTests': cipher_tests, 'browserSimulations': browser_simulations, 'rating': rating,
+        }],
+        'scanTime': 312,
+    }
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    scan_results = build_full_scan_results()
+    entry_count = sum(len(value) for value in scan_results['scanResult'][0].values() if isinstance(value, list))
+    print(f"Document: {entry_count} entries, {iterations} iterations")
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        ScanDocument.from_scan_results(scan_results)
+    index_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        evaluate_ssl_policy(scan_results)
+    evaluate_time = time.perf_counter() - start
+
+    print(f"ScanDocument build:  {index_time / iterations * 1e6:8.1f} us/doc")
+    print(f"evaluate_ssl_policy: {evaluate_time / iterations * 1e6:8.1f} us/doc "
+          f"({iterations / evaluate_time:.0f} docs/s)")
+
+
+if __name__ == "__main__":
+    main()
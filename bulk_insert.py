@@ -0,0 +1,80 @@
+"""
+Bulk inserts of scans and findings.
+
+Rows are plain dicts of column values, not ORM objects, so inserting
+thousands of them skips the per-object bookkeeping of db.session.add:
+
+- insert_scans inserts Scan rows with one executemany and returns their
+  IDs (SQLAlchemy batches them into multi-row INSERT ... RETURNING).
+- insert_findings inserts Finding rows with one executemany, or streams
+  them with COPY on PostgreSQL (psycopg2) from Config.BULK_COPY_MIN_ROWS
+  rows on.
+
+Both run on the current db.session transaction and never commit. Flush
+pending ORM objects the rows refer to (e.g. their scan) first.
+"""
+
+import io
+from typing import Dict, List
+
+from sqlalchemy import insert
+
+from config import Config
+from api import db, Scan, Finding
+
+FINDING_COLUMNS = ('scan_id', 'category', 'severity', 'name', 'description', 'details')
+
+
+def copy_supported() -> bool:
+    """Whether the database accepts COPY through the session's connection (PostgreSQL with psycopg2)."""
+    bind = db.session.get_bind()
+    return bind.dialect.name == 'postgresql' and bind.dialect.driver == 'psycopg2'
+
+
+def insert_scans(rows: List[Dict]) -> List[int]:
+    """
+    Insert Scan rows.
+
+    Returns:
+        The IDs of the new scans, in the order of the rows
+    """
+    if not rows:
+        return []
+    result = db.session.execute(insert(Scan).returning(Scan.id, sort_by_parameter_order=True), rows)
+    return list(result.scalars())
+
+
+def insert_findings(rows: List[Dict], copy: bool = True) -> None:
+    """
+    Insert Finding rows (dicts with the FINDING_COLUMNS keys).
+
+    Args:
+        copy: Use COPY when the database supports it and there are enough rows
+    """
+    if not rows:
+        return
+    if copy and 0 < Config.BULK_COPY_MIN_ROWS <= len(rows) and copy_supported():
+        copy_rows(Finding.__tablename__, FINDING_COLUMNS, rows)
+    else:
+        db.session.execute(insert(Finding), rows)
+
+
+def copy_rows(table: str, columns: tuple, rows: List[Dict]) -> None:
+    """Write rows to a PostgreSQL table with COPY ... FROM STDIN, in the session's transaction."""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(row.get(column)) for column in columns))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    connection = db.session.connection().connection.driver_connection
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def _copy_value(value) -> str:
+    """Encode a value for COPY's text format."""
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
@@ -2,6 +2,9 @@
 """
 Script to clear old scan results from the database so that fresh scans 
 with the corrected rule engine can be performed.
+
+Scans store their raw testssl.sh output, so rule changes no longer require
+this: use reevaluate.py to re-apply the current policy without rescanning.
 """
 import sys
 import os
@@ -13,7 +16,7 @@ def clear_old_scans():
     """Clear all old scan results from the database."""
     # Import here to avoid issues if dependencies aren't installed
     try:
-        from api import db, Application, Scan, Finding
+        from api import db, Application, Scan, ScanDetails, Finding, ScanJob, UNKNOWN_STATUS_RANK
         from flask import Flask
         from flask_sqlalchemy import SQLAlchemy
         
@@ -30,8 +33,16 @@ def clear_old_scans():
             
             print(f"Before cleanup: {scan_count_before} scans, {finding_count_before} findings")
             
-            # Delete all findings first (due to foreign key constraint)
+            # Drop references to the scans (due to foreign key constraints)
+            Application.query.update({'latest_scan_id': None, 'latest_status': None,
+                                      'latest_status_rank': UNKNOWN_STATUS_RANK,
+                                      'latest_issue_count': 0, 'last_scan_time': None})
+            ScanJob.query.update({'scan_id': None})
+            Scan.query.update({'carried_from_scan_id': None})
+
+            # Delete all findings and details first (due to foreign key constraints)
             Finding.query.delete()
+            ScanDetails.query.delete()
             
             # Delete all scans
             Scan.query.delete()
@@ -14,8 +14,57 @@ class Config:
     SCHEDULER_TIMEZONE = 'UTC'
 
     # Scan configuration
-    SCAN_TIMEOUT = 300  # 5 minutes timeout for each scan
+    SCAN_TIMEOUT = int(os.environ.get('SCAN_TIMEOUT') or 1200)  # Seconds allowed for a testssl.sh run of a target without scan history, and the cap of adaptive timeouts
+    SCAN_TIMEOUT_FLOOR = int(os.environ.get('SCAN_TIMEOUT_FLOOR') or 120)  # Shortest adaptive timeout
+    SCAN_TIMEOUT_FACTOR = float(os.environ.get('SCAN_TIMEOUT_FACTOR') or 2)  # Adaptive timeout: p95 of a target's scan durations times this
+    SCAN_TIMEOUT_HISTORY = 20  # Recent scans of a target the adaptive timeout is computed from
+    SCAN_TIMEOUT_MIN_SAMPLES = 3  # Scans needed before the timeout adapts
+    OPENSSL_TIMEOUT = int(os.environ.get('OPENSSL_TIMEOUT') or 45)  # Longest timeout testssl.sh allows each openssl call
+    CIRCUIT_BREAKER_THRESHOLD = int(os.environ.get('CIRCUIT_BREAKER_THRESHOLD') or 3)  # Consecutive scan timeouts before a target is no longer scanned on schedule
+    CIRCUIT_BREAKER_COOLDOWN = int(os.environ.get('CIRCUIT_BREAKER_COOLDOWN') or 24 * 3600)  # Seconds before such a target is tried again
     SCAN_TIME_OF_DAY = 2  # Hour of day to run daily scans (2 AM UTC)
+    DEFAULT_SCAN_PROFILE = os.environ.get('DEFAULT_SCAN_PROFILE') or 'policy'  # Profile of new applications (cert, policy, fast, full)
+    DEFAULT_SCAN_INTERVAL = int(os.environ.get('DEFAULT_SCAN_INTERVAL') or 24 * 3600)  # Seconds between scans of new applications
+    MIN_SCAN_INTERVAL = 3600  # Hourly
+    MAX_SCAN_INTERVAL = 7 * 24 * 3600  # Weekly
+    SCHEDULE_POLL_INTERVAL = 60  # Seconds between checks for applications that are due
+    SCHEDULE_BATCH_SIZE = 500  # Most applications picked up per check
+    SCAN_WINDOW = os.environ.get('SCAN_WINDOW') or ''  # 'HH:MM-HH:MM' (UTC) to spread daily and weekly scans over, e.g. '00:00-06:00'; empty scans them when due
+    SCAN_WINDOW_MIN_INTERVAL = 24 * 3600  # Applications with at least this scan interval are scanned in the window
+    SCAN_WINDOW_CONCURRENCY = int(os.environ.get('SCAN_WINDOW_CONCURRENCY') or os.environ.get('SCAN_CONCURRENCY') or os.cpu_count() or 4)  # Scans the window plan runs in parallel (all worker threads in 'queue' dispatch)
+    SCAN_WINDOW_BATCH_SIZE = 100000  # Most applications planned per window
+    SCAN_DURATION_HISTORY = 5  # Recent scans of a target used to predict its scan time
+    SCAN_DEFAULT_DURATION = 180  # Predicted seconds for targets without recorded scans
+    SCAN_CONCURRENCY = int(os.environ.get('SCAN_CONCURRENCY') or os.cpu_count() or 4)  # Max testssl.sh runs in parallel
+    PIPELINE_QUEUE_SIZE = 64  # Results buffered between scan pipeline stages before scan threads wait
+    PIPELINE_WRITE_BATCH = 50  # Most scan results the pipeline saves per database session (each is committed on its own)
+    BULK_COPY_MIN_ROWS = int(os.environ.get('BULK_COPY_MIN_ROWS') or 200)  # Findings per insert from which PostgreSQL COPY is used (0: never, see bulk_insert.py)
+    MAX_SCANS_PER_IP = int(os.environ.get('MAX_SCANS_PER_IP') or 2)  # Concurrent scans of targets on one IP address (0: unlimited)
+    MAX_SCANS_PER_SUBNET = int(os.environ.get('MAX_SCANS_PER_SUBNET') or 4)  # Concurrent scans in one /24 (IPv6: /64)
+    MAX_SCANS_PER_DOMAIN = int(os.environ.get('MAX_SCANS_PER_DOMAIN') or 8)  # Concurrent scans under one registrable domain
+    FINGERPRINT_SKIP = (os.environ.get('FINGERPRINT_SKIP') or 'true').lower() in ('1', 'true', 'yes')  # Skip testssl.sh for targets whose TLS fingerprint is unchanged
+    FINGERPRINT_MAX_AGE = int(os.environ.get('FINGERPRINT_MAX_AGE') or 7 * 24 * 3600)  # Seconds a full scan result may be carried forward
+    FINGERPRINT_TIMEOUT = 10  # Socket timeout in seconds for the fingerprint probe handshakes
+    FULL_SCAN_INTERVAL = int(os.environ.get('FULL_SCAN_INTERVAL') or 7 * 24 * 3600)  # Seconds between fast (all checks) scans of policy-only applications
+    PREFLIGHT_TIMEOUT = int(os.environ.get('PREFLIGHT_TIMEOUT') or 5)  # Seconds allowed for the pre-flight TCP connect and TLS ClientHello each
+    UNREACHABLE_MAX_BACKOFF = int(os.environ.get('UNREACHABLE_MAX_BACKOFF') or 7 * 24 * 3600)  # Longest delay between scans of an unreachable target
+    SPLIT_MANUAL_SCANS = (os.environ.get('SPLIT_MANUAL_SCANS') or 'true').lower() in ('1', 'true', 'yes')  # Run manual scans as parallel per-section testssl.sh runs
+    NATIVE_QUICK_SCANS = (os.environ.get('NATIVE_QUICK_SCANS') or 'true').lower() in ('1', 'true', 'yes')  # Run protocol/certificate-only scans (the cert profile) in-process instead of with testssl.sh
+
+    # Scan job queue configuration
+    SCAN_DISPATCH = os.environ.get('SCAN_DISPATCH') or 'local'  # 'local' scans in the scheduler, 'queue' hands off to workers
+    WORKER_CONCURRENCY = int(os.environ.get('WORKER_CONCURRENCY') or os.cpu_count() or 4)  # Parallel scans per worker replica
+    JOB_MAX_ATTEMPTS = 3  # Attempts before a job is marked FAILED
+    JOB_RETRY_BACKOFF = 300  # Seconds before the first retry, doubled on each further attempt
+    JOB_HEARTBEAT_INTERVAL = 30  # Seconds between heartbeats of a running job
+    JOB_STALE_AFTER = 300  # Seconds without heartbeat before a running job is reclaimed
+    CLAIM_CANDIDATES = 50  # Oldest runnable jobs a worker chooses from, skipping hosts and networks at their limits
+    JOB_POLL_INTERVAL = 5  # Seconds an idle worker waits before polling for jobs again
+    API_SCAN_CONCURRENCY = int(os.environ.get('API_SCAN_CONCURRENCY') or 2)  # Manual scans run per API process in 'local' dispatch
+
+    # Policy configuration
+    POLICY_PATH = os.environ.get('POLICY_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'policy.yaml')
+    REEVALUATE_INTERVAL = 300  # Seconds between checks for scans evaluated with an outdated policy
 
     # Application configuration
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-for-tls-guardian'
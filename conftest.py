@@ -0,0 +1,30 @@
+"""
+Shared setup of the tests that use the database.
+
+Points DATABASE_URL at a throwaway SQLite file before api is imported, so
+the tests never touch a configured database. Test modules that use the
+database import reset_database from here before anything that imports
+api, which also makes them runnable on their own as scripts.
+"""
+import os
+import sys
+import tempfile
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='tls_guardian_test_'), 'test.db')
+
+
+def reset_database():
+    """Drop every table of the test database and create the current schema (inside an app context)."""
+    from api import db
+    from sqlalchemy import MetaData
+
+    db.session.remove()
+    db.drop_all()
+    # Tables of older schemas a test created by hand
+    metadata = MetaData()
+    metadata.reflect(bind=db.engine)
+    metadata.drop_all(bind=db.engine)
+    db.create_all()
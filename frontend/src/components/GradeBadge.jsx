@@ -15,6 +15,7 @@ const gradeConfig = {
   'WARN': { bg: 'bg-yellow-500', text: 'text-white', ring: 'ring-yellow-300' },
   'WARNING': { bg: 'bg-yellow-500', text: 'text-white', ring: 'ring-yellow-300' },
   'FAIL': { bg: 'bg-red-500', text: 'text-white', ring: 'ring-red-300' },
+  'UNREACHABLE': { bg: 'bg-slate-600', text: 'text-white', ring: 'ring-slate-300' },
   'UNKNOWN': { bg: 'bg-gray-400', text: 'text-white', ring: 'ring-gray-200' },
 };
 
@@ -45,6 +46,7 @@ const GradeBadge = ({ grade, size = 'md', showLabel = false }) => {
   const displayGrade = grade === 'PASS' ? 'P' :
                      grade === 'WARN' || grade === 'WARNING' ? 'W' :
                      grade === 'FAIL' ? 'F' :
+                     grade === 'UNREACHABLE' ? 'U' :
                      grade === 'UNKNOWN' ? '?' :
                      grade || '?';
 
@@ -73,6 +75,7 @@ const GradeBadge = ({ grade, size = 'md', showLabel = false }) => {
            grade === 'PASS' ? 'Pass' :
            grade === 'WARN' || grade === 'WARNING' ? 'Warning' :
            grade === 'FAIL' ? 'Fail' :
+           grade === 'UNREACHABLE' ? 'Unreachable' :
            'Unknown'}
         </span>
       )}
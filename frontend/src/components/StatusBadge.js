@@ -10,6 +10,8 @@ function StatusBadge({ status }) {
         return 'warning';
       case 'FAIL':
         return 'danger';
+      case 'UNREACHABLE':
+        return 'dark';
       default:
         return 'secondary';
     }
@@ -23,6 +25,8 @@ function StatusBadge({ status }) {
         return 'WARN';
       case 'FAIL':
         return 'FAIL';
+      case 'UNREACHABLE':
+        return 'UNREACHABLE';
       default:
         return 'UNKNOWN';
     }
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { Button } from '../components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
@@ -8,6 +8,15 @@ import { ArrowLeft, RefreshCw, Shield, Lock, AlertTriangle, CheckCircle, Externa
 import { calculateGrade, predictGradeImprovement } from '../lib/grades';
 import { getVulnerabilitySeverity, getCVECategory } from '../lib/utils';
 
+// Detailed SSL info sections each tab shows, fetched from the scan's section links when it is first opened
+const TAB_SECTIONS = {
+  protocols: ['protocol_info'],
+  ciphers: ['cipher_info'],
+  certificates: ['certificate_info', 'misc_info'],
+  vulnerabilities: ['vulnerabilities', 'misc_info'],
+  misc: ['misc_info'],
+};
+
 const ApplicationDetail = () => {
   const { id } = useParams();
   const navigate = useNavigate();
@@ -23,6 +32,8 @@ const ApplicationDetail = () => {
   });
   const [mobileMenuOpen, setMobileMenuOpen] = useState(false);
   const [activeTab, setActiveTab] = useState('summary');
+  const [sections, setSections] = useState({}); // Fetched detail sections by URL
+  const requestedSections = useRef(new Set());
 
   const fetchApplicationDetail = useCallback(async () => {
     try {
@@ -47,6 +58,23 @@ const ApplicationDetail = () => {
     }
   }, [application]);
 
+  useEffect(() => {
+    const links = application?.details?.sections || {};
+    (TAB_SECTIONS[activeTab] || [])
+      .map(name => links[name])
+      .filter(url => url && !requestedSections.current.has(url))
+      .forEach(url => {
+        requestedSections.current.add(url);
+        fetch(url)
+          .then(response => (response.ok ? response.json() : {}))
+          .catch(error => {
+            console.error('Error fetching scan details:', error);
+            return {};
+          })
+          .then(data => setSections(prev => ({ ...prev, [url]: data })));
+      });
+  }, [activeTab, application]);
+
   const triggerRescan = async () => {
     try {
       setRescanning(true);
@@ -151,13 +179,25 @@ const ApplicationDetail = () => {
     );
   }
 
+  // The summary of the latest scan's detailed SSL info, with the sections fetched so far
+  const sectionLinks = application.details?.sections || {};
+  const detailedInfo = { ...(application.details?.summary || {}) };
+  Object.entries(sectionLinks).forEach(([name, url]) => {
+    if (sections[url]) {
+      detailedInfo[name] = sections[url];
+    }
+  });
+  const sectionsLoading = (TAB_SECTIONS[activeTab] || []).some(name =>
+    sectionLinks[name] && !(sectionLinks[name] in sections)
+  );
+
   // Extract certificate expiration information
   const getCertExpirationInfo = () => {
-    if (!application.detailed_ssl_info?.certificate_info) {
+    if (!detailedInfo.certificate_info) {
       return null;
     }
 
-    const certInfo = application.detailed_ssl_info.certificate_info;
+    const certInfo = detailedInfo.certificate_info;
     for (const [key, value] of Object.entries(certInfo)) {
       if (key.toLowerCase().includes('not_after') ||
           key.toLowerCase().includes('expires') ||
@@ -190,7 +230,7 @@ const ApplicationDetail = () => {
 
   // Check if application has no scan data yet (initial scan in progress)
   const hasNoScanData = !application.last_scan_time &&
-                       (!application.detailed_ssl_info || Object.keys(application.detailed_ssl_info).length === 0) &&
+                       Object.keys(detailedInfo).length === 0 &&
                        application.scan_history && application.scan_history.length === 0;
 
   if (hasNoScanData) {
@@ -265,12 +305,23 @@ const ApplicationDetail = () => {
   }
 
   // Calculate grade from scan data
-  const gradeInfo = calculateGrade(application);
+  const gradeInfo = calculateGrade({ ...application, detailed_ssl_info: detailedInfo });
   const overallGrade = application.grade || gradeInfo.grade;
   const overallScore = application.score || gradeInfo.score;
 
   // Render detailed SSL information sections
+  const renderSectionsLoading = () => (
+    <div className="text-center py-12 text-gray-500">
+      <RefreshCw className="w-8 h-8 mx-auto mb-3 text-gray-300 animate-spin" />
+      <p>Loading scan details...</p>
+    </div>
+  );
+
   const renderDetailedSection = (sectionTitle, sectionData) => {
+    if (sectionsLoading) {
+      return renderSectionsLoading();
+    }
+
     if (!sectionData || Object.keys(sectionData).length === 0) {
       return (
         <div className="text-center py-12 text-gray-500">
@@ -321,6 +372,10 @@ const ApplicationDetail = () => {
 
   // Enhanced vulnerability rendering with severity grouping and categories
   const renderVulnerabilities = (vulnerabilityData) => {
+    if (sectionsLoading) {
+      return renderSectionsLoading();
+    }
+
     if (!vulnerabilityData || Object.keys(vulnerabilityData).length === 0) {
       return (
         <div className="text-center py-12">
@@ -634,9 +689,9 @@ const ApplicationDetail = () => {
                       <Shield className="w-8 h-8 text-blue-500" />
                       <div>
                         <p className="text-3xl font-bold text-blue-700">
-                          {application.detailed_ssl_info?.protocol_info ?
-                            Object.keys(application.detailed_ssl_info.protocol_info).filter(k =>
-                              application.detailed_ssl_info.protocol_info[k]?.finding?.toLowerCase().includes('offered')
+                          {detailedInfo.protocol_info ?
+                            Object.keys(detailedInfo.protocol_info).filter(k =>
+                              detailedInfo.protocol_info[k]?.finding?.toLowerCase().includes('offered')
                             ).length : 0}
                         </p>
                         <p className="text-sm text-blue-600">Protocols Supported</p>
@@ -649,9 +704,9 @@ const ApplicationDetail = () => {
                       <Lock className="w-8 h-8 text-green-500" />
                       <div>
                         <p className="text-3xl font-bold text-green-700">
-                          {application.detailed_ssl_info?.cipher_info ?
-                            Object.keys(application.detailed_ssl_info.cipher_info).filter(k =>
-                              application.detailed_ssl_info.cipher_info[k]?.finding?.toLowerCase().includes('offered') &&
+                          {detailedInfo.cipher_info ?
+                            Object.keys(detailedInfo.cipher_info).filter(k =>
+                              detailedInfo.cipher_info[k]?.finding?.toLowerCase().includes('offered') &&
                               (k.toLowerCase().includes('strong') || k.toLowerCase().includes('fs'))
                             ).length : 0}
                         </p>
@@ -665,9 +720,9 @@ const ApplicationDetail = () => {
                       <AlertTriangle className="w-8 h-8 text-red-500" />
                       <div>
                         <p className="text-3xl font-bold text-red-700">
-                          {application.detailed_ssl_info?.vulnerabilities ?
-                            Object.keys(application.detailed_ssl_info.vulnerabilities).filter(k =>
-                              !application.detailed_ssl_info.vulnerabilities[k]?.finding?.toLowerCase().includes('not vulnerable')
+                          {detailedInfo.vulnerabilities ?
+                            Object.keys(detailedInfo.vulnerabilities).filter(k =>
+                              !detailedInfo.vulnerabilities[k]?.finding?.toLowerCase().includes('not vulnerable')
                             ).length : 0}
                         </p>
                         <p className="text-sm text-red-600">Vulnerabilities</p>
@@ -753,7 +808,7 @@ const ApplicationDetail = () => {
 
                     {/* Show prediction */}
                     {(selectedFixes.protocol || selectedFixes.cipher || selectedFixes.certificate) && (() => {
-                      const prediction = predictGradeImprovement(application, selectedFixes);
+                      const prediction = predictGradeImprovement({ ...application, detailed_ssl_info: detailedInfo }, selectedFixes);
                       return (
                         <div className="mt-4 p-4 bg-white rounded-lg border border-blue-200">
                           <div className="grid grid-cols-3 gap-4">
@@ -803,7 +858,7 @@ const ApplicationDetail = () => {
                 <CardTitle className="text-lg">Protocol Support</CardTitle>
               </CardHeader>
               <CardContent>
-                {renderDetailedSection('Protocol Support', application.detailed_ssl_info?.protocol_info)}
+                {renderDetailedSection('Protocol Support', detailedInfo.protocol_info)}
               </CardContent>
             </Card>
           </TabsContent>
@@ -814,7 +869,7 @@ const ApplicationDetail = () => {
                 <CardTitle className="text-lg">Cipher Information</CardTitle>
               </CardHeader>
               <CardContent>
-                {renderDetailedSection('Cipher Information', application.detailed_ssl_info?.cipher_info)}
+                {renderDetailedSection('Cipher Information', detailedInfo.cipher_info)}
               </CardContent>
             </Card>
           </TabsContent>
@@ -826,12 +881,12 @@ const ApplicationDetail = () => {
               </CardHeader>
               <CardContent>
                 {renderDetailedSection('Certificate Information',
-                  application.detailed_ssl_info?.certificate_info &&
-                  Object.keys(application.detailed_ssl_info?.certificate_info).length > 0
-                    ? application.detailed_ssl_info?.certificate_info
+                  detailedInfo.certificate_info &&
+                  Object.keys(detailedInfo.certificate_info).length > 0
+                    ? detailedInfo.certificate_info
                     : (() => {
                         // Filter misc_info to only include certificate-related data
-                        const miscInfo = application.detailed_ssl_info?.misc_info || {};
+                        const miscInfo = detailedInfo.misc_info || {};
                         const certRelatedKeys = Object.keys(miscInfo).filter(key =>
                           key.toLowerCase().includes('cert') ||
                           key.toLowerCase().includes('certificate') ||
@@ -859,8 +914,8 @@ const ApplicationDetail = () => {
                 {renderVulnerabilities(
                   (() => {
                     // Combine vulnerabilities from vulnerabilities section with vulnerability-related data from misc_info
-                    const vulns = { ...application.detailed_ssl_info?.vulnerabilities || {} };
-                    const miscInfo = application.detailed_ssl_info?.misc_info || {};
+                    const vulns = { ...detailedInfo.vulnerabilities || {} };
+                    const miscInfo = detailedInfo.misc_info || {};
 
                     // Look for vulnerability-related keys in misc_info
                     Object.keys(miscInfo).forEach(key => {
@@ -980,7 +1035,7 @@ const ApplicationDetail = () => {
                 {renderDetailedSection('Miscellaneous Configuration',
                   (() => {
                     // Filter misc_info to exclude certificate, protocol, cipher, and vulnerability data
-                    const miscInfo = application.detailed_ssl_info?.misc_info || {};
+                    const miscInfo = detailedInfo.misc_info || {};
                     const allKeys = Object.keys(miscInfo);
 
                     const filteredMiscInfo = {};
@@ -15,8 +15,13 @@ import ApplicationCard from '../components/ApplicationCard';
 import { Shield, AlertTriangle, CheckCircle, XCircle, Plus, Zap } from 'lucide-react';
 import EditApplicationDialog from '../components/EditApplicationDialog';
 
+const PAGE_SIZE = 50;
+
 const Dashboard = () => {
   const [applications, setApplications] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [summary, setSummary] = useState(null);
   const [loading, setLoading] = useState(true);
   const [showAddDialog, setShowAddDialog] = useState(false);
   const [newAppUrl, setNewAppUrl] = useState('');
@@ -29,9 +34,12 @@ const Dashboard = () => {
   const [activeScan, setActiveScan] = useState(null);
   const [scanProgress, setScanProgress] = useState(0);
 
+  // Filtering happens on the server; reload the first page when the filters change
   useEffect(() => {
-    fetchApplications();
-  }, []);
+    const debounce = setTimeout(() => fetchApplications(), 300);
+    return () => clearTimeout(debounce);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [searchQuery, filterStatus]);
 
   // Poll for active scans every 2 seconds
   useEffect(() => {
@@ -65,11 +73,37 @@ const Dashboard = () => {
     return () => clearInterval(pollInterval);
   }, [applications, activeScan]);
 
+  const buildApplicationsQuery = (cursor) => {
+    const params = new URLSearchParams({ limit: PAGE_SIZE });
+    if (searchQuery) {
+      params.set('q', searchQuery);
+    }
+    if (filterStatus !== 'all') {
+      params.set('status', filterStatus.toUpperCase());
+    }
+    if (cursor) {
+      params.set('cursor', cursor);
+    }
+    return `/api/applications?${params.toString()}`;
+  };
+
+  const fetchSummary = async () => {
+    try {
+      const response = await fetch('/api/summary');
+      setSummary(await response.json());
+    } catch (error) {
+      console.error('Error fetching summary:', error);
+    }
+  };
+
+  // Reload the first page (and the summary counts)
   const fetchApplications = async () => {
     try {
-      const response = await fetch('/api/applications');
+      const response = await fetch(buildApplicationsQuery(null));
       const data = await response.json();
-      setApplications(data);
+      setApplications(data.items);
+      setNextCursor(data.next_cursor);
+      fetchSummary();
     } catch (error) {
       console.error('Error fetching applications:', error);
     } finally {
@@ -77,6 +111,21 @@ const Dashboard = () => {
     }
   };
 
+  const loadMoreApplications = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await fetch(buildApplicationsQuery(nextCursor));
+      const data = await response.json();
+      setApplications(prev => [...prev, ...data.items]);
+      setNextCursor(data.next_cursor);
+    } catch (error) {
+      console.error('Error fetching applications:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleAddApplication = async (e) => {
     e.preventDefault();
     setAdding(true);
@@ -195,53 +244,15 @@ const Dashboard = () => {
     setShowEditDialog(true);
   };
 
-  // Filter applications
-  const filteredApplications = applications.filter(app => {
-    // Search filter (by name or URL)
-    const matchesSearch = searchQuery === '' ||
-      app.name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-      app.url.toLowerCase().includes(searchQuery.toLowerCase());
+  // Applications are filtered by the server
+  const filteredApplications = applications;
 
-    // Status filter
-    let matchesStatus = true;
-    if (filterStatus !== 'all') {
-      const status = app.status?.toLowerCase() || '';
-
-      if (filterStatus === 'pass') {
-        matchesStatus = status === 'pass' || status.startsWith('a') || status === 'b';
-      } else if (filterStatus === 'warn') {
-        matchesStatus = status === 'warn' || status === 'c';
-      } else if (filterStatus === 'fail') {
-        matchesStatus = status === 'fail' || status === 'd' || status === 'e' || status === 'f';
-      }
-    }
-
-    return matchesSearch && matchesStatus;
-  });
-
-  // Calculate statistics
-  const totalApps = applications.length;
-  const passingApps = applications.filter(app =>
-    app.status && (
-      app.status.toLowerCase() === 'pass' ||
-      app.status.toLowerCase().startsWith('a') ||
-      app.status.toLowerCase() === 'b'
-    )
-  ).length;
-  const warningApps = applications.filter(app =>
-    app.status && (
-      app.status.toLowerCase() === 'warn' ||
-      app.status.toLowerCase() === 'c'
-    )
-  ).length;
-  const failingApps = applications.filter(app =>
-    app.status && (
-      app.status.toLowerCase() === 'fail' ||
-      app.status.toLowerCase() === 'd' ||
-      app.status.toLowerCase() === 'e' ||
-      app.status.toLowerCase() === 'f'
-    )
-  ).length;
+  // Statistics cover all applications, not just the loaded pages
+  const statusCounts = summary?.status_counts || {};
+  const totalApps = summary ? summary.total_applications : applications.length;
+  const passingApps = statusCounts.PASS || 0;
+  const warningApps = statusCounts.WARN || 0;
+  const failingApps = statusCounts.FAIL || 0;
 
   if (loading) {
     return (
@@ -385,13 +396,13 @@ const Dashboard = () => {
           <div className="flex flex-col md:flex-row md:justify-between md:items-center gap-4 mb-4">
             <h2 className="text-xl font-semibold text-gray-900">
               Applications
-              {applications.length > 0 && (
-                <span className="text-gray-400 font-normal ml-2">({filteredApplications.length}/{applications.length})</span>
+              {totalApps > 0 && (
+                <span className="text-gray-400 font-normal ml-2">({filteredApplications.length}{nextCursor ? '+' : ''}/{totalApps})</span>
               )}
             </h2>
 
             {/* Search and Filter Controls */}
-            {applications.length > 0 && (
+            {totalApps > 0 && (
               <div className="flex flex-col gap-2 w-full md:w-auto">
                 <Input
                   type="text"
@@ -414,7 +425,7 @@ const Dashboard = () => {
             )}
           </div>
 
-          {applications.length === 0 ? (
+          {totalApps === 0 ? (
             <Card className="border-dashed">
               <CardContent className="py-16 text-center">
                 <div className="mx-auto w-16 h-16 bg-gray-100 rounded-full flex items-center justify-center mb-4">
@@ -470,6 +481,13 @@ const Dashboard = () => {
                   onEdit={openEditDialog}
                 />
               ))}
+              {nextCursor && (
+                <div className="flex justify-center pt-2">
+                  <Button variant="outline" onClick={loadMoreApplications} disabled={loadingMore}>
+                    {loadingMore ? 'Loading...' : 'Load more'}
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </div>
@@ -0,0 +1,282 @@
+"""
+Persistent scan job queue backed by the scan_jobs table.
+
+Any number of worker processes, on any number of nodes, claim jobs with
+SELECT ... FOR UPDATE SKIP LOCKED, so each job is handed to exactly one
+worker without workers blocking each other. Job lifecycle:
+
+    QUEUED -> RUNNING -> DONE
+                      -> RETRY -> RUNNING ... -> FAILED
+
+Running jobs send heartbeats; a job whose worker stopped heartbeating is
+reclaimed and retried (or failed once its attempts are used up).
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from config import Config
+from api import db, Application, ScanJob
+from scan_store import record_scan_error
+import scan_profiles
+from scan_schedule import claim_due_targets
+from targets import target_application_ids, application_limit_keys
+from scan_limits import pick_fair
+
+QUEUED = 'QUEUED'
+RUNNING = 'RUNNING'
+RETRY = 'RETRY'
+DONE = 'DONE'
+FAILED = 'FAILED'
+
+ACTIVE_STATUSES = (QUEUED, RUNNING, RETRY)
+CLAIMABLE_STATUSES = (QUEUED, RETRY)
+
+
+def enqueue_scan(application_id: int, run_after: Optional[datetime] = None,
+                 max_attempts: Optional[int] = None, full_scan: bool = False,
+                 profile: str = scan_profiles.FAST, planned_finish: Optional[datetime] = None,
+                 return_created: bool = False):
+    """
+    Queue a scan for an application.
+
+    If the application already has an active (queued, running or retrying)
+    job, that job is returned instead of creating a duplicate.
+
+    Args:
+        application_id: Application to scan
+        run_after: Earliest time the job may run (defaults to now)
+        max_attempts: Attempts before the job fails (defaults to Config.JOB_MAX_ATTEMPTS)
+        full_scan: Run testssl.sh even if the target's fingerprint is unchanged;
+            also applied to an existing queued job
+        profile: Scan profile to run (see scan_profiles.py); a queued job is
+            upgraded if a broader profile is requested
+        planned_finish: Predicted finish of a job planned by the scan window
+            planner; run_after is then recorded as its planned start
+        return_created: Also return whether a new job was created
+
+    Returns:
+        The new or existing ScanJob (committed), or (job, created) if return_created
+    """
+    job = _active_job(application_id)
+    created = False
+    if not job:
+        job = ScanJob(
+            application_id=application_id,
+            status=QUEUED,
+            run_after=run_after or datetime.utcnow(),
+            max_attempts=max_attempts or Config.JOB_MAX_ATTEMPTS,
+            full_scan=full_scan,
+            scan_profile=profile,
+            planned_start=run_after if planned_finish else None,
+            planned_finish=planned_finish
+        )
+        db.session.add(job)
+        try:
+            db.session.commit()
+            created = True
+        except IntegrityError:
+            # Another process queued a job for this application concurrently
+            db.session.rollback()
+            job = _active_job(application_id)
+
+    if job and job.status != RUNNING and ((full_scan and not job.full_scan) or
+                                          scan_profiles.broadest(job.scan_profile, profile) != job.scan_profile):
+        job.full_scan = job.full_scan or full_scan
+        job.scan_profile = scan_profiles.broadest(job.scan_profile, profile)
+        db.session.commit()
+
+    return (job, created) if return_created else job
+
+
+def _active_job(application_id: int) -> Optional[ScanJob]:
+    return ScanJob.query.filter(
+        ScanJob.application_id == application_id,
+        ScanJob.status.in_(ACTIVE_STATUSES)
+    ).order_by(ScanJob.id).first()
+
+
+def enqueue_due_applications(include_all: bool = False) -> List[ScanJob]:
+    """
+    Queue a scan for every scan target with due applications (see
+    scan_schedule.claim_due_targets), through its first due application;
+    the worker shares the result with the target's other applications.
+
+    Args:
+        include_all: Queue every target, not just the due ones
+
+    Returns:
+        The active job per target
+    """
+    return [enqueue_scan(target.application_ids[0], profile=target.profile)
+            for target in claim_due_targets(include_all=include_all)]
+
+
+def enqueue_all_applications() -> List[ScanJob]:
+    """Queue a scan for every scan target, due or not. Returns the active job per target."""
+    return enqueue_due_applications(include_all=True)
+
+
+def claim_next_job(worker_id: str) -> Optional[ScanJob]:
+    """
+    Claim the next runnable job for worker_id and mark it RUNNING. Among
+    the oldest Config.CLAIM_CANDIDATES runnable jobs, the one whose network
+    has the fewest running scans is taken, skipping jobs whose host or
+    network is at its concurrency limit.
+
+    Returns:
+        The claimed ScanJob, or None if nothing is runnable
+    """
+    now = datetime.utcnow()
+    candidates = ScanJob.query.filter(
+        ScanJob.status.in_(CLAIMABLE_STATUSES),
+        ScanJob.run_after <= now
+    ).order_by(
+        ScanJob.run_after, ScanJob.id
+    ).limit(Config.CLAIM_CANDIDATES).with_for_update(skip_locked=True).all()
+    job = _pick_within_limits(candidates) if candidates else None
+
+    if not job:
+        db.session.rollback()  # Release the transaction opened by the select
+        return None
+    return _claim(job, worker_id, now)
+
+
+def claim_job(job_id: int, worker_id: str) -> Optional[ScanJob]:
+    """
+    Claim a specific queued job for worker_id and mark it RUNNING, whatever
+    its run_after and the concurrency limits (e.g. to run a manual scan
+    right away).
+
+    Returns:
+        The claimed ScanJob, or None if it is not claimable (e.g. already running or finished)
+    """
+    job = db.session.get(ScanJob, job_id)
+    if not job or job.status not in CLAIMABLE_STATUSES:
+        db.session.rollback()
+        return None
+    return _claim(job, worker_id, datetime.utcnow())
+
+
+def _claim(job: ScanJob, worker_id: str, now: datetime) -> Optional[ScanJob]:
+    # Conditional update so databases without SKIP LOCKED (SQLite) can't hand
+    # the same job to two workers
+    claimed = ScanJob.query.filter(
+        ScanJob.id == job.id,
+        ScanJob.status.in_(CLAIMABLE_STATUSES)
+    ).update({
+        'status': RUNNING,
+        'worker_id': worker_id,
+        'attempts': ScanJob.attempts + 1,
+        'started_at': now,
+        'heartbeat_at': now,
+        'error': None
+    }, synchronize_session=False)
+    db.session.commit()
+
+    if not claimed:
+        return None
+    db.session.refresh(job)
+    return job
+
+
+def _pick_within_limits(candidates: List[ScanJob]) -> Optional[ScanJob]:
+    """
+    The candidate to run next within the per-host and per-network limits,
+    counting the jobs running on any worker (see scan_limits.py). Workers
+    claiming at the same moment may both see a network below its cap, so
+    across workers the caps can briefly be exceeded by one scan per worker.
+    """
+    running_ids = [app_id for app_id, in db.session.query(ScanJob.application_id).filter(ScanJob.status == RUNNING)]
+    keys = application_limit_keys(running_ids + [job.application_id for job in candidates])
+    running: Dict[str, int] = {}
+    for app_id in running_ids:
+        for key in keys.get(app_id, ()):
+            running[key] = running.get(key, 0) + 1
+    index = pick_fair([keys.get(job.application_id, set()) for job in candidates], running)
+    return candidates[index] if index is not None else None
+
+
+def heartbeat(job_id: int, worker_id: str) -> bool:
+    """
+    Record that worker_id is still working on a job.
+
+    Returns:
+        False if the job is no longer held by this worker (e.g. it was reclaimed)
+    """
+    updated = ScanJob.query.filter_by(
+        id=job_id, worker_id=worker_id, status=RUNNING
+    ).update({'heartbeat_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    return updated == 1
+
+
+def mark_job_done(job: ScanJob, scan_id: int) -> None:
+    """Mark a job DONE with the scan it produced. Does not commit."""
+    job.status = DONE
+    job.scan_id = scan_id
+    job.finished_at = datetime.utcnow()
+
+
+def mark_job_failed(job: ScanJob, error: str, retry: bool = True) -> None:
+    """
+    Record a failed attempt. The job is retried with exponential backoff
+    until max_attempts is reached (or right away without retry), then
+    marked FAILED with a failed Scan recorded for its application. Does
+    not commit.
+    """
+    _schedule_retry_or_fail(job, error, datetime.utcnow(), retry)
+
+
+def complete_job(job: ScanJob, scan_id: int) -> None:
+    """mark_job_done and commit the session."""
+    mark_job_done(job, scan_id)
+    db.session.commit()
+
+
+def fail_job(job: ScanJob, error: str, retry: bool = True) -> None:
+    """mark_job_failed and commit the session."""
+    mark_job_failed(job, error, retry)
+    db.session.commit()
+
+
+def reclaim_stale_jobs(stale_after: Optional[int] = None) -> int:
+    """
+    Return RUNNING jobs whose worker stopped heartbeating to the queue.
+
+    Args:
+        stale_after: Seconds without heartbeat (defaults to Config.JOB_STALE_AFTER)
+
+    Returns:
+        Number of jobs reclaimed
+    """
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=stale_after or Config.JOB_STALE_AFTER)
+    stale_jobs = ScanJob.query.filter(
+        ScanJob.status == RUNNING,
+        ScanJob.heartbeat_at < cutoff
+    ).with_for_update(skip_locked=True).all()
+
+    for job in stale_jobs:
+        _schedule_retry_or_fail(job, f'Worker {job.worker_id} stopped sending heartbeats', now)
+
+    db.session.commit()
+    return len(stale_jobs)
+
+
+def _schedule_retry_or_fail(job: ScanJob, error: str, now: datetime, retry: bool = True) -> None:
+    job.error = error
+    job.worker_id = None
+    if retry and job.attempts < job.max_attempts:
+        job.status = RETRY
+        job.run_after = now + timedelta(seconds=Config.JOB_RETRY_BACKOFF * 2 ** max(job.attempts - 1, 0))
+    else:
+        # Out of attempts: record a failed scan so the dashboard reflects it
+        job.status = FAILED
+        job.finished_at = now
+        job.scan_id = record_scan_error(job.application_id, error).id
+        application = db.session.get(Application, job.application_id)
+        for app_id in (target_application_ids(application, job.scan_profile)[1:] if application else []):
+            record_scan_error(app_id, error)
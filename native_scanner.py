@@ -0,0 +1,630 @@
+"""
+In-process TLS scan backend for quick checks.
+
+Starting testssl.sh costs seconds of bash and openssl start-up and hundreds
+of process forks, even for a scan that only looks at the protocols and the
+certificate. NativeTLSScanner runs those checks with asyncio sockets and the
+ssl module instead and returns the same testssl.sh JSON entries, so the
+rule engine evaluates its results unchanged:
+
+    -p  protocols        one raw ClientHello per protocol version (SSLv3 to
+                         TLS 1.3, like testssl.sh's socket checks); the
+                         version in the ServerHello tells whether it is offered
+    -S  serverDefaults   certificate chain (from the TLS 1.2 Certificate
+                         message), key size, signature algorithm, names,
+                         expiry, chain of trust and OCSP stapling (whether a
+                         CertificateStatus message answers status_request)
+
+The negotiated protocol and cipher of a default handshake are reported in
+serverPreferences. All connections of a scan run concurrently and one event
+loop scans many targets at once (scan_batch), so the quick tier covers
+thousands of hosts per minute. SSLv2 and the other testssl.sh checks are not
+supported; supports() tells the callers when to fall back to testssl.sh.
+"""
+
+import asyncio
+import os
+import socket
+import ssl
+import subprocess
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+from scanner import (ScannerBackend, SCAN_TIMEOUT, OPENSSL_TIMEOUT, parse_target, _probe_context)
+
+NATIVE_SCAN_CONCURRENCY = 500  # Targets scan_batch scans at once by default
+
+# testssl.sh protocol ids and the record versions probed for them
+PROTOCOL_VERSIONS = (('SSLv3', 0x0300), ('TLS1', 0x0301), ('TLS1_1', 0x0302), ('TLS1_2', 0x0303),
+                     ('TLS1_3', 0x0304))
+# testssl.sh's (severity, finding) for each protocol when offered and when not offered
+_PROTOCOL_FINDINGS = {
+    'SSLv3': (('HIGH', 'offered'), ('OK', 'not offered')),
+    'TLS1': (('LOW', 'offered (deprecated)'), ('INFO', 'not offered')),
+    'TLS1_1': (('LOW', 'offered (deprecated)'), ('INFO', 'not offered')),
+    'TLS1_2': (('OK', 'offered'), ('MEDIUM', 'not offered')),
+    'TLS1_3': (('OK', 'offered with final'), ('INFO', 'not offered')),
+}
+
+# Cipher suites offered in the ClientHellos: enough that any server supporting the version picks one
+_TLS13_CIPHERS = (0x1301, 0x1302, 0x1303)
+_TLS_CIPHERS = (0xc02b, 0xc02f, 0xc02c, 0xc030, 0xcca9, 0xcca8, 0xc009, 0xc013, 0xc00a, 0xc014, 0xc023, 0xc027,
+                0xc024, 0xc028, 0x009e, 0x009f, 0x0033, 0x0039, 0x009c, 0x009d, 0x002f, 0x0035, 0x003c, 0x003d,
+                0xc012, 0xc008, 0x0016, 0x000a, 0xc011, 0xc007, 0x0005, 0x0004)
+_SSL3_CIPHERS = (0xc014, 0xc013, 0x0039, 0x0033, 0x0035, 0x002f, 0xc012, 0x0016, 0x000a, 0x0005, 0x0004)
+_GROUPS = (0x001d, 0x0017, 0x0018, 0x0019)  # x25519, secp256r1, secp384r1, secp521r1
+_SIGNATURE_ALGORITHMS = (0x0403, 0x0503, 0x0603, 0x0804, 0x0805, 0x0806, 0x0401, 0x0501, 0x0601, 0x0203, 0x0201)
+
+# TLS record content types and handshake message types
+_ALERT, _HANDSHAKE = 21, 22
+_SERVER_HELLO, _CERTIFICATE, _SERVER_HELLO_DONE, _CERTIFICATE_STATUS = 2, 11, 14, 22
+_MAX_FLIGHT = 1 << 17  # Most handshake bytes read from one server
+
+_OID_NAMES = {
+    '2.5.4.3': 'CN', '2.5.4.10': 'O', '2.5.4.6': 'C',
+    '1.2.840.113549.1.1.1': 'RSA', '1.2.840.10045.2.1': 'EC', '1.3.101.112': 'EdDSA', '1.3.101.113': 'EdDSA',
+    '1.2.840.10045.3.1.7': 'P-256', '1.3.132.0.34': 'P-384', '1.3.132.0.35': 'P-521',
+    '1.2.840.113549.1.1.4': 'MD5 with RSA', '1.2.840.113549.1.1.5': 'SHA1 with RSA',
+    '1.2.840.113549.1.1.11': 'SHA256 with RSA', '1.2.840.113549.1.1.12': 'SHA384 with RSA',
+    '1.2.840.113549.1.1.13': 'SHA512 with RSA', '1.2.840.113549.1.1.10': 'RSASSA-PSS',
+    '1.2.840.10045.4.1': 'ECDSA with SHA1', '1.2.840.10045.4.3.2': 'ECDSA with SHA256',
+    '1.2.840.10045.4.3.3': 'ECDSA with SHA384', '1.2.840.10045.4.3.4': 'ECDSA with SHA512',
+}
+_CURVE_BITS = {'P-256': 256, 'P-384': 384, 'P-521': 521}
+_EXT_SUBJECT_ALT_NAME = '2.5.29.17'
+_EXT_AUTHORITY_INFO_ACCESS = '1.3.6.1.5.5.7.1.1'
+_EXT_TLS_FEATURE = '1.3.6.1.5.5.7.1.24'  # OCSP must-staple
+_OCSP_ACCESS_METHOD = '1.3.6.1.5.5.7.48.1'
+
+
+class NativeTLSScanner(ScannerBackend):
+    """
+    Protocol and certificate checks without testssl.sh (see the module docstring).
+    """
+
+    SUPPORTED_CHECKS = frozenset(('-p', '-S'))
+
+    def supports(self, checks: Optional[List[str]]) -> bool:
+        """Only scans limited to protocol and certificate checks; a default run needs testssl.sh."""
+        return checks is not None and set(checks) <= self.SUPPORTED_CHECKS
+
+    def scan_url(self, url: str, checks: Optional[List[str]] = None, fast: bool = True,
+                 timeout: float = SCAN_TIMEOUT, openssl_timeout: int = OPENSSL_TIMEOUT) -> Dict:
+        """
+        Scan a URL in-process and return testssl.sh-compatible JSON results.
+
+        Args:
+            url: The URL to scan (e.g., "https://example.com")
+            checks: testssl.sh checks to run, a subset of SUPPORTED_CHECKS
+            fast: Ignored; the native checks are always fast
+            timeout: Seconds allowed for the whole scan
+            openssl_timeout: Seconds allowed for each connection
+
+        Raises:
+            ValueError: If checks includes checks the backend does not support
+            subprocess.TimeoutExpired: If the scan does not finish within
+                timeout (like TestSSLScanner, so callers handle both alike)
+            RuntimeError: If the target does not complete any TLS handshake
+        """
+        return asyncio.run(self.scan_url_async(url, timeout, checks, fast, openssl_timeout))
+
+    async def scan_url_async(self, url: str, timeout: float = SCAN_TIMEOUT,
+                             checks: Optional[List[str]] = None, fast: bool = True,
+                             openssl_timeout: int = OPENSSL_TIMEOUT) -> Dict:
+        """Asyncio counterpart of scan_url."""
+        if not self.supports(checks):
+            raise ValueError(f"Native scans only support the checks {' '.join(sorted(self.SUPPORTED_CHECKS))}")
+        try:
+            return await asyncio.wait_for(self._scan(url, checks, openssl_timeout), timeout)
+        except asyncio.TimeoutError:
+            raise subprocess.TimeoutExpired(f'native scan of {url}', timeout)
+
+    def scan_batch(self, urls: List[str], max_parallel: int = NATIVE_SCAN_CONCURRENCY,
+                   checks: Optional[List[str]] = None, timeout: float = SCAN_TIMEOUT,
+                   openssl_timeout: int = OPENSSL_TIMEOUT) -> Dict[str, Union[Dict, Exception]]:
+        """
+        Scan many URLs on one event loop, at most max_parallel at a time.
+
+        Args:
+            checks: testssl.sh checks to run (defaults to all of SUPPORTED_CHECKS)
+
+        Returns:
+            Dict mapping each URL to its results, or to the exception its scan raised
+        """
+        checks = checks or sorted(self.SUPPORTED_CHECKS)
+
+        async def scan_all():
+            semaphore = asyncio.Semaphore(max_parallel)
+
+            async def scan_one(url):
+                async with semaphore:
+                    return await self.scan_url_async(url, timeout, checks, True, openssl_timeout)
+
+            results = await asyncio.gather(*(scan_one(url) for url in urls), return_exceptions=True)
+            return dict(zip(urls, results))
+
+        return asyncio.run(scan_all())
+
+    async def _scan(self, url: str, checks: List[str], timeout: float) -> Dict:
+        started = time.monotonic()
+        host, port = parse_target(url)
+        loop = asyncio.get_running_loop()
+        ip = (await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM))[0][4][0]
+
+        # Every protocol probe and the default handshake run at the same time
+        probes = await asyncio.gather(
+            *(_probe_protocol(ip, host, port, version, timeout, status_request=protocol_id == 'TLS1_2')
+              for protocol_id, version in PROTOCOL_VERSIONS),
+            _default_handshake(ip, host, port, timeout),
+            return_exceptions=True
+        )
+        protocol_probes = dict(zip((protocol_id for protocol_id, _ in PROTOCOL_VERSIONS), probes))
+        handshake = probes[-1]
+        if isinstance(handshake, Exception):
+            handshake = None
+
+        protocols = {protocol_id: None if isinstance(probe, Exception) else probe[0]
+                     for protocol_id, probe in protocol_probes.items()}
+        if handshake is None and not any(protocols.values()):
+            raise RuntimeError(f"{host}:{port} did not complete a TLS handshake")
+
+        # The TLS 1.2 probe sees the whole chain and any stapled OCSP response in the clear
+        chain, ocsp_stapled = [], None
+        tls12 = protocol_probes['TLS1_2']
+        if not isinstance(tls12, Exception) and tls12[0]:
+            messages = dict(tls12[1])
+            chain = _certificate_list(messages.get(_CERTIFICATE, b''))
+            ocsp_stapled = _CERTIFICATE_STATUS in messages
+        if not chain and handshake and handshake['certificate']:
+            chain = [handshake['certificate']]
+
+        return build_scan_document(host, port, ip, checks, protocols, handshake, chain, ocsp_stapled,
+                                   scan_time=time.monotonic() - started)
+
+
+def build_scan_document(host: str, port: int, ip: str, checks: List[str], protocols: Dict[str, Optional[bool]],
+                        handshake: Optional[Dict], chain: List[bytes], ocsp_stapled: Optional[bool],
+                        now: Optional[datetime] = None, scan_time: float = 0) -> Dict:
+    """
+    Build the testssl.sh JSON document of a native scan.
+
+    Args:
+        checks: The checks run; only their sections are included
+        protocols: Whether each protocol of PROTOCOL_VERSIONS is offered (None: the probe failed)
+        handshake: Result of the default handshake ('protocol', 'cipher',
+            'bits', 'certificate', 'verify_error'), None if it failed
+        chain: DER certificates the server sent, leaf first
+        ocsp_stapled: Whether the server staples an OCSP response (None: not tested)
+        now: Time certificate expiry is measured against (defaults to now)
+        scan_time: Seconds the scan took
+    """
+    entry: Dict = {'targetHost': host, 'ip': ip, 'port': str(port)}
+    if '-p' in checks:
+        entry['protocols'] = protocol_entries(protocols)
+    if handshake:
+        entry['serverPreferences'] = [
+            {'id': 'protocol_negotiated', 'severity': 'OK', 'finding': handshake['protocol'] or ''},
+            {'id': 'cipher_negotiated', 'severity': 'OK', 'finding': f"{handshake['cipher']}, {handshake['bits']} bit"},
+        ]
+    if '-S' in checks:
+        entry['serverDefaults'] = certificate_entries(
+            host, chain, handshake['verify_error'] if handshake else 'no TLS handshake', ocsp_stapled,
+            now or datetime.utcnow()
+        )
+    return {
+        'Invocation': f'native scan {" ".join(checks)} {host}:{port}',
+        'version': 'native',
+        'startTime': str(int(time.time() - scan_time)),
+        'scanResult': [entry],
+        'scanTime': round(scan_time, 3)
+    }
+
+
+def protocol_entries(protocols: Dict[str, Optional[bool]]) -> List[Dict]:
+    """testssl.sh protocols entries for the probed protocols."""
+    entries = []
+    for protocol_id, _ in PROTOCOL_VERSIONS:
+        offered = protocols.get(protocol_id)
+        if offered is None:
+            severity, finding = 'WARN', 'not tested (no answer to the ClientHello)'
+        else:
+            severity, finding = _PROTOCOL_FINDINGS[protocol_id][0 if offered else 1]
+        entries.append({'id': protocol_id, 'severity': severity, 'finding': finding})
+    return entries
+
+
+def certificate_entries(host: str, chain: List[bytes], verify_error: Optional[str],
+                        ocsp_stapled: Optional[bool], now: datetime) -> List[Dict]:
+    """testssl.sh serverDefaults certificate entries for a chain (see build_scan_document)."""
+    if not chain:
+        return [{'id': 'cert_numbers', 'severity': 'WARN', 'finding': 'no certificate received'}]
+    try:
+        leaf = parse_certificate(chain[0])
+    except ValueError as e:
+        return [{'id': 'cert_numbers', 'severity': 'WARN', 'finding': f'certificate could not be parsed: {e}'}]
+
+    def entry(entry_id, severity, finding):
+        return {'id': entry_id, 'severity': severity, 'finding': finding}
+
+    algorithm, bits, curve = leaf['key_algorithm'], leaf['key_bits'], leaf['curve']
+    if algorithm == 'RSA':
+        key_severity = 'CRITICAL' if bits < 1024 else 'HIGH' if bits < 2048 else 'OK'
+        key_finding = f'RSA {bits} bits'
+    elif algorithm == 'EC':
+        key_severity = 'HIGH' if bits and bits < 256 else 'OK'
+        key_finding = f'EC {bits} bits (curve {curve})' if bits else f'EC (curve {curve})'
+    else:
+        key_severity, key_finding = 'OK' if algorithm else 'INFO', f'{algorithm or "unknown"} {bits or ""} bits'.strip()
+
+    signature = leaf['signature_algorithm']
+    signature_severity = 'CRITICAL' if signature.startswith('MD5') else 'LOW' if 'SHA1' in signature else 'OK'
+
+    names = leaf['subject_alt_names']
+    trusted_name = _matches_host(host, names or [leaf['common_name']])
+    days_left = (leaf['not_after'] - now).days
+    if leaf['not_after'] <= now:
+        expiration = entry('cert_expirationStatus', 'CRITICAL', 'expired')
+    elif leaf['not_before'] > now:
+        expiration = entry('cert_expirationStatus', 'CRITICAL', 'not yet valid')
+    elif days_left < 30:
+        expiration = entry('cert_expirationStatus', 'HIGH', f'expires < 30 days ({days_left})')
+    elif days_left < 60:
+        expiration = entry('cert_expirationStatus', 'MEDIUM', f'expires < 60 days ({days_left})')
+    else:
+        expiration = entry('cert_expirationStatus', 'OK', f'{days_left} >= 60 days')
+
+    if ocsp_stapled is None:
+        stapling = entry('OCSP_stapling', 'INFO', 'not tested (no TLS 1.2 handshake)')
+    elif ocsp_stapled:
+        stapling = entry('OCSP_stapling', 'OK', 'offered')
+    else:
+        stapling = entry('OCSP_stapling', 'LOW', 'not offered')
+
+    entries = [
+        entry('cert_numbers', 'INFO', str(len(chain))),
+        entry('cert_signatureAlgorithm', signature_severity, signature),
+        entry('cert_keySize', key_severity, key_finding),
+        entry('cert_commonName', 'OK', leaf['common_name'] or 'no CN field in subject'),
+        entry('cert_subjectAltName', 'INFO' if names else 'HIGH',
+              ' '.join(names) if names else 'missing (NOT ok)'),
+        entry('cert_caIssuers', 'INFO', leaf['issuer']),
+        entry('cert_trust', 'OK' if trusted_name else 'HIGH',
+              'Ok via SAN' if trusted_name else f'certificate does not match supplied URI {host}'),
+        entry('cert_chain_of_trust', 'CRITICAL' if verify_error else 'OK',
+              f'failed ({verify_error}).' if verify_error else 'passed.'),
+        entry('cert_notBefore', 'INFO', leaf['not_before'].strftime('%Y-%m-%d %H:%M')),
+        entry('cert_notAfter', 'OK', leaf['not_after'].strftime('%Y-%m-%d %H:%M')),
+        expiration,
+        entry('cert_ocspURL', 'INFO', leaf['ocsp_url'] or '--'),
+        stapling,
+    ]
+    if leaf['must_staple']:
+        entries.append(entry('cert_mustStapleExtension', 'OK' if ocsp_stapled else 'HIGH',
+                             'supported' if ocsp_stapled else 'extension detected but no OCSP stapling provided'))
+
+    for number, der in enumerate(chain[1:], 1):
+        try:
+            intermediate = parse_certificate(der)
+        except ValueError:
+            continue
+        expired = intermediate['not_after'] <= now
+        entries += [
+            entry(f'intermediate_cert_chain <#{number}>', 'INFO',
+                  f"{intermediate['common_name']} <-- {intermediate['issuer']}"),
+            entry(f'intermediate_cert_notAfter <#{number}>', 'HIGH' if expired else 'OK',
+                  intermediate['not_after'].strftime('%Y-%m-%d %H:%M')),
+            entry(f'intermediate_cert_expiration <#{number}>', 'HIGH' if expired else 'OK',
+                  'expired' if expired else 'ok > 40 days'
+                  if (intermediate['not_after'] - now).days > 40 else 'expires <= 40 days'),
+        ]
+    return entries
+
+
+def _matches_host(host: str, names: List[str]) -> bool:
+    """Whether a certificate name (with a wildcard in the left-most label at most) covers the host."""
+    host = host.rstrip('.').lower()
+    for name in names:
+        name = (name or '').lower()
+        if name == host:
+            return True
+        if name.startswith('*.') and '.' in host and host.split('.', 1)[1] == name[2:]:
+            return True
+    return False
+
+
+# --- TLS handshake probes ---
+
+def _u16(value: int) -> bytes:
+    return value.to_bytes(2, 'big')
+
+
+def _extension(extension_type: int, data: bytes) -> bytes:
+    return _u16(extension_type) + _u16(len(data)) + data
+
+
+def client_hello(host: str, version: int, status_request: bool = False) -> bytes:
+    """
+    A ClientHello record offering only the given protocol version.
+
+    Args:
+        host: Sent as SNI unless it is an IP address
+        version: Record version (0x0300 SSLv3 to 0x0304 TLS 1.3)
+        status_request: Ask for a stapled OCSP response
+    """
+    tls13 = version == 0x0304
+    ciphers = _TLS13_CIPHERS if tls13 else _SSL3_CIPHERS if version == 0x0300 else _TLS_CIPHERS
+    extensions = b''
+    if version > 0x0300:
+        try:
+            socket.inet_pton(socket.AF_INET6 if ':' in host else socket.AF_INET, host)
+        except OSError:
+            name = host.encode('idna')
+            extensions += _extension(0x0000, _u16(len(name) + 3) + b'\x00' + _u16(len(name)) + name)
+        groups = b''.join(_u16(group) for group in _GROUPS)
+        algorithms = b''.join(_u16(algorithm) for algorithm in _SIGNATURE_ALGORITHMS)
+        extensions += _extension(0x000a, _u16(len(groups)) + groups)
+        extensions += _extension(0x000b, b'\x01\x00')  # Uncompressed EC points
+        extensions += _extension(0x000d, _u16(len(algorithms)) + algorithms)
+        extensions += _extension(0xff01, b'\x00')  # Secure renegotiation
+        if status_request:
+            extensions += _extension(0x0005, b'\x01\x00\x00\x00\x00')
+        if tls13:
+            extensions += _extension(0x002b, b'\x02\x03\x04')
+            # Any x25519 share will do: the probe stops at the ServerHello
+            extensions += _extension(0x0033, _u16(36) + _u16(0x001d) + _u16(32) + os.urandom(32))
+
+    cipher_suites = b''.join(_u16(cipher) for cipher in ciphers)
+    body = (_u16(min(version, 0x0303)) + os.urandom(32)
+            + (b'\x20' + os.urandom(32) if tls13 else b'\x00')  # TLS 1.3 middlebox compatibility session ID
+            + _u16(len(cipher_suites)) + cipher_suites + b'\x01\x00'
+            + (_u16(len(extensions)) + extensions if extensions else b''))
+    handshake = bytes([1]) + len(body).to_bytes(3, 'big') + body
+    return bytes([_HANDSHAKE]) + _u16(0x0300 if version == 0x0300 else 0x0301) + _u16(len(handshake)) + handshake
+
+
+def server_hello_version(body: bytes) -> Optional[int]:
+    """The protocol version a ServerHello body selects (from supported_versions for TLS 1.3)."""
+    if len(body) < 35:
+        return None
+    version = int.from_bytes(body[0:2], 'big')
+    offset = 35 + body[34] + 3  # Random, session ID, cipher suite and compression method
+    if offset + 2 > len(body):
+        return version
+    end = min(len(body), offset + 2 + int.from_bytes(body[offset:offset + 2], 'big'))
+    offset += 2
+    while offset + 4 <= end:
+        extension_type = int.from_bytes(body[offset:offset + 2], 'big')
+        length = int.from_bytes(body[offset + 2:offset + 4], 'big')
+        if extension_type == 0x002b and length == 2:
+            return int.from_bytes(body[offset + 4:offset + 6], 'big')
+        offset += 4 + length
+    return version
+
+
+async def _server_flight(reader: asyncio.StreamReader, until: int) -> List[Tuple[int, bytes]]:
+    """Read the server's handshake messages up to the first of type until, an alert or the end of the connection."""
+    messages, buffer, received = [], b'', 0
+    try:
+        while received < _MAX_FLIGHT:
+            header = await reader.readexactly(5)
+            payload = await reader.readexactly(int.from_bytes(header[3:5], 'big'))
+            received += len(payload)
+            if header[0] != _HANDSHAKE:
+                break  # An alert, or no TLS at all
+            buffer += payload
+            while len(buffer) >= 4 and len(buffer) >= 4 + int.from_bytes(buffer[1:4], 'big'):
+                length = int.from_bytes(buffer[1:4], 'big')
+                messages.append((buffer[0], buffer[4:4 + length]))
+                buffer = buffer[4 + length:]
+                if messages[-1][0] == until:
+                    return messages
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    return messages
+
+
+async def _probe_protocol(ip: str, host: str, port: int, version: int, timeout: float,
+                          status_request: bool = False) -> Tuple[bool, List[Tuple[int, bytes]]]:
+    """
+    Send a ClientHello offering only one protocol version.
+
+    With status_request the server's whole first flight is read (up to
+    ServerHelloDone), otherwise only its ServerHello.
+
+    Returns:
+        (whether the server selected the version, the handshake messages read)
+    """
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    try:
+        writer.write(client_hello(host, version, status_request))
+        await writer.drain()
+        messages = await asyncio.wait_for(
+            _server_flight(reader, _SERVER_HELLO_DONE if status_request else _SERVER_HELLO), timeout
+        )
+    finally:
+        writer.transport.abort()
+    server_hello = next((body for message_type, body in messages if message_type == _SERVER_HELLO), None)
+    return server_hello is not None and server_hello_version(server_hello) == version, messages
+
+
+async def _default_handshake(ip: str, host: str, port: int, timeout: float) -> Dict:
+    """
+    Complete a handshake as a modern client would, verifying the chain and
+    host name first and retrying without verification if that fails.
+    """
+    verify_error = None
+    try:
+        return await _handshake_async(ip, host, port, ssl.create_default_context(), timeout, verify_error)
+    except ssl.SSLCertVerificationError as e:
+        verify_error = e.verify_message
+    if verify_error and 'hostname mismatch' in verify_error.lower():
+        verify_error = None  # The chain is fine; cert_trust reports the name
+    return await _handshake_async(ip, host, port, _probe_context(legacy=True), timeout, verify_error)
+
+
+async def _handshake_async(ip: str, host: str, port: int, context: ssl.SSLContext, timeout: float,
+                           verify_error: Optional[str]) -> Dict:
+    _, writer = await asyncio.wait_for(
+        asyncio.open_connection(ip, port, ssl=context, server_hostname=host), timeout
+    )
+    try:
+        ssl_object = writer.get_extra_info('ssl_object')
+        cipher, _, bits = ssl_object.cipher()
+        return {'protocol': ssl_object.version(), 'cipher': cipher, 'bits': bits,
+                'certificate': ssl_object.getpeercert(binary_form=True), 'verify_error': verify_error}
+    finally:
+        writer.transport.abort()
+
+
+def _certificate_list(body: bytes) -> List[bytes]:
+    """The DER certificates of a TLS 1.2 Certificate message body."""
+    certificates, offset = [], 3
+    while offset + 3 <= len(body):
+        length = int.from_bytes(body[offset:offset + 3], 'big')
+        certificates.append(body[offset + 3:offset + 3 + length])
+        offset += 3 + length
+    return certificates
+
+
+# --- Minimal X.509 (DER) parsing ---
+
+def _der_element(data: bytes, offset: int) -> Tuple[int, int, int]:
+    """(tag, start, end) of the DER element at offset."""
+    if offset + 2 > len(data):
+        raise ValueError("truncated DER element")
+    tag, length = data[offset], data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        size = length & 0x7f
+        length = int.from_bytes(data[offset:offset + size], 'big')
+        offset += size
+    if offset + length > len(data):
+        raise ValueError("truncated DER element")
+    return tag, offset, offset + length
+
+
+def _der_children(data: bytes, start: int, end: int) -> List[Tuple[int, int, int]]:
+    children = []
+    while start < end:
+        child = _der_element(data, start)
+        children.append(child)
+        start = child[2]
+    return children
+
+
+def _oid(value: bytes) -> str:
+    arcs, current = [value[0] // 40, value[0] % 40], 0
+    for byte in value[1:]:
+        current = (current << 7) | (byte & 0x7f)
+        if not byte & 0x80:
+            arcs.append(current)
+            current = 0
+    return '.'.join(str(arc) for arc in arcs)
+
+
+def _der_time(tag: int, value: bytes) -> datetime:
+    text = value.decode('ascii').rstrip('Z')
+    if tag == 0x17:  # UTCTime, two-digit years 50-99 are 19xx
+        text = ('19' if int(text[:2]) >= 50 else '20') + text
+    return datetime.strptime(text[:14], '%Y%m%d%H%M%S')
+
+
+def _name_attributes(data: bytes, start: int, end: int) -> Dict[str, str]:
+    attributes = {}
+    for _, set_start, set_end in _der_children(data, start, end):
+        for _, attribute_start, attribute_end in _der_children(data, set_start, set_end):
+            (_, oid_start, oid_end), (_, value_start, value_end) = _der_children(data, attribute_start, attribute_end)[:2]
+            name = _OID_NAMES.get(_oid(data[oid_start:oid_end]))
+            if name:
+                attributes.setdefault(name, data[value_start:value_end].decode('utf-8', 'replace'))
+    return attributes
+
+
+def parse_certificate(der: bytes) -> Dict:
+    """
+    Parse the fields the certificate checks need from a DER certificate.
+
+    Returns:
+        Dict with common_name, issuer, subject_alt_names, not_before,
+        not_after, key_algorithm, key_bits, curve, signature_algorithm,
+        ocsp_url and must_staple
+
+    Raises:
+        ValueError: If the certificate is malformed
+    """
+    try:
+        _, start, end = _der_element(der, 0)
+        tbs, signature_algorithm = _der_children(der, start, end)[:2]
+        fields = _der_children(der, tbs[1], tbs[2])
+        if fields[0][0] == 0xa0:
+            fields = fields[1:]  # Explicit version
+        _, issuer, validity, subject, public_key = fields[1:6]
+        extensions = next((field for field in fields[6:] if field[0] == 0xa3), None)
+
+        (before_tag, before_start, before_end), (after_tag, after_start, after_end) = \
+            _der_children(der, validity[1], validity[2])[:2]
+        subject_names = _name_attributes(der, subject[1], subject[2])
+        issuer_names = _name_attributes(der, issuer[1], issuer[2])
+
+        key_algorithm_id, key_bits_string = _der_children(der, public_key[1], public_key[2])[:2]
+        key_algorithm_fields = _der_children(der, key_algorithm_id[1], key_algorithm_id[2])
+        key_algorithm = _OID_NAMES.get(_oid(der[key_algorithm_fields[0][1]:key_algorithm_fields[0][2]]))
+        key_bits, curve = None, None
+        if key_algorithm == 'RSA':
+            key = der[key_bits_string[1] + 1:key_bits_string[2]]  # Skip the unused-bits byte
+            _, key_start, key_end = _der_element(key, 0)
+            _, modulus_start, modulus_end = _der_children(key, key_start, key_end)[0]
+            key_bits = int.from_bytes(key[modulus_start:modulus_end], 'big').bit_length()
+        elif key_algorithm == 'EC' and len(key_algorithm_fields) > 1:
+            curve_oid = _oid(der[key_algorithm_fields[1][1]:key_algorithm_fields[1][2]])
+            curve = _OID_NAMES.get(curve_oid, curve_oid)
+            key_bits = _CURVE_BITS.get(curve)
+        elif key_algorithm == 'EdDSA':
+            key_bits = 8 * (key_bits_string[2] - key_bits_string[1] - 1)
+
+        signature_oid_start, signature_oid_end = _der_children(der, signature_algorithm[1], signature_algorithm[2])[0][1:]
+        signature_oid = _oid(der[signature_oid_start:signature_oid_end])
+
+        alt_names, ocsp_url, must_staple = [], None, False
+        if extensions:
+            _, list_start, list_end = _der_element(der, extensions[1])
+            for _, extension_start, extension_end in _der_children(der, list_start, list_end):
+                parts = _der_children(der, extension_start, extension_end)
+                extension_oid = _oid(der[parts[0][1]:parts[0][2]])
+                _, value_start, value_end = parts[-1]  # OCTET STRING wrapping the extension value
+                if extension_oid == _EXT_SUBJECT_ALT_NAME:
+                    _, names_start, names_end = _der_element(der, value_start)
+                    for tag, name_start, name_end in _der_children(der, names_start, names_end):
+                        if tag == 0x82:  # dNSName
+                            alt_names.append(der[name_start:name_end].decode('ascii', 'replace'))
+                        elif tag == 0x87:  # iPAddress
+                            alt_names.append(socket.inet_ntop(
+                                socket.AF_INET if name_end - name_start == 4 else socket.AF_INET6,
+                                der[name_start:name_end]
+                            ))
+                elif extension_oid == _EXT_AUTHORITY_INFO_ACCESS:
+                    _, access_start, access_end = _der_element(der, value_start)
+                    for _, description_start, description_end in _der_children(der, access_start, access_end):
+                        method, location = _der_children(der, description_start, description_end)[:2]
+                        if _oid(der[method[1]:method[2]]) == _OCSP_ACCESS_METHOD and location[0] == 0x86:
+                            ocsp_url = ocsp_url or der[location[1]:location[2]].decode('ascii', 'replace')
+                elif extension_oid == _EXT_TLS_FEATURE:
+                    must_staple = b'\x02\x01\x05' in der[value_start:value_end]  # status_request feature
+
+        return {
+            'common_name': subject_names.get('CN'),
+            'issuer': ' '.join(filter(None, [issuer_names.get('CN'),
+                                             f"({issuer_names['O']})" if 'O' in issuer_names else None])),
+            'subject_alt_names': alt_names,
+            'not_before': _der_time(before_tag, der[before_start:before_end]),
+            'not_after': _der_time(after_tag, der[after_start:after_end]),
+            'key_algorithm': key_algorithm,
+            'key_bits': key_bits,
+            'curve': curve,
+            'signature_algorithm': _OID_NAMES.get(signature_oid, signature_oid),
+            'ocsp_url': ocsp_url,
+            'must_staple': must_staple,
+        }
+    except (IndexError, ValueError, UnicodeError, OSError) as e:
+        raise ValueError(f"Malformed certificate: {e}")
@@ -0,0 +1,447 @@
+"""
+Declarative SSL/TLS policy.
+
+Rules are loaded from a YAML or JSON policy file (see policy.yaml) and
+compiled once into a Policy. Evaluation walks the entries of a ScanDocument
+once; the rules that can apply to an entry are looked up in a dispatch
+table keyed by testssl id (and section), so evaluation cost grows with the
+number of entries rather than entries x rules.
+
+The active policy is reloaded automatically when the policy file changes.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from rule_engine import (Finding, Severity, ScanDocument, ScanSection, CIPHER, CERTIFICATE, CERT_KEY_SIZE,
+                         CERT_VALIDITY, CERT_EXPIRATION, OCSP, VULNERABILITY, HANDSHAKE)
+
+logger = logging.getLogger(__name__)
+
+_NUMBER_RE = re.compile(r'(\d+)')
+_MATCH_KEYS = {'id', 'id_regex', 'section', 'section_category', 'shape', 'severity',
+               'finding_regex', 'finding_not_regex', 'number_below'}
+
+
+# testssl.sh check flags of a default run, in command line order. Each check
+# writes one section of the pretty JSON; representative entry ids (also the
+# top-level keys of flat scan documents) map rules on ids to their check.
+TESTSSL_CHECKS = {
+    '-p': ('protocols', ('SSLv2', 'SSLv3', 'TLS1', 'TLS1_1', 'TLS1_2', 'TLS1_3', 'NPN', 'ALPN', 'ALPN_HTTP2')),
+    '-s': ('ciphers', ('cipherlist_NULL', 'cipherlist_aNULL', 'cipherlist_EXPORT', 'cipherlist_LOW',
+                       'cipherlist_3DES_IDEA', 'cipherlist_OBSOLETED', 'cipherlist_STRONG_NOFS',
+                       'cipherlist_STRONG_FS')),
+    '-E': ('cipherTests', ('cipher-tls1_2_x9c', 'cipher-tls1_3_x1302', 'supportedciphers_TLSv1_2')),
+    '-P': ('serverPreferences', ('cipher_order', 'protocol_negotiated', 'cipher_negotiated', 'cipher_order-tls1_2')),
+    '-f': ('fs', ('FS', 'FS_ciphers', 'FS_ECDHE_curves', 'DH_groups', 'FS_TLS12_sig_algs', 'FS_TLS13_sig_algs')),
+    '-S': ('serverDefaults', ('TLS_extensions', 'TLS_session_ticket', 'SSL_sessionID_support',
+                              'sessionresumption_ticket', 'cert_numbers', 'cert_signatureAlgorithm',
+                              'cert_keySize', 'cert_keyUsage', 'cert_commonName', 'cert_subjectAltName',
+                              'cert_trust', 'cert_chain_of_trust', 'cert_expirationStatus', 'cert_notBefore',
+                              'cert_notAfter', 'cert_validityPeriod', 'cert_ocspURL', 'OCSP_stapling',
+                              'cert_mustStapleExtension', 'certificate_transparency', 'DNS_CAArecord',
+                              'intermediate_cert')),
+    '-h': ('headerResponse', ('HTTP_status_code', 'HTTP_clock_skew', 'HSTS', 'HPKP', 'banner_server',
+                              'banner_application', 'cookie_count', 'security_headers')),
+    '-U': ('vulnerabilities', ('heartbleed', 'CCS', 'ticketbleed', 'ROBOT', 'secure_renego', 'secure_client_renego',
+                               'CRIME_TLS', 'BREACH', 'POODLE_SSL', 'fallback_SCSV', 'SWEET32', 'FREAK', 'DROWN',
+                               'LOGJAM', 'BEAST', 'LUCKY13', 'winshock', 'RC4')),
+    '-c': ('browserSimulations', ('clientsimulation-android_81', 'clientsimulation-chrome_101_win10',
+                                  'clientsimulation-firefox_100_win10', 'clientsimulation-safari_16_macos')),
+}
+_KNOWN_IDS = frozenset(entry_id for _, ids in TESTSSL_CHECKS.values() for entry_id in ids)
+# Checks whose sections fall into each rule engine category
+CATEGORY_CHECKS = {
+    CIPHER: ('-s', '-P', '-f'),  # cipherTests (-E) is not part of a default run
+    CERTIFICATE: ('-S',),
+    CERT_KEY_SIZE: ('-S',),
+    CERT_VALIDITY: ('-S',),
+    CERT_EXPIRATION: ('-S',),
+    OCSP: ('-S',),
+    VULNERABILITY: ('-U',),
+    HANDSHAKE: ('-c',),
+}
+# Checks feeding each part of DetailedSSLInfo; misc_info reads every section
+DETAIL_CHECKS = {
+    'protocol_info': ('-p',),
+    'cipher_info': CATEGORY_CHECKS[CIPHER],
+    'certificate_info': ('-S',),
+    'vulnerabilities': ('-U',),
+    'handshake_simulation': ('-c',),
+    'misc_info': tuple(TESTSSL_CHECKS),
+}
+DEFAULT_DETAIL_SECTIONS = tuple(DETAIL_CHECKS)
+
+
+class PolicyError(ValueError):
+    """Raised when a policy file is invalid."""
+
+
+@dataclass
+class Rule:
+    """A compiled policy rule."""
+    index: int
+    name: str
+    category: str
+    severity: Severity
+    description: str
+    absent: bool = False
+    ids: Optional[frozenset] = None
+    id_regex: Optional[re.Pattern] = None
+    section: Optional[str] = None
+    section_category: Optional[str] = None
+    shape: Optional[str] = None
+    entry_severities: Optional[frozenset] = None
+    finding_regex: Optional[re.Pattern] = None
+    finding_not_regex: Optional[re.Pattern] = None
+    number_below: Optional[int] = None
+
+    def applies_to_section(self, section: ScanSection) -> bool:
+        """Static part of the match that depends only on the section."""
+        if self.section is not None and section.key != self.section:
+            return False
+        if self.section_category is not None and self.section_category not in section.categories:
+            return False
+        return True
+
+    def applies_to_id(self, entry_id: str) -> bool:
+        """Static part of the match that depends only on the entry id."""
+        if self.ids is not None and entry_id not in self.ids:
+            return False
+        if self.id_regex is not None and not self.id_regex.search(entry_id):
+            return False
+        return True
+
+    def match(self, entry: Dict, shape: str) -> Optional[Dict]:
+        """
+        Dynamic part of the match.
+
+        Returns:
+            Template fields for the finding, or None if the entry does not match
+        """
+        if self.shape is not None and shape != self.shape:
+            return None
+        if self.entry_severities is not None and entry.get('severity') not in self.entry_severities:
+            return None
+        finding = entry.get('finding', '')
+        if not isinstance(finding, str):
+            finding = str(finding)
+        if self.finding_regex is not None and not self.finding_regex.search(finding):
+            return None
+        if self.finding_not_regex is not None and self.finding_not_regex.search(finding):
+            return None
+        number = ''
+        if self.number_below is not None:
+            match = _NUMBER_RE.search(finding)
+            if not match or int(match.group(1)) >= self.number_below:
+                return None
+            number = match.group(1)
+        return {'finding': finding, 'number': number}
+
+    def required_checks(self) -> Optional[frozenset]:
+        """
+        testssl.sh checks whose output this rule can match.
+
+        Returns:
+            The check flags, or None if the rule cannot be narrowed down
+            (e.g. it matches misc sections or unknown ids)
+        """
+        candidates = set(TESTSSL_CHECKS)
+        if self.section is not None:
+            checks = {flag for flag, (section, ids) in TESTSSL_CHECKS.items()
+                      if self.section == section or self.section in ids}
+            if not checks:
+                return None
+            candidates &= checks
+        if self.section_category is not None and self.section_category in CATEGORY_CHECKS:
+            candidates &= set(CATEGORY_CHECKS[self.section_category])
+        if self.ids is not None:
+            if not self.ids <= _KNOWN_IDS:
+                return None
+            candidates &= {flag for flag, (_, ids) in TESTSSL_CHECKS.items() if self.ids & set(ids)}
+        if self.id_regex is not None:
+            checks = {flag for flag, (_, ids) in TESTSSL_CHECKS.items() if any(self.id_regex.search(i) for i in ids)}
+            if checks:
+                candidates &= checks
+        return frozenset(candidates) if candidates and candidates != set(TESTSSL_CHECKS) else None
+
+    def to_finding(self, fields: Dict) -> Finding:
+        return Finding(
+            category=self.category,
+            name=self.name.format(**fields),
+            description=self.description.format(**fields),
+            severity=self.severity
+        )
+
+
+class Policy:
+    """
+    A compiled policy.
+
+    Rules with exact ids are indexed by id up front; the full list of rules
+    for a (section, id) pair is resolved once and memoized, so repeated
+    evaluations are dictionary lookups.
+    """
+
+    MAX_DISPATCH_ENTRIES = 50000
+
+    def __init__(self, rules: List[Rule], version: str,
+                 detail_sections: Tuple[str, ...] = DEFAULT_DETAIL_SECTIONS):
+        self.rules = rules
+        self.version = version
+        self.detail_sections = detail_sections
+        self._rule_checks = {rule.index: rule.required_checks() for rule in rules}
+        self._rules_by_id: Dict[str, List[Rule]] = {}
+        self._rules_without_id: List[Rule] = []
+        for rule in rules:
+            if rule.ids is not None:
+                for entry_id in rule.ids:
+                    self._rules_by_id.setdefault(entry_id, []).append(rule)
+            else:
+                self._rules_without_id.append(rule)
+        self._section_dispatch: Dict[str, Tuple[Rule, ...]] = {}
+        self._dispatch: Dict[Tuple[str, str], Tuple[Rule, ...]] = {}
+
+    def _section_rules(self, section: ScanSection) -> Tuple[Rule, ...]:
+        """Rules without exact ids that can apply to entries of section."""
+        rules = self._section_dispatch.get(section.key)
+        if rules is None:
+            rules = tuple(rule for rule in self._rules_without_id if rule.applies_to_section(section))
+            if len(self._section_dispatch) >= self.MAX_DISPATCH_ENTRIES:
+                self._section_dispatch.clear()
+            self._section_dispatch[section.key] = rules
+        return rules
+
+    def rules_for(self, section: ScanSection, entry_id: str) -> Tuple[Rule, ...]:
+        """Rules that can apply to an entry with entry_id in section."""
+        key = (section.key, entry_id)
+        rules = self._dispatch.get(key)
+        if rules is None:
+            candidates = [rule for rule in self._rules_by_id.get(entry_id, []) if rule.applies_to_section(section)]
+            candidates += [rule for rule in self._section_rules(section) if rule.applies_to_id(entry_id)]
+            rules = tuple(sorted(candidates, key=lambda rule: rule.index))
+            if len(self._dispatch) >= self.MAX_DISPATCH_ENTRIES:
+                self._dispatch.clear()
+            self._dispatch[key] = rules
+        return rules
+
+    def required_checks(self) -> Optional[List[str]]:
+        """
+        Minimal testssl.sh check flags that produce every entry the rules
+        and the configured detail sections read.
+
+        Returns:
+            Check flags in command line order, or None if a full run is needed
+        """
+        required = set()
+        for checks in self._rule_checks.values():
+            if checks is None:
+                return None
+            required |= checks
+        for detail_section in self.detail_sections:
+            required.update(DETAIL_CHECKS[detail_section])
+        if required >= set(TESTSSL_CHECKS) - {'-E'}:
+            return None  # Nothing to save over a default run
+        return [flag for flag in TESTSSL_CHECKS if flag in required]
+
+    def evaluate(self, document: ScanDocument, checks: Optional[List[str]] = None) -> List[Finding]:
+        """
+        Evaluate a scan document.
+
+        Args:
+            document: The scan to evaluate
+            checks: testssl.sh checks the scan ran, if not every check. Rules
+                that read other checks are skipped, so e.g. a certificate-only
+                scan does not report TLS 1.3 as missing.
+
+        Returns:
+            Findings ordered by rule, then by position in the document
+        """
+        skipped = set()
+        if checks is not None:
+            ran = set(checks)
+            skipped = {index for index, required in self._rule_checks.items()
+                       if required is None or not required <= ran}
+        matched = []
+        satisfied = set()
+        for section in document.sections.values():
+            if isinstance(section.value, list):
+                entries = [item for _, item in section.items]
+                shape = 'list'
+            elif isinstance(section.value, dict):
+                entries = [section.value]
+                shape = 'dict'
+            else:
+                continue
+
+            # Most sections have no applicable rules at all; skip them without touching their entries
+            if not self._rules_by_id and not self._section_rules(section):
+                continue
+
+            for entry in entries:
+                entry_id = entry.get('id')
+                entry_id = section.key if entry_id is None else str(entry_id)
+                for rule in self.rules_for(section, entry_id):
+                    if (rule.absent and rule.index in satisfied) or rule.index in skipped:
+                        continue
+                    fields = rule.match(entry, shape)
+                    if fields is None:
+                        continue
+                    if rule.absent:
+                        satisfied.add(rule.index)
+                    else:
+                        fields.update(id=entry_id, ID=entry_id.upper(), section=section.key)
+                        matched.append((rule.index, len(matched), rule.to_finding(fields)))
+
+        for rule in self.rules:
+            if rule.absent and rule.index not in satisfied and rule.index not in skipped:
+                matched.append((rule.index, len(matched),
+                                rule.to_finding({'id': '', 'ID': '', 'finding': '', 'section': '', 'number': ''})))
+
+        matched.sort(key=lambda item: item[:2])
+        return [finding for _, _, finding in matched]
+
+
+def compile_policy(definition: Dict, version: str = '') -> Policy:
+    """
+    Compile a parsed policy definition into a Policy.
+
+    Raises:
+        PolicyError: If the definition is invalid
+    """
+    if not isinstance(definition, dict) or not isinstance(definition.get('rules'), list):
+        raise PolicyError("Policy must be a mapping with a 'rules' list")
+
+    rules = []
+    for index, raw in enumerate(definition['rules']):
+        try:
+            rules.append(_compile_rule(index, raw))
+        except (KeyError, TypeError, ValueError, re.error) as e:
+            raise PolicyError(f"Invalid rule #{index + 1}: {e}") from e
+
+    detail_sections = definition.get('detail_sections', DEFAULT_DETAIL_SECTIONS)
+    if not isinstance(detail_sections, (list, tuple)) or set(detail_sections) - set(DETAIL_CHECKS):
+        raise PolicyError(f"detail_sections must be a list of {', '.join(DETAIL_CHECKS)}")
+    return Policy(rules, version, detail_sections=tuple(detail_sections))
+
+
+def _compile_rule(index: int, raw: Dict) -> Rule:
+    match = raw.get('match') or {}
+    unknown = set(match) - _MATCH_KEYS
+    if unknown:
+        raise ValueError(f"unknown match keys {sorted(unknown)}")
+
+    severity = Severity(raw['severity'])
+    if severity not in (Severity.FAIL, Severity.WARN):
+        raise ValueError("rule severity must be FAIL or WARN")
+
+    rule_type = raw.get('type', 'match')
+    if rule_type not in ('match', 'absent'):
+        raise ValueError(f"unknown rule type {rule_type!r}")
+
+    ids = match.get('id')
+    if isinstance(ids, str):
+        ids = [ids]
+    shape = match.get('shape')
+    if shape not in (None, 'list', 'dict'):
+        raise ValueError("shape must be 'list' or 'dict'")
+
+    return Rule(
+        index=index,
+        name=raw['name'],
+        category=raw['category'],
+        severity=severity,
+        description=raw.get('description', raw['name']),
+        absent=rule_type == 'absent',
+        ids=frozenset(ids) if ids is not None else None,
+        id_regex=re.compile(match['id_regex']) if 'id_regex' in match else None,
+        section=match.get('section'),
+        section_category=match.get('section_category'),
+        shape=shape,
+        entry_severities=frozenset(match['severity']) if 'severity' in match else None,
+        finding_regex=re.compile(match['finding_regex']) if 'finding_regex' in match else None,
+        finding_not_regex=re.compile(match['finding_not_regex']) if 'finding_not_regex' in match else None,
+        number_below=int(match['number_below']) if 'number_below' in match else None
+    )
+
+
+def load_policy(path: str) -> Policy:
+    """
+    Load and compile a YAML (.yaml/.yml) or JSON policy file.
+
+    The policy version is the SHA-256 of the file contents.
+    """
+    import hashlib
+
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    if path.endswith('.json'):
+        definition = json.loads(content)
+    else:
+        try:
+            import yaml
+        except ImportError as e:
+            raise PolicyError("PyYAML is required for YAML policy files (pip install PyYAML), "
+                              "or use a .json policy file") from e
+        definition = yaml.safe_load(content)
+
+    return compile_policy(definition, version=hashlib.sha256(content).hexdigest())
+
+
+class PolicyStore:
+    """
+    Holds the active policy and reloads it when the policy file changes.
+
+    The file's modification time is checked at most once every
+    check_interval seconds. If a changed file fails to compile, the
+    previously loaded policy stays active.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._policy: Optional[Policy] = None
+        self._mtime = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Policy:
+        now = time.monotonic()
+        if self._policy is not None and now - self._last_check < self.check_interval:
+            return self._policy
+
+        with self._lock:
+            if self._policy is not None and now - self._last_check < self.check_interval:
+                return self._policy
+            self._last_check = now
+
+            mtime = os.stat(self.path).st_mtime_ns
+            if self._policy is None or mtime != self._mtime:
+                try:
+                    policy = load_policy(self.path)
+                except Exception as e:
+                    if self._policy is None:
+                        raise
+                    logger.error(f"Failed to reload policy {self.path}, keeping the previous policy: {e}")
+                else:
+                    if self._policy is not None:
+                        logger.info(f"Reloaded policy {self.path} (version {policy.version[:12]})")
+                    self._policy = policy
+                self._mtime = mtime
+            return self._policy
+
+
+_store = PolicyStore(Config.POLICY_PATH)
+
+
+def get_active_policy() -> Policy:
+    """Return the active policy, reloading the policy file if it changed."""
+    return _store.get()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Re-evaluate stored scans against the current policy without rescanning.
+
+Every scan keeps its raw testssl.sh JSON and the version of the policy it
+was evaluated with. This script re-runs the rule engine on scans whose
+policy version is stale, in parallel batches, and rewrites their status,
+detailed SSL info and findings. A rule change is applied across the fleet
+in seconds, with no network scanning.
+
+Usage:
+    python reevaluate.py [--batch-size N] [--workers N]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import bindparam, func, or_
+from sqlalchemy.orm import aliased
+
+from rule_engine import evaluate_ssl_policy
+from policy import Policy, get_active_policy
+from scan_details import SECTIONS, SUMMARY, decompress, serialize_sections
+from scan_profiles import parse_checks
+from bulk_insert import insert_findings
+from api import app, db, Application, Scan, ScanDetails, Finding, STATUS_RANKS, UNKNOWN_STATUS_RANK
+
+logger = logging.getLogger(__name__)
+
+_worker_policy: Optional[Policy] = None
+
+
+def _init_worker(policy: Policy) -> None:
+    global _worker_policy
+    _worker_policy = policy
+
+
+def _evaluate_raw(row: Tuple[int, bytes, Optional[str]]) -> Tuple[int, Optional[Dict]]:
+    """Decompress, parse and evaluate one stored scan in a worker process."""
+    scan_id, raw_results, scan_checks = row
+    try:
+        scan_results = json.loads(decompress(raw_results))
+        status, findings, detailed_info = evaluate_ssl_policy(scan_results, policy=_worker_policy,
+                                                              checks=parse_checks(scan_checks))
+    except Exception as e:
+        return scan_id, {'error': str(e)}
+    return scan_id, {
+        'status': status.value,
+        'detail_sections': serialize_sections(vars(detailed_info)),
+        'findings': [{
+            'scan_id': scan_id,
+            'category': finding.category,
+            'severity': finding.severity.value,
+            'name': finding.name,
+            'description': finding.description,
+            'details': finding.details
+        } for finding in findings]
+    }
+
+
+def _stale_batch(policy_version: str, batch_size: int, before_id: Optional[int]) -> List:
+    """
+    The next batch of scans evaluated with another policy version, newest
+    first, below before_id. Scans that already failed to re-evaluate with
+    this version are skipped until the policy changes again.
+    """
+    details = aliased(ScanDetails)
+    source_details = aliased(ScanDetails)
+    # Carried-forward scans have no details of their own; use their source scan's
+    raw_results = func.coalesce(details.raw_results, source_details.raw_results)
+    query = db.session.query(Scan.id, raw_results.label('raw_results'), Scan.scan_checks,
+                             details.scan_id.label('details_id')).outerjoin(
+        details, details.scan_id == Scan.id
+    ).outerjoin(
+        source_details, source_details.scan_id == Scan.carried_from_scan_id
+    ).filter(
+        raw_results.isnot(None),
+        or_(Scan.policy_version.is_(None), Scan.policy_version != policy_version),
+        or_(Scan.failed_policy_version.is_(None), Scan.failed_policy_version != policy_version)
+    )
+    if before_id is not None:
+        query = query.filter(Scan.id < before_id)
+    return query.order_by(Scan.id.desc()).limit(batch_size).all()
+
+
+def reevaluate_stale_scans(batch_size: int = 200, workers: Optional[int] = None,
+                           policy: Optional[Policy] = None) -> Dict[str, int]:
+    """
+    Re-evaluate all scans whose policy version differs from the active policy.
+
+    Newest scans are processed first so the dashboard reflects the new
+    policy as early as possible. Each batch is committed on its own. Scans
+    that fail to evaluate keep their old results and are not retried until
+    the policy changes. The worker processes are only started when there
+    are stale scans. Must be called inside an application context.
+
+    Returns:
+        Counts of 'updated' and 'failed' scans
+    """
+    policy = policy or get_active_policy()
+    counts = {'updated': 0, 'failed': 0}
+    rows = _stale_batch(policy.version, batch_size, None)
+    if not rows:
+        return counts
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(policy,)) as executor:
+        while rows:
+            results = list(executor.map(_evaluate_raw, [(row.id, row.raw_results, row.scan_checks) for row in rows],
+                                        chunksize=max(1, len(rows) // (4 * workers))))
+            updated = _write_batch(results, policy.version, {row.id for row in rows if row.details_id})
+            counts['updated'] += updated
+            counts['failed'] += len(results) - updated
+            rows = _stale_batch(policy.version, batch_size, rows[-1].id)
+
+    return counts
+
+
+def _write_batch(results: List[Tuple[int, Dict]], policy_version: str, details_ids: Set[int]) -> int:
+    """
+    Replace status, details and findings of a batch of scans in one
+    transaction, and record the policy version of the scans that failed.
+
+    Args:
+        details_ids: Scans with details of their own; carried-forward copies read their source's
+
+    Returns:
+        Number of scans updated
+    """
+    evaluated = {scan_id: result for scan_id, result in results if 'error' not in result}
+    failed = []
+    for scan_id, result in results:
+        if 'error' in result:
+            logger.error(f"Failed to re-evaluate scan {scan_id}: {result['error']}")
+            failed.append(scan_id)
+
+    scans = Scan.__table__
+    findings = Finding.__table__
+    try:
+        if failed:
+            db.session.execute(scans.update().where(scans.c.id.in_(failed)).values(failed_policy_version=policy_version))
+        if not evaluated:
+            db.session.commit()
+            return 0
+        db.session.execute(findings.delete().where(findings.c.scan_id.in_(list(evaluated))))
+        new_findings = [finding for result in evaluated.values() for finding in result['findings']]
+        insert_findings(new_findings)
+        db.session.execute(
+            scans.update().where(scans.c.id == bindparam('b_id')).values(
+                status=bindparam('b_status'),
+                policy_version=bindparam('b_policy_version'),
+                failed_policy_version=None
+            ),
+            [{
+                'b_id': scan_id,
+                'b_status': result['status'],
+                'b_policy_version': policy_version
+            } for scan_id, result in evaluated.items()]
+        )
+        owned = [(scan_id, result) for scan_id, result in evaluated.items() if scan_id in details_ids]
+        if owned:
+            details = ScanDetails.__table__
+            db.session.execute(
+                details.update().where(details.c.scan_id == bindparam('b_id')).values(
+                    {section: bindparam(f'b_{section}') for section in (SUMMARY,) + SECTIONS}
+                ),
+                [dict({f'b_{section}': data for section, data in result['detail_sections'].items()}, b_id=scan_id)
+                 for scan_id, result in owned]
+            )
+        # Keep the denormalized latest-scan columns in sync for applications whose latest scan changed
+        applications = Application.__table__
+        db.session.execute(
+            applications.update().where(applications.c.latest_scan_id == bindparam('b_id')).values(
+                latest_status=bindparam('b_status'),
+                latest_status_rank=bindparam('b_status_rank'),
+                latest_issue_count=bindparam('b_issue_count')
+            ),
+            [{
+                'b_id': scan_id,
+                'b_status': result['status'],
+                'b_status_rank': STATUS_RANKS.get(result['status'], UNKNOWN_STATUS_RANK),
+                'b_issue_count': len(result['findings'])
+            } for scan_id, result in evaluated.items()]
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(evaluated)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--batch-size', type=int, default=200, help='Scans per batch/transaction (default: 200)')
+    parser.add_argument('--workers', type=int, default=None, help='Evaluation processes (default: CPU count)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+
+    with app.app_context():
+        policy = get_active_policy()
+        print(f"Re-evaluating stale scans against policy version {policy.version[:12]}...")
+        start = time.perf_counter()
+        counts = reevaluate_stale_scans(batch_size=args.batch_size, workers=args.workers, policy=policy)
+        elapsed = time.perf_counter() - start
+        print(f"Updated {counts['updated']} scans ({counts['failed']} failed) in {elapsed:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
-from typing import Dict, List, Tuple
-from dataclasses import dataclass
+import re
+from typing import Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass, field
 from enum import Enum
 
 class Severity(Enum):
@@ -26,23 +27,175 @@ class DetailedSSLInfo:
     handshake_simulation: Dict
     misc_info: Dict
 
-def evaluate_ssl_policy(scan_results: Dict) -> Tuple[Severity, List[Finding], DetailedSSLInfo]:
+# Section categories a top-level scan key can belong to
+CIPHER = 'cipher'
+CERTIFICATE = 'certificate'
+CERT_KEY_SIZE = 'cert_key_size'
+CERT_VALIDITY = 'cert_validity'
+CERT_EXPIRATION = 'cert_expiration'
+OCSP = 'ocsp'
+VULNERABILITY = 'vulnerability'
+HANDSHAKE = 'handshake'
+MISC = 'misc'
+
+_VULNERABILITY_KEY_RE = re.compile('|'.join([
+    'heartbleed', 'ccs', 'ticketbleed', 'robot', 'crime', 'breach', 'poodle', 'freak', 'logjam',
+    'drown', 'fallback', 'beast', 'lucky', 'sweet32', 'opossum', 'renegotiation'
+]))
+# Keys with these keywords are left out of the misc section
+_MISC_VULNERABILITY_KEY_RE = re.compile('|'.join([
+    'heartbleed', 'ccs', 'ticketbleed', 'robot', 'crime', 'breach', 'poodle', 'freak', 'logjam',
+    'drown', 'fallback', 'beast', 'lucky', 'sweet'
+]))
+_CERT_FIELDS = ('cert_issuer', 'cert_subject', 'cert_serial', 'cert_sigalg', 'cert_keysize', 'cert_validity')
+_GENERAL_KEYS = ('targetHost', 'ip', 'port', 'service', 'version', 'openssl')
+_MISC_EXCLUDED_KEYS = frozenset(('protocols', 'pretest') + _CERT_FIELDS)
+
+
+def _section_categories(key: str) -> List[str]:
+    """Classify a top-level scan key into the section categories it belongs to."""
+    lower = key.lower()
+    categories = []
+    if 'cipher' in lower or 'encryption' in lower:
+        categories.append(CIPHER)
+    if 'cert' in lower or 'sig' in lower:
+        categories.append(CERTIFICATE)
+    if 'cert' in lower:
+        if 'rsa' in lower:
+            categories.append(CERT_KEY_SIZE)
+        if 'valid' in lower:
+            categories.append(CERT_VALIDITY)
+        if 'expir' in lower:
+            categories.append(CERT_EXPIRATION)
+    if 'ocsp' in lower:
+        categories.append(OCSP)
+    if _VULNERABILITY_KEY_RE.search(lower):
+        categories.append(VULNERABILITY)
+    if 'client' in lower or 'simulation' in lower or 'browser' in lower:
+        categories.append(HANDSHAKE)
+    if key not in _MISC_EXCLUDED_KEYS and not _MISC_VULNERABILITY_KEY_RE.search(lower):
+        categories.append(MISC)
+    return categories
+
+
+@dataclass
+class ScanSection:
+    """One top-level key of a scan result."""
+    key: str
+    value: object
+    items: List[Tuple[int, Dict]] = field(default_factory=list)  # (position, entry) of dict entries in a list value
+    categories: List[str] = field(default_factory=list)
+
+
+class ScanDocument:
+    """
+    Index over a single testssl.sh scan result, built in one pass.
+
+    Sections (top-level keys) are classified into categories once, and
+    entries are indexed by their testssl ``id``, so the policy checks and
+    extractors look up what they need instead of re-walking every key.
+    """
+
+    def __init__(self, scan_data: Dict):
+        """
+        Args:
+            scan_data: A single scan result (one element of testssl.sh's scanResult)
+        """
+        self.data = scan_data
+        self.sections: Dict[str, ScanSection] = {}
+        self.by_id: Dict[str, List[Dict]] = {}
+        self.by_category: Dict[str, List[ScanSection]] = {
+            category: [] for category in (CIPHER, CERTIFICATE, CERT_KEY_SIZE, CERT_VALIDITY, CERT_EXPIRATION,
+                                          OCSP, VULNERABILITY, HANDSHAKE, MISC)
+        }
+
+        by_id = self.by_id
+        for key, value in scan_data.items():
+            section = ScanSection(key, value)
+            if isinstance(value, list):
+                items = section.items
+                for i, item in enumerate(value):
+                    if isinstance(item, dict):
+                        items.append((i, item))
+                        entry_id = item.get('id')
+                        if entry_id is not None:
+                            by_id.setdefault(entry_id, []).append(item)
+            elif isinstance(value, dict):
+                self._index_entry(value)
+
+            self.sections[key] = section
+            section.categories = _section_categories(key)
+            for category in section.categories:
+                self.by_category[category].append(section)
+
+    def _index_entry(self, entry: Dict) -> None:
+        entry_id = entry.get('id')
+        if entry_id is not None:
+            self.by_id.setdefault(entry_id, []).append(entry)
+
+    @classmethod
+    def from_scan_results(cls, scan_results: Union[Dict, 'ScanDocument']) -> 'ScanDocument':
+        """
+        Build a document from the full testssl.sh JSON output.
+
+        Handles the case where scanResult is an array (when multiple IPs are
+        tested) by using the first result.
+        """
+        if isinstance(scan_results, ScanDocument):
+            return scan_results
+        if 'scanResult' in scan_results and isinstance(scan_results['scanResult'], list):
+            if len(scan_results['scanResult']) > 0:
+                return cls(scan_results['scanResult'][0])
+            return cls({})
+        return cls(scan_results)
+
+    @classmethod
+    def of(cls, scan_data: Union[Dict, 'ScanDocument']) -> 'ScanDocument':
+        """Return scan_data as a ScanDocument, indexing it if necessary."""
+        return scan_data if isinstance(scan_data, ScanDocument) else cls(scan_data)
+
+    def category(self, category: str) -> List[ScanSection]:
+        """Sections belonging to a category, in document order."""
+        return self.by_category[category]
+
+    def entries(self, entry_id: str) -> List[Dict]:
+        """All entries with the given testssl id."""
+        return self.by_id.get(entry_id, [])
+
+    @property
+    def protocols(self) -> List[Dict]:
+        return self.data.get('protocols', [])
+
+
+def _entry_summary(item: Dict) -> Dict:
+    return {
+        'severity': item.get('severity', ''),
+        'finding': item.get('finding', ''),
+        'id': item.get('id', '')
+    }
+
+def evaluate_ssl_policy(scan_results: Dict, policy=None,
+                        checks: Optional[List[str]] = None) -> Tuple[Severity, List[Finding], DetailedSSLInfo]:
     """
     Evaluate SSL/TLS scan results against defined security policies.
 
     Args:
         scan_results: Parsed JSON output from testssl.sh
+        policy: Compiled policy.Policy to evaluate against (defaults to the active policy file)
+        checks: testssl.sh checks the scan ran, if not every check; rules
+            reading other checks are skipped
 
     Returns:
         Tuple of (overall_status, list_of_findings, detailed_ssl_info)
     """
-    findings = []
+    if policy is None:
+        from policy import get_active_policy
+        policy = get_active_policy()
 
-    # Check for FAIL conditions
-    findings.extend(_check_fail_conditions(scan_results))
+    # Index the scan once; the policy and every extractor below read from it
+    document = ScanDocument.from_scan_results(scan_results)
 
-    # Check for WARN conditions
-    findings.extend(_check_warn_conditions(scan_results))
+    findings = policy.evaluate(document, checks=checks)
 
     # Determine overall status based on highest severity finding
     if any(f.severity == Severity.FAIL for f in findings):
@@ -53,218 +206,38 @@ def evaluate_ssl_policy(scan_results: Dict) -> Tuple[Severity, List[Finding], De
         overall_status = Severity.PASS
 
     # Extract detailed SSL information
-    detailed_info = extract_detailed_ssl_info(scan_results)
+    detailed_info = extract_detailed_ssl_info(document)
 
     return overall_status, findings, detailed_info
 
-def _check_fail_conditions(scan_results: Dict) -> List[Finding]:
-    """Check for conditions that result in FAIL status."""
-    findings = []
-
-    # Handle the case where scanResults is an array (when multiple IPs are tested)
-    # Just use the first result for now
-    if 'scanResult' in scan_results and isinstance(scan_results['scanResult'], list):
-        if len(scan_results['scanResult']) > 0:
-            scan_data = scan_results['scanResult'][0]
-        else:
-            scan_data = {}
-    else:
-        scan_data = scan_results
 
-    # Check for TLS 1.0 or TLS 1.1 enabled
-    protocols_list = scan_data.get('protocols', [])
-    for protocol_entry in protocols_list:
-        protocol_id = protocol_entry.get('id', 'unknown')
-        if protocol_entry.get('finding') and ('TLS1_0' in protocol_id or 'TLS1_1' in protocol_id or 'TLS1' in protocol_id):
-            if protocol_entry.get('severity') in ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']:
-                findings.append(Finding(
-                    category='protocol',
-                    name=protocol_id.upper(),
-                    description=f'{protocol_id.upper()} is enabled and considered insecure',
-                    severity=Severity.FAIL
-                ))
-    
-    # Check for weak ciphers (RC4, 3DES, CBC-based suites)
-    # Look for cipher-related entries in the scan data
-    for key, value in scan_data.items():
-        if 'cipher' in key.lower() or 'encryption' in key.lower():
-            if isinstance(value, list):
-                for item in value:
-                    if isinstance(item, dict) and item.get('severity') in ['HIGH', 'CRITICAL']:
-                        if 'RC4' in item.get('finding', '') or '3DES' in item.get('finding', ''):
-                            findings.append(Finding(
-                                category='cipher',
-                                name=item.get('id', key),
-                                description=f'Weak cipher suite detected: {item.get("finding", "")}',
-                                severity=Severity.FAIL
-                            ))
-            elif isinstance(value, dict) and value.get('severity') in ['HIGH', 'CRITICAL']:
-                if 'RC4' in value.get('finding', '') or '3DES' in value.get('finding', ''):
-                    findings.append(Finding(
-                        category='cipher',
-                        name=value.get('id', key),
-                        description=f'Weak cipher suite detected: {value.get("finding", "")}',
-                        severity=Severity.FAIL
-                    ))
-
-    # Check for RSA key length < 2048 bits
-    # Look for certificate-related entries in the scan data
-    for key, value in scan_data.items():
-        if 'cert' in key.lower() and 'rsa' in key.lower():
-            # Check if value is a dictionary before calling .get()
-            if isinstance(value, dict) and value.get('severity') in ['HIGH', 'CRITICAL']:
-                if 'keySize' in value.get('finding', '').lower() or '2048' not in value.get('finding', '2048'):
-                    findings.append(Finding(
-                        category='certificate',
-                        name='CERT_KEY_SIZE',
-                        description='Certificate RSA key length is less than 2048 bits',
-                        severity=Severity.FAIL
-                    ))
-
-    # Check for certificate expiration or invalidity
-    # Look for certificate validity entries in the scan data
-    for key, value in scan_data.items():
-        if 'cert' in key.lower() and 'valid' in key.lower():
-            # Check if value is a dictionary before calling .get()
-            if isinstance(value, dict) and value.get('severity') in ['HIGH', 'CRITICAL']:
-                if 'expired' in value.get('finding', '').lower():
-                    findings.append(Finding(
-                        category='certificate',
-                        name='CERT_EXPIRED',
-                        description='Certificate is expired',
-                        severity=Severity.FAIL
-                    ))
-                elif 'not valid' in value.get('finding', '').lower():
-                    findings.append(Finding(
-                        category='certificate',
-                        name='CERT_INVALID',
-                        description='Certificate is invalid',
-                        severity=Severity.FAIL
-                    ))
-
-    return findings
-
-def _check_warn_conditions(scan_results: Dict) -> List[Finding]:
-    """Check for conditions that result in WARN status."""
-    findings = []
-
-    # Handle the case where scanResults is an array (when multiple IPs are tested)
-    # Just use the first result for now
-    if 'scanResult' in scan_results and isinstance(scan_results['scanResult'], list):
-        if len(scan_results['scanResult']) > 0:
-            scan_data = scan_results['scanResult'][0]
-        else:
-            scan_data = {}
-    else:
-        scan_data = scan_results
-
-    # Check if TLS 1.3 is not enabled
-    protocols_list = scan_data.get('protocols', [])
-    tls_13_enabled = False
-    for protocol_entry in protocols_list:
-        protocol_id = protocol_entry.get('id', 'unknown')
-        if 'TLS1_3' in protocol_id and protocol_entry.get('severity') == 'OK':
-            tls_13_enabled = True
-            break
-
-    if not tls_13_enabled:
-        findings.append(Finding(
-            category='protocol',
-            name='TLS_1.3_NOT_ENABLED',
-            description='TLS 1.3 is not enabled',
-            severity=Severity.WARN
-        ))
-
-    # Check for missing OCSP stapling
-    # Look for OCSP stapling entries in the scan data
-    for key, value in scan_data.items():
-        if 'ocsp' in key.lower():
-            # Check if value is a dictionary before calling .get()
-            if isinstance(value, dict) and value.get('severity') in ['LOW', 'MEDIUM']:
-                findings.append(Finding(
-                    category='configuration',
-                    name='OCSP_STAPLING_MISSING',
-                    description='OCSP stapling is not configured',
-                    severity=Severity.WARN
-                ))
-
-    # Check for certificate expiring in < 30 days
-    # Look for certificate expiration entries in the scan data
-    for key, value in scan_data.items():
-        if 'cert' in key.lower() and 'expir' in key.lower():
-            # Check if value is a dictionary before calling .get()
-            if isinstance(value, dict) and value.get('severity') in ['MEDIUM', 'HIGH']:
-                if 'days' in value.get('finding', ''):
-                    days_str = value['finding']
-                    # Extract days from string like "Certificate expires in 15 days"
-                    import re
-                    match = re.search(r'(\d+)', days_str)
-                    if match and int(match.group(1)) < 30:
-                        findings.append(Finding(
-                            category='certificate',
-                            name='CERT_EXPIRING_SOON',
-                            description=f'Certificate expires in {match.group(1)} days (< 30 days)',
-                            severity=Severity.WARN
-                        ))
-
-    return findings
-
-
-def extract_detailed_ssl_info(scan_results: Dict) -> DetailedSSLInfo:
+def extract_detailed_ssl_info(scan_results: Union[Dict, ScanDocument]) -> DetailedSSLInfo:
     """
     Extract detailed SSL information similar to SSL Labs for display purposes.
 
     Args:
-        scan_results: Parsed JSON output from testssl.sh
+        scan_results: Parsed JSON output from testssl.sh, or a ScanDocument built from it
 
     Returns:
         DetailedSSLInfo object with categorized information
     """
-    # Handle the case where scanResults is an array (when multiple IPs are tested)
-    # Just use the first result for now
-    if 'scanResult' in scan_results and isinstance(scan_results['scanResult'], list):
-        if len(scan_results['scanResult']) > 0:
-            scan_data = scan_results['scanResult'][0]
-        else:
-            scan_data = {}
-    else:
-        scan_data = scan_results
-
-    # Extract protocol information
-    protocol_info = extract_protocol_info(scan_data)
-
-    # Extract cipher information
-    cipher_info = extract_cipher_info(scan_data)
-
-    # Extract certificate information
-    certificate_info = extract_certificate_info(scan_data)
-
-    # Extract vulnerability information
-    vulnerabilities = extract_vulnerability_info(scan_data)
-
-    # Extract handshake simulation info
-    handshake_simulation = extract_handshake_simulation_info(scan_data)
-
-    # Extract miscellaneous information
-    misc_info = extract_misc_info(scan_data)
+    document = ScanDocument.from_scan_results(scan_results)
 
     return DetailedSSLInfo(
-        protocol_info=protocol_info,
-        cipher_info=cipher_info,
-        certificate_info=certificate_info,
-        vulnerabilities=vulnerabilities,
-        handshake_simulation=handshake_simulation,
-        misc_info=misc_info
+        protocol_info=extract_protocol_info(document),
+        cipher_info=extract_cipher_info(document),
+        certificate_info=extract_certificate_info(document),
+        vulnerabilities=extract_vulnerability_info(document),
+        handshake_simulation=extract_handshake_simulation_info(document),
+        misc_info=extract_misc_info(document)
     )
 
 
-def extract_protocol_info(scan_data: Dict) -> Dict:
+def extract_protocol_info(scan_data: Union[Dict, ScanDocument]) -> Dict:
     """Extract protocol support information."""
     protocol_details = {}
 
-    # Look for protocols in the scan data
-    protocols_list = scan_data.get('protocols', [])
-    for protocol_entry in protocols_list:
+    for protocol_entry in ScanDocument.of(scan_data).protocols:
         protocol_id = protocol_entry.get('id', 'unknown')
         protocol_details[protocol_id] = {
             'supported': 'offered' in protocol_entry.get('finding', '').lower(),
@@ -276,179 +249,90 @@ def extract_protocol_info(scan_data: Dict) -> Dict:
     return protocol_details
 
 
-def extract_cipher_info(scan_data: Dict) -> Dict:
+def _collect_entries(details: Dict, sections: List[ScanSection], include_strings: bool = True,
+                     skip_string_keys: Tuple[str, ...] = ()) -> Dict:
+    """Add the entries of sections to details keyed by entry id (string values keyed by section key)."""
+    for section in sections:
+        value = section.value
+        if isinstance(value, list):
+            for _, item in section.items:
+                if 'id' in item:
+                    details[item['id']] = _entry_summary(item)
+        elif isinstance(value, dict):
+            if 'id' in value:
+                details[value['id']] = _entry_summary(value)
+        elif include_strings and isinstance(value, str) and section.key not in skip_string_keys:
+            details[section.key] = {
+                'severity': 'INFO',
+                'finding': value,
+                'id': section.key
+            }
+    return details
+
+
+def extract_cipher_info(scan_data: Union[Dict, ScanDocument]) -> Dict:
     """Extract cipher strength and support information."""
-    cipher_details = {}
-
-    # Look for cipher categories in the scan data
-    cipher_categories = [
-        'cipher_categories',
-        'cipher-strengths',
-        'cipher-suites',
-        'cipher_order'
-    ]
-
-    # Look for cipher-related entries in the scan data
-    for key, value in scan_data.items():
-        if 'cipher' in key.lower() or 'encryption' in key.lower():
-            if isinstance(value, list):
-                for item in value:
-                    if isinstance(item, dict) and 'id' in item:
-                        cipher_details[item['id']] = {
-                            'severity': item.get('severity', ''),
-                            'finding': item.get('finding', ''),
-                            'id': item.get('id', '')
-                        }
-            elif isinstance(value, dict) and 'id' in value:
-                cipher_details[value['id']] = {
-                    'severity': value.get('severity', ''),
-                    'finding': value.get('finding', ''),
-                    'id': value.get('id', '')
-                }
-
-    return cipher_details
-
-
-def extract_certificate_info(scan_data: Dict) -> Dict:
+    return _collect_entries({}, ScanDocument.of(scan_data).category(CIPHER), include_strings=False)
+
+
+def extract_certificate_info(scan_data: Union[Dict, ScanDocument]) -> Dict:
     """Extract certificate information."""
+    document = ScanDocument.of(scan_data)
     cert_details = {}
 
-    # Look for certificate-related entries in the scan data
-    for key, value in scan_data.items():
-        if 'cert' in key.lower() or 'certificate' in key.lower() or 'sig' in key.lower():
-            if isinstance(value, list):
-                for i, item in enumerate(value):
-                    if isinstance(item, dict) and 'id' in item:
-                        cert_details[f"{key}_{i}_{item['id']}"] = {
-                            'severity': item.get('severity', ''),
-                            'finding': item.get('finding', ''),
-                            'id': item.get('id', '')
-                        }
-            elif isinstance(value, dict) and 'id' in value:
-                cert_details[key] = {
-                    'severity': value.get('severity', ''),
-                    'finding': value.get('finding', ''),
-                    'id': value.get('id', '')
-                }
-            elif isinstance(value, str):
-                cert_details[key] = {
-                    'severity': 'INFO',
-                    'finding': value,
-                    'id': key
-                }
+    for section in document.category(CERTIFICATE):
+        key, value = section.key, section.value
+        if isinstance(value, list):
+            for i, item in section.items:
+                if 'id' in item:
+                    cert_details[f"{key}_{i}_{item['id']}"] = _entry_summary(item)
+        elif isinstance(value, dict) and 'id' in value:
+            cert_details[key] = _entry_summary(value)
+        elif isinstance(value, str):
+            cert_details[key] = {
+                'severity': 'INFO',
+                'finding': value,
+                'id': key
+            }
 
     # Also look in the main scan data for certificate fields
-    cert_fields = ['cert_issuer', 'cert_subject', 'cert_serial', 'cert_sigalg', 'cert_keysize', 'cert_validity']
-    for field in cert_fields:
-        if field in scan_data:
-            cert_details[field] = {
+    for cert_field in _CERT_FIELDS:
+        if cert_field in document.data:
+            cert_details[cert_field] = {
                 'severity': 'INFO',
-                'finding': str(scan_data[field]),
-                'id': field
+                'finding': str(document.data[cert_field]),
+                'id': cert_field
             }
 
     return cert_details
 
 
-def extract_vulnerability_info(scan_data: Dict) -> Dict:
+def extract_vulnerability_info(scan_data: Union[Dict, ScanDocument]) -> Dict:
     """Extract vulnerability information."""
-    vuln_details = {}
+    return _collect_entries({}, ScanDocument.of(scan_data).category(VULNERABILITY))
 
-    # Look for vulnerability-related entries in the scan data
-    for key, value in scan_data.items():
-        if any(vuln in key.lower() for vuln in ['heartbleed', 'ccs', 'ticketbleed', 'robot', 'crime', 'breach', 'poodle', 'freak', 'logjam', 'drown', 'fallback', 'beast', 'lucky', 'sweet32', 'opossum', 'renegotiation']):
-            if isinstance(value, list):
-                for item in value:
-                    if isinstance(item, dict) and 'id' in item:
-                        vuln_details[item['id']] = {
-                            'severity': item.get('severity', ''),
-                            'finding': item.get('finding', ''),
-                            'id': item.get('id', '')
-                        }
-            elif isinstance(value, dict) and 'id' in value:
-                vuln_details[value['id']] = {
-                    'severity': value.get('severity', ''),
-                    'finding': value.get('finding', ''),
-                    'id': value.get('id', '')
-                }
-            elif isinstance(value, str):
-                vuln_details[key] = {
-                    'severity': 'INFO',
-                    'finding': value,
-                    'id': key
-                }
-
-    return vuln_details
-
-
-def extract_handshake_simulation_info(scan_data: Dict) -> Dict:
+
+def extract_handshake_simulation_info(scan_data: Union[Dict, ScanDocument]) -> Dict:
     """Extract handshake simulation information."""
-    handshake_details = {}
+    return _collect_entries({}, ScanDocument.of(scan_data).category(HANDSHAKE))
 
-    # Look for client simulation results
-    for key, value in scan_data.items():
-        if 'client' in key.lower() or 'simulation' in key.lower() or 'browser' in key.lower():
-            if isinstance(value, list):
-                for item in value:
-                    if isinstance(item, dict) and 'id' in item:
-                        handshake_details[item['id']] = {
-                            'severity': item.get('severity', ''),
-                            'finding': item.get('finding', ''),
-                            'id': item.get('id', '')
-                        }
-            elif isinstance(value, dict) and 'id' in value:
-                handshake_details[value['id']] = {
-                    'severity': value.get('severity', ''),
-                    'finding': value.get('finding', ''),
-                    'id': value.get('id', '')
-                }
-            elif isinstance(value, str):
-                handshake_details[key] = {
-                    'severity': 'INFO',
-                    'finding': value,
-                    'id': key
-                }
-
-    return handshake_details
-
-
-def extract_misc_info(scan_data: Dict) -> Dict:
+
+def extract_misc_info(scan_data: Union[Dict, ScanDocument]) -> Dict:
     """Extract miscellaneous information."""
+    document = ScanDocument.of(scan_data)
     misc_details = {}
 
     # Get server defaults and other general info
-    general_keys = ['targetHost', 'ip', 'port', 'service', 'version', 'openssl']
-    for key in general_keys:
-        if key in scan_data:
+    for key in _GENERAL_KEYS:
+        if key in document.data:
             misc_details[key] = {
                 'severity': 'INFO',
-                'finding': str(scan_data[key]),
+                'finding': str(document.data[key]),
                 'id': key
             }
 
     # Look for other configuration checks
-    for key, value in scan_data.items():
-        if key not in ['protocols', 'pretest', 'cert_issuer', 'cert_subject', 'cert_serial', 'cert_sigalg', 'cert_keysize', 'cert_validity'] and not any(vuln in key.lower() for vuln in ['heartbleed', 'ccs', 'ticketbleed', 'robot', 'crime', 'breach', 'poodle', 'freak', 'logjam', 'drown', 'fallback', 'beast', 'lucky', 'sweet', 'freak', 'drown']):
-            if isinstance(value, list):
-                for item in value:
-                    if isinstance(item, dict) and 'id' in item:
-                        misc_details[item['id']] = {
-                            'severity': item.get('severity', ''),
-                            'finding': item.get('finding', ''),
-                            'id': item.get('id', '')
-                        }
-            elif isinstance(value, dict) and 'id' in value:
-                misc_details[value['id']] = {
-                    'severity': value.get('severity', ''),
-                    'finding': value.get('finding', ''),
-                    'id': value.get('id', '')
-                }
-            elif isinstance(value, str) and key not in ['targetHost', 'ip', 'port', 'service', 'version', 'openssl']:
-                misc_details[key] = {
-                    'severity': 'INFO',
-                    'finding': value,
-                    'id': key
-                }
+    _collect_entries(misc_details, document.category(MISC), skip_string_keys=_GENERAL_KEYS)
 
     return misc_details
 
@@ -14,6 +14,7 @@ sys.path.insert(0, str(project_root))
 
 from scheduler import SSLScanScheduler
 from api import app, db
+from schema import upgrade_schema
 
 def wait_for_db(max_retries=30, delay=2):
     """
@@ -46,6 +47,7 @@ def main():
         # Initialize the database
         with app.app_context():
             db.create_all()
+            upgrade_schema()
 
         # Create and start the scheduler
         scheduler = SSLScanScheduler()
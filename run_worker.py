@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Script to run a scan worker as a standalone service.
+
+Workers pull scan jobs from the database queue; run as many replicas as
+needed to increase scan capacity.
+"""
+
+import logging
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.absolute()
+sys.path.insert(0, str(project_root))
+
+from worker import ScanWorker
+from api import app, db, wait_for_db
+from schema import upgrade_schema
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(name)s: %(message)s'
+)
+
+def main():
+    # Wait for database to be ready before proceeding
+    if wait_for_db(delay=2):
+        with app.app_context():
+            db.create_all()
+            upgrade_schema()
+
+        ScanWorker().start()
+    else:
+        print("Failed to connect to database after multiple attempts. Exiting.")
+        exit(1)
+
+if __name__ == "__main__":
+    main()
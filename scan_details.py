@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Compressed storage of the detailed SSL info and raw results of scans.
+
+Both are large JSON documents that only the application detail view and
+re-evaluation read, so they live in the 1:1 scan_details table
+(ScanDetails) instead of on the scans table that history and list queries
+read. The detailed SSL info is stored per section (SECTIONS, one column
+each), plus a precomputed summary of the entries the detail page shows
+before a section is opened, so the API serves each as a stored blob (see
+GET /api/scans/<id>/details/<section>).
+
+Everything is compressed with zstd when the zstandard package is
+installed and with zlib otherwise; decompression tells the two apart by
+the data, so rows written with either stay readable.
+
+Scans carried forward from another scan (see scan_store.carry_forward_scan)
+have no details of their own: they read those of the scan they copy.
+
+Like scan_store, the helpers add and flush on db.session but never commit
+(except the one-off migrate_legacy_columns).
+
+Usage:
+    python scan_details.py    # Move the details of a database created before scan_details existed
+"""
+
+import json
+import logging
+import os
+import sys
+import zlib
+from typing import Dict, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # Optional: zlib is used without it
+    zstandard = None
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, insert, select, text
+
+from api import app, db, Scan, ScanDetails
+
+logger = logging.getLogger(__name__)
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'  # Start of every zstd frame; zlib.compress output starts with 0x78
+
+# Sections of DetailedSSLInfo, each stored in the ScanDetails column of the same name
+SECTIONS = ('protocol_info', 'cipher_info', 'certificate_info', 'vulnerabilities', 'handshake_simulation',
+            'misc_info')
+SUMMARY = 'summary'
+
+# What the summary keeps: the sections and entries the detail page's Summary tab and
+# grade (frontend/src/lib/grades.js) read
+_SUMMARY_SECTIONS = ('protocol_info', 'cipher_info', 'certificate_info', 'vulnerabilities')
+_SUMMARY_MISC_KEYS = frozenset(('overall_grade', 'final_score', 'protocol_support_score', 'key_exchange_score',
+                                'cipher_strength_score', 'cert_keySize', 'cert_signatureAlgorithm'))
+_PER_CIPHER_PREFIXES = ('cipher_x', 'cipher-')  # One entry per offered cipher, the bulk of cipher_info
+_WEAK_CIPHER_MARKERS = ('rc4', '3des', 'idea')  # Per-cipher entries the grade counts as weak
+
+
+def compress(document: str) -> bytes:
+    """Compress a JSON document for ScanDetails."""
+    if zstandard is not None:
+        return zstandard.ZstdCompressor().compress(document.encode('utf-8'))
+    return zlib.compress(document.encode('utf-8'))
+
+
+def decompress(data: bytes) -> str:
+    """
+    Decompress a JSON document stored with compress.
+
+    Raises:
+        RuntimeError: If the data is zstd-compressed and zstandard is not installed
+    """
+    if data.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise RuntimeError("Scan details are zstd-compressed; install the zstandard package to read them")
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    return zlib.decompress(data).decode('utf-8')
+
+
+def content_encoding(data: bytes) -> str:
+    """HTTP Content-Encoding of data stored with compress ('deflate' is the zlib format)."""
+    return 'zstd' if data.startswith(ZSTD_MAGIC) else 'deflate'
+
+
+def summarize(detailed_info: Dict) -> Dict:
+    """The summary of detailed SSL info: the entries the detail page needs before a section is opened."""
+    summary = {}
+    for section in _SUMMARY_SECTIONS:
+        summary[section] = {
+            key: entry for key, entry in (detailed_info.get(section) or {}).items()
+            if not key.startswith(_PER_CIPHER_PREFIXES)
+            or any(marker in str(entry.get('finding', '')).lower() for marker in _WEAK_CIPHER_MARKERS)
+        }
+    summary['misc_info'] = {key: entry for key, entry in (detailed_info.get('misc_info') or {}).items()
+                            if key in _SUMMARY_MISC_KEYS}
+    return summary
+
+
+def serialize_sections(detailed_info: Dict) -> Dict[str, bytes]:
+    """Serialize and compress detailed SSL info (a dict of SECTIONS) per section, with its summary."""
+    sections = {section: compress(json.dumps(detailed_info.get(section) or {})) for section in SECTIONS}
+    sections[SUMMARY] = compress(json.dumps(summarize(detailed_info)))
+    return sections
+
+
+def add_scan_details(scan_id: int, sections: Dict[str, bytes], raw_results: Optional[bytes]) -> None:
+    """Add the compressed details (see serialize_sections) of a (flushed) scan to the session."""
+    db.session.add(ScanDetails(scan_id=scan_id, raw_results=raw_results, **sections))
+
+
+def details_scan_id(scan: Scan) -> int:
+    """ID of the scan whose ScanDetails hold the scan's details."""
+    return scan.carried_from_scan_id or scan.id
+
+
+def load_section_data(scan: Scan, section: str) -> Optional[bytes]:
+    """The stored, compressed JSON of one section (or the summary) of a scan's details, None if it has none."""
+    return db.session.query(getattr(ScanDetails, section)).filter(
+        ScanDetails.scan_id == details_scan_id(scan)).scalar()
+
+
+def load_section(scan: Scan, section: str) -> Dict:
+    """One section (or the summary) of a scan's details, {} if it has none (e.g. a failed scan)."""
+    data = load_section_data(scan, section)
+    if not data:
+        return {}
+    try:
+        return json.loads(decompress(data))
+    except (ValueError, zlib.error, RuntimeError) as e:
+        logger.error(f"Unreadable {section} of scan {scan.id}: {str(e)}")
+        return {}
+
+
+def load_raw_results(scan: Scan) -> Optional[str]:
+    """The raw testssl.sh JSON of a scan, None if it was not kept."""
+    data = db.session.query(ScanDetails.raw_results).filter(ScanDetails.scan_id == details_scan_id(scan)).scalar()
+    return decompress(data) if data else None
+
+
+def detach_copies(scan_ids: List[int]) -> None:
+    """
+    Make the copies of scans that are about to be deleted standalone scans
+    with their own details. Copies among the scans themselves are left alone.
+    """
+    if not scan_ids:
+        return
+    copies = Scan.__table__
+    details = ScanDetails.__table__
+    columns = (SUMMARY,) + SECTIONS + ('raw_results',)
+    db.session.execute(insert(ScanDetails).from_select(
+        ('scan_id',) + columns,
+        select(copies.c.id, *(details.c[column] for column in columns)).join(
+            details, details.c.scan_id == copies.c.carried_from_scan_id
+        ).where(copies.c.carried_from_scan_id.in_(scan_ids), copies.c.id.notin_(scan_ids))
+    ))
+    db.session.query(Scan).filter(Scan.carried_from_scan_id.in_(scan_ids)).update(
+        {'carried_from_scan_id': None}, synchronize_session=False)
+
+
+def delete_scan_details(scan_ids: List[int]) -> None:
+    """Delete the details of scans that are about to be deleted."""
+    if scan_ids:
+        db.session.query(ScanDetails).filter(ScanDetails.scan_id.in_(scan_ids)).delete(synchronize_session=False)
+
+
+def _legacy_sections(scan_id: int, detailed_ssl_info: Optional[str]) -> Dict[str, Optional[bytes]]:
+    """The serialized sections of a legacy detailed_ssl_info value; empty if it is missing or not a JSON object."""
+    if not detailed_ssl_info:
+        return dict.fromkeys((SUMMARY,) + SECTIONS)
+    try:
+        detailed_info = json.loads(detailed_ssl_info)
+        if not isinstance(detailed_info, dict):
+            raise ValueError(f"expected a JSON object, got {type(detailed_info).__name__}")
+    except ValueError as e:
+        logger.warning(f"Scan {scan_id} has malformed detailed_ssl_info, its sections are left empty: {str(e)}")
+        return dict.fromkeys((SUMMARY,) + SECTIONS)
+    return serialize_sections(detailed_info)
+
+
+def migrate_legacy_columns(batch_size: int = 500) -> int:
+    """
+    Move the details of a database created before scan_details existed,
+    from the detailed_ssl_info and raw_results columns of scans, and drop
+    those columns. Commits after each batch, so it can be interrupted and
+    run again. Scans whose detailed_ssl_info cannot be parsed are logged and
+    get empty sections (their raw results are still moved).
+
+    Returns:
+        Number of scans whose details were moved
+    """
+    columns = {column['name'] for column in inspect(db.engine).get_columns(Scan.__tablename__)}
+    legacy = [name for name in ('detailed_ssl_info', 'raw_results') if name in columns]
+    if not legacy:
+        return 0
+    select_columns = ', '.join(name if name in legacy else f'NULL AS {name}'
+                               for name in ('detailed_ssl_info', 'raw_results'))
+
+    moved = 0
+    while True:
+        # Copies carried forward read the details of their source scan
+        rows = db.session.execute(text(
+            f"SELECT id, {select_columns} FROM scans s "
+            f"WHERE carried_from_scan_id IS NULL AND ({' OR '.join(f'{name} IS NOT NULL' for name in legacy)}) "
+            f"AND NOT EXISTS (SELECT 1 FROM scan_details d WHERE d.scan_id = s.id) "
+            f"ORDER BY id LIMIT :limit"
+        ), {'limit': batch_size}).all()
+        if not rows:
+            break
+        db.session.execute(insert(ScanDetails), [dict(
+            _legacy_sections(scan_id, detailed_ssl_info),
+            scan_id=scan_id,
+            raw_results=compress(raw_results) if raw_results else None
+        ) for scan_id, detailed_ssl_info, raw_results in rows])
+        db.session.commit()
+        moved += len(rows)
+        logger.info(f"Moved the details of {moved} scans")
+
+    for name in legacy:
+        db.session.execute(text(f"ALTER TABLE scans DROP COLUMN {name}"))
+    db.session.commit()
+    return moved
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+    with app.app_context():
+        db.create_all()
+        moved = migrate_legacy_columns()
+    print(f"Moved the details of {moved} scans to scan_details")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Concurrency limits per host and network.
+
+Applications behind one load balancer, under one domain or in one subnet
+must not all be hit by concurrent testssl.sh runs, which can trip rate
+limits and skew results. Every scan target is mapped to limit keys:
+
+    ip:<address>      each address the target resolved to (Config.MAX_SCANS_PER_IP)
+    domain:<name>     its registrable domain (Config.MAX_SCANS_PER_DOMAIN)
+    net:<network>     each /24 (IPv4) or /64 (IPv6) it resolved into (Config.MAX_SCANS_PER_SUBNET)
+
+A scan may only start while every one of its keys is below its cap. Scans
+are fair-queued by network: the dispatcher serves networks round-robin, so
+a network with many targets does not hold back all the others while
+global throughput stays at the worker limit. Addresses come from the
+target's last fingerprint probe; targets never probed are limited by
+domain only.
+"""
+
+import ipaddress
+import json
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from config import Config
+
+# Public suffixes with two labels under which domains are registered
+# (no public suffix list dependency; extend as needed)
+_MULTI_LABEL_SUFFIXES = {
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'ltd.uk', 'plc.uk', 'me.uk', 'net.uk',
+    'com.au', 'net.au', 'org.au', 'edu.au', 'gov.au',
+    'co.nz', 'org.nz', 'co.jp', 'ne.jp', 'or.jp', 'co.kr', 'co.in', 'co.za', 'co.il',
+    'com.br', 'com.cn', 'com.mx', 'com.tr', 'com.sg', 'com.hk', 'com.tw', 'com.ar',
+}
+
+
+def registrable_domain(host: str) -> Optional[str]:
+    """The registrable domain of a host name (e.g. example.co.uk for a.b.example.co.uk), None for IP addresses."""
+    try:
+        ipaddress.ip_address(host)
+        return None
+    except ValueError:
+        pass
+    labels = host.rstrip('.').lower().split('.')
+    size = 3 if '.'.join(labels[-2:]) in _MULTI_LABEL_SUFFIXES else 2
+    return '.'.join(labels[-size:])
+
+
+def limit_keys(host: str, resolved_ips: Optional[Iterable[str]] = None) -> Set[str]:
+    """Limit keys of a target (see the module docstring)."""
+    addresses = set(resolved_ips or [])
+    domain = registrable_domain(host)
+    keys = {f'domain:{domain}'} if domain else set()
+    if not domain:
+        addresses.add(host)
+    for address in addresses:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            continue
+        prefix = 24 if ip.version == 4 else 64
+        keys.add(f'ip:{ip}')
+        keys.add(f'net:{ipaddress.ip_network(f"{ip}/{prefix}", strict=False)}')
+    return keys
+
+
+def target_limit_keys(host: str, resolved_ips_json: Optional[str]) -> Set[str]:
+    """limit_keys for a ScanTarget's host and resolved_ips column."""
+    try:
+        resolved_ips = json.loads(resolved_ips_json) if resolved_ips_json else []
+    except ValueError:
+        resolved_ips = []
+    return limit_keys(host, resolved_ips)
+
+
+def flow_key(keys: Set[str]) -> str:
+    """The network a target is fair-queued under: its first subnet, else its domain."""
+    return min((key for key in keys if key.startswith('net:')), default=None) or \
+        min(keys, default='')
+
+
+def _cap(key: str) -> int:
+    kind = key.split(':', 1)[0]
+    return {'ip': Config.MAX_SCANS_PER_IP, 'domain': Config.MAX_SCANS_PER_DOMAIN,
+            'net': Config.MAX_SCANS_PER_SUBNET}.get(kind, 0)
+
+
+def within_limits(keys: Set[str], running: Dict[str, int]) -> bool:
+    """Whether one more scan with these keys stays within every cap (a cap of 0 is unlimited)."""
+    return all(not _cap(key) or running.get(key, 0) < _cap(key) for key in keys)
+
+
+class FairScanQueue:
+    """
+    Thread-safe queue of scans for a pool of worker threads, handing out
+    the next scan that fits the concurrency limits, round-robin by network.
+    """
+
+    def __init__(self):
+        self._flows: 'OrderedDict[str, deque]' = OrderedDict()
+        self._running: Dict[str, int] = {}
+        self._active: Dict[int, Set[str]] = {}  # Keys held by the items handed out, by id()
+        self._condition = threading.Condition()
+
+    def put(self, item: Any, keys: Set[str]) -> None:
+        with self._condition:
+            self._flows.setdefault(flow_key(keys), deque()).append((item, keys))
+            self._condition.notify()
+
+    def get(self) -> Optional[Any]:
+        """
+        Block until a queued scan fits the limits, mark it running and return
+        it. Returns None once the queue is empty. Every returned item must be
+        passed to done() when its scan finishes.
+        """
+        with self._condition:
+            while self._flows:
+                for flow, entries in self._flows.items():
+                    entry = next((entry for entry in entries if within_limits(entry[1], self._running)), None)
+                    if entry:
+                        break
+                else:
+                    self._condition.wait()  # Everything queued is at a limit until a scan finishes
+                    continue
+
+                entries.remove(entry)
+                # The served network goes to the back of the line
+                self._flows.move_to_end(flow)
+                if not entries:
+                    del self._flows[flow]
+                item, keys = entry
+                for key in keys:
+                    self._running[key] = self._running.get(key, 0) + 1
+                self._active[id(item)] = keys
+                return item
+            return None
+
+    def done(self, item: Any) -> None:
+        """Release the limits held by a scan returned by get()."""
+        with self._condition:
+            for key in self._active.pop(id(item), ()):
+                self._running[key] -= 1
+            self._condition.notify_all()
+
+
+def pick_fair(candidate_keys: List[Set[str]], running: Dict[str, int]) -> Optional[int]:
+    """
+    Index of the candidate to start next given the scans already running:
+    the first (oldest) candidate within the limits whose network has the
+    fewest running scans, or None if no candidate fits.
+    """
+    best = None
+    for index, keys in enumerate(candidate_keys):
+        if not within_limits(keys, running):
+            continue
+        load = running.get(flow_key(keys), 0)
+        if best is None or load < best[0]:
+            best = (load, index)
+    return best[1] if best else None
@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+Streaming scan pipeline shared by the scheduler, the scan workers (and
+through them manual scans from the API) and the command line.
+
+A scan goes through three stages connected by bounded queues:
+
+    scan       N threads   pre-flight check, fingerprint probe, unchanged
+                           check and testssl.sh run
+    evaluate   1 thread    rule engine evaluation and serialization
+    write      1 thread    saves results in sessions of up to
+                           Config.PIPELINE_WRITE_BATCH, committing each scan
+                           (with its bulk-inserted findings) on its own
+
+Evaluating and saving one result overlaps the testssl.sh runs of the next,
+instead of holding a scan slot. The queues hold at most
+Config.PIPELINE_QUEUE_SIZE results each: when the database falls behind,
+the scan threads wait instead of piling results up in memory.
+
+Targets with the same fingerprint are scanned one at a time: a task waits
+until the previous one with its fingerprint is saved, so it carries that
+result forward instead of running testssl.sh again.
+
+Usage:
+    python scan_pipeline.py 3 7      # Scan applications 3 and 7 now (like a manual scan)
+    python scan_pipeline.py --all    # Scan every application now (like a scheduled run)
+"""
+
+import argparse
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+from scanner import TestSSLScanner, TargetUnreachable
+from native_scanner import NativeTLSScanner
+from api import app, db, Application, Scan, ScanJob
+from scan_store import (EvaluatedScan, evaluate_scan_result, save_evaluated_scan, record_scan_error,
+                        record_scan_unreachable, find_unchanged_scan, carry_forward_scan, fan_out_scan,
+                        scan_timeouts)
+from scan_schedule import back_off_unreachable, claim_due_targets
+from targets import target_application_ids, record_target_probe, record_target_reachability, record_scan_timeout
+import scan_profiles
+import job_queue
+
+logger = logging.getLogger(__name__)
+
+_native_scanner = NativeTLSScanner()
+_STOP = object()  # Queue sentinel: the previous stage has finished
+
+
+@dataclass
+class ScanTask:
+    """A target to scan and the applications that receive the result."""
+    url: str
+    application_ids: List[int]  # The scanned application first
+    profile: str
+    target_id: Optional[int] = None
+    full_scan: bool = False  # Never carry an unchanged result forward (manual scans)
+    job_id: Optional[int] = None  # ScanJob completed or failed with the result
+    worker_id: Optional[str] = None  # Worker holding the job
+    on_scanned: Optional[Callable[[], None]] = None  # Called when the scan stage is done with the task
+    on_finished: Optional[Callable[[str], None]] = None  # Called with the status once the result is saved
+
+    @property
+    def label(self) -> str:
+        return f"Job {self.job_id}: {self.url}" if self.job_id is not None else self.url
+
+
+@dataclass
+class _Result:
+    """A task on its way through the stages."""
+    task: ScanTask
+    started_at: datetime  # Reset when testssl.sh starts, so scan durations leave out the checks before it
+    completed_at: Optional[datetime] = None
+    split_scan: bool = False
+    fingerprint: Optional[str] = None
+    holds_fingerprint: bool = False
+    checks: Optional[List[str]] = None
+    scan_results: Optional[Dict] = None  # testssl.sh JSON, dropped once evaluated
+    evaluated: Optional[EvaluatedScan] = None
+    unchanged_scan_id: Optional[int] = None
+    unreachable: Optional[TargetUnreachable] = None
+    error: Optional[Exception] = None
+
+
+def scanner_for(scanner, checks: Optional[List[str]]):
+    """
+    The backend to run a scan with these checks: the in-process
+    NativeTLSScanner if Config.NATIVE_QUICK_SCANS is on and it supports
+    them, else scanner.
+    """
+    if Config.NATIVE_QUICK_SCANS and _native_scanner.supports(checks):
+        return _native_scanner
+    return scanner
+
+
+def probe_target_fingerprint(scanner, url: str) -> Optional[Dict]:
+    """
+    Probe a target's TLS fingerprint before scanning it.
+
+    Returns:
+        The probe result (see ScannerBackend.probe_fingerprint), or None if
+        probing failed (the full scan then runs as usual)
+    """
+    try:
+        return scanner.probe_fingerprint(url, timeout=Config.FINGERPRINT_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Fingerprint probe of {url} failed: {str(e)}")
+        return None
+
+
+def preflight_target(scanner, url: str, target_id: Optional[int]) -> Optional[TargetUnreachable]:
+    """
+    Check that a target is reachable before scanning it (see
+    ScannerBackend.preflight) and reset its failure count if it is.
+
+    Returns:
+        The TargetUnreachable error, or None if the target is reachable
+    """
+    try:
+        scanner.preflight(url, timeout=Config.PREFLIGHT_TIMEOUT)
+    except TargetUnreachable as e:
+        return e
+    if target_id is not None:
+        record_target_reachability(target_id, True)
+    return None
+
+
+def record_unreachable(application_ids: List[int], target_id: Optional[int], error: TargetUnreachable) -> Scan:
+    """
+    Save an UNREACHABLE result for all applications on a target and back off
+    their next scans exponentially while the target stays unreachable.
+    Does not commit.
+
+    Returns:
+        The Scan of the first application
+    """
+    scan = record_scan_unreachable(application_ids[0], error)
+    fan_out_scan(scan, application_ids)
+    failures = record_target_reachability(target_id, False) if target_id is not None else 1
+    back_off_unreachable(application_ids, failures)
+    return scan
+
+
+def task_for_application(application: Application, profile: str, **kwargs) -> ScanTask:
+    """A ScanTask for an application, with the result shared by the applications on its target."""
+    return ScanTask(
+        url=application.url,
+        application_ids=target_application_ids(application, profile),
+        profile=profile,
+        target_id=application.scan_target_id,
+        **kwargs
+    )
+
+
+class ScanPipeline:
+    """
+    Runs ScanTasks through the scan, evaluate and write stages (see the
+    module docstring).
+    """
+
+    def __init__(self, scanner=None, scan_workers: int = 1, queue_size: Optional[int] = None,
+                 write_batch: Optional[int] = None):
+        """
+        Args:
+            scanner: Scanner to use (defaults to a TestSSLScanner)
+            scan_workers: Number of scan threads
+            queue_size: Results buffered between stages (defaults to Config.PIPELINE_QUEUE_SIZE)
+            write_batch: Most results saved per transaction (defaults to Config.PIPELINE_WRITE_BATCH)
+        """
+        self.scanner = scanner or TestSSLScanner()
+        self.scan_workers = max(1, scan_workers)
+        self.queue_size = queue_size or Config.PIPELINE_QUEUE_SIZE
+        self.write_batch = write_batch or Config.PIPELINE_WRITE_BATCH
+        self._fingerprints: Dict[str, threading.Event] = {}  # Fingerprints of the tasks in flight
+        self._fingerprints_lock = threading.Lock()
+
+    def run(self, source: Callable[[int], Optional[ScanTask]]) -> Dict[str, int]:
+        """
+        Run tasks until the source is exhausted and every result is saved.
+
+        Args:
+            source: Called by scan thread i (0 <= i < scan_workers) for its
+                next task; may block, returns None when the thread is done
+
+        Returns:
+            Number of saved scans by status
+        """
+        evaluate_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        write_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        status_counts: Dict[str, int] = {}
+
+        scan_threads = [
+            threading.Thread(target=self._scan_loop, args=(source, index, evaluate_queue), name=f'pipeline-scan-{index}',
+                             daemon=True)
+            for index in range(self.scan_workers)
+        ]
+        evaluate_thread = threading.Thread(target=self._evaluate_loop, args=(evaluate_queue, write_queue),
+                                           name='pipeline-evaluate', daemon=True)
+        write_thread = threading.Thread(target=self._write_loop, args=(write_queue, status_counts),
+                                        name='pipeline-write', daemon=True)
+        for thread in scan_threads + [evaluate_thread, write_thread]:
+            thread.start()
+
+        for thread in scan_threads:
+            thread.join()
+        evaluate_queue.put(_STOP)
+        evaluate_thread.join()
+        write_thread.join()
+        return status_counts
+
+    def run_tasks(self, tasks: Iterable[ScanTask]) -> Dict[str, int]:
+        """Run a fixed set of tasks (see run)."""
+        pending = iter(list(tasks))
+        pending_lock = threading.Lock()
+
+        def next_task(index):
+            with pending_lock:
+                return next(pending, None)
+
+        return self.run(next_task)
+
+    # --- Scan stage ---
+
+    def _scan_loop(self, source, index, evaluate_queue):
+        while True:
+            try:
+                task = source(index)
+            except Exception as e:
+                logger.error(f"Scan thread {index} could not get a task: {str(e)}")
+                return
+            if task is None:
+                return
+            result = self._scan(task)
+            if task.on_scanned:
+                # The result must reach the write stage whatever happens here, or its
+                # fingerprint is never released and tasks waiting on it block forever
+                try:
+                    task.on_scanned()
+                except Exception as e:
+                    logger.error(f"Error after scanning {task.label}: {str(e)}")
+            evaluate_queue.put(result)
+
+    def _scan(self, task: ScanTask) -> _Result:
+        result = _Result(task, started_at=datetime.utcnow())
+        with app.app_context():
+            try:
+                logger.info(f"Scanning {task.label} ({task.profile})")
+
+                # Dead targets are recorded in seconds instead of tying up a slot until testssl.sh times out
+                result.unreachable = preflight_target(self.scanner, task.url, task.target_id)
+                if result.unreachable:
+                    return result
+
+                probe = probe_target_fingerprint(self.scanner, task.url) if Config.FINGERPRINT_SKIP else None
+                result.fingerprint = probe['hash'] if probe else None
+                if probe and task.target_id is not None:
+                    record_target_probe(task.target_id, probe)
+                db.session.commit()
+
+                if result.fingerprint:
+                    self._hold_fingerprint(result.fingerprint)
+                    result.holds_fingerprint = True
+
+                # Skip the full scan if the target's TLS configuration is unchanged
+                unchanged = None if task.full_scan else \
+                    find_unchanged_scan(task.application_ids[0], result.fingerprint, task.profile)
+                if unchanged:
+                    result.unchanged_scan_id = unchanged.id
+                    result.completed_at = datetime.utcnow()
+                    return result
+
+                scan_arguments = scan_profiles.scan_arguments(task.profile)
+                timeouts = scan_timeouts(task.target_id, task.application_ids[0], task.profile)
+                db.session.commit()  # Don't hold a transaction open for the length of the scan
+
+                result.started_at = datetime.utcnow()
+                if task.full_scan and task.profile == scan_profiles.FAST and Config.SPLIT_MANUAL_SCANS and \
+                        self.scanner.supports_split():
+                    # Manual scans are urgent: run the check groups in parallel
+                    result.split_scan = True
+                    result.scan_results = self.scanner.scan_url_split(task.url, **timeouts)
+                else:
+                    result.checks = scan_arguments['checks']
+                    result.scan_results = scanner_for(self.scanner, result.checks).scan_url(
+                        task.url, **scan_arguments, **timeouts
+                    )
+                result.completed_at = datetime.utcnow()
+            except Exception as e:
+                db.session.rollback()
+                result.error = e
+            return result
+
+    def _hold_fingerprint(self, fingerprint: str) -> None:
+        """Wait until no other task with the fingerprint is in flight, then mark this one."""
+        while True:
+            with self._fingerprints_lock:
+                saved = self._fingerprints.get(fingerprint)
+                if saved is None:
+                    self._fingerprints[fingerprint] = threading.Event()
+                    return
+            saved.wait()
+
+    def _release_fingerprint(self, fingerprint: str) -> None:
+        with self._fingerprints_lock:
+            self._fingerprints.pop(fingerprint).set()
+
+    # --- Evaluate stage ---
+
+    def _evaluate_loop(self, evaluate_queue, write_queue):
+        while True:
+            result = evaluate_queue.get()
+            if result is _STOP:
+                write_queue.put(_STOP)
+                return
+            if result.scan_results is not None:
+                try:
+                    result.evaluated = evaluate_scan_result(result.scan_results, result.checks)
+                except Exception as e:
+                    result.error = e
+                result.scan_results = None
+            write_queue.put(result)
+
+    # --- Write stage ---
+
+    def _write_loop(self, write_queue, status_counts):
+        stopped = False
+        while not stopped:
+            batch = [write_queue.get()]
+            while len(batch) < self.write_batch and batch[-1] is not _STOP:
+                try:
+                    batch.append(write_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is _STOP:
+                batch.pop()
+                stopped = True
+            if batch:
+                for status in self._write_batch(batch):
+                    status_counts[status] = status_counts.get(status, 0) + 1
+
+    def _write_batch(self, batch: List[_Result]) -> List[str]:
+        """
+        Save a batch of results in one short-lived session, committing each
+        scan on its own: a failure only rolls back that scan, and nothing
+        stays in the session after the batch.
+        """
+        statuses = []
+        with app.app_context():
+            for result in batch:
+                try:
+                    status = self._save(result)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Error saving scan for {result.task.label}: {str(e)}")
+                    try:
+                        self._save_failure(result, e)
+                        db.session.commit()
+                        status = 'FAIL'
+                    except Exception as e:
+                        db.session.rollback()
+                        logger.error(f"Error recording the failed scan of {result.task.label}: {str(e)}")
+                        status = 'ERROR'
+                statuses.append(status)
+                self._finish(result, status)
+        return statuses
+
+    def _finish(self, result: _Result, status: str) -> None:
+        """Let tasks waiting on the result's fingerprint go ahead and report the task finished."""
+        if result.holds_fingerprint:
+            self._release_fingerprint(result.fingerprint)
+        if result.task.on_finished:
+            try:
+                result.task.on_finished(status)
+            except Exception as e:
+                logger.error(f"Error finishing {result.task.label}: {str(e)}")
+
+    def _save(self, result: _Result) -> str:
+        """Save one result. Returns the status of the saved scan."""
+        task = result.task
+        job = None
+        if task.job_id is not None:
+            job = db.session.get(ScanJob, task.job_id)
+            if job is None or job.status != job_queue.RUNNING or job.worker_id != task.worker_id:
+                logger.warning(f"{task.label} was reclaimed while scanning; discarding result")
+                return 'DISCARDED'
+
+        if result.error:
+            return self._save_failure(result, result.error, job)
+
+        if result.unreachable:
+            scan = record_unreachable(task.application_ids, task.target_id, result.unreachable)
+            logger.warning(f"{task.label} is unreachable: {result.unreachable}")
+        elif result.unchanged_scan_id:
+            scan = carry_forward_scan(task.application_ids[0], db.session.get(Scan, result.unchanged_scan_id),
+                                      result.started_at, result.completed_at, result.fingerprint)
+            fan_out_scan(scan, task.application_ids)
+            logger.info(f"{task.label} unchanged since scan {result.unchanged_scan_id}; "
+                        f"carried forward status: {scan.status}")
+        else:
+            scan = save_evaluated_scan(task.application_ids[0], result.started_at, result.completed_at,
+                                       result.evaluated, fingerprint=result.fingerprint, profile=task.profile,
+                                       split_scan=result.split_scan)
+            if task.target_id is not None:
+                record_scan_timeout(task.target_id, False)
+            fan_out_scan(scan, task.application_ids)
+            logger.info(f"Completed {task.profile} scan for {task.label} with status: {scan.status}")
+        if len(task.application_ids) > 1:
+            logger.info(f"{task.label}: result shared with {len(task.application_ids) - 1} applications "
+                        f"on the same target")
+
+        if job:
+            job_queue.mark_job_done(job, scan.id)
+        return scan.status
+
+    def _save_failure(self, result: _Result, error: Exception, job: Optional[ScanJob] = None) -> str:
+        """Record a failed scan: fail the task's job, or save a failed scan for each application."""
+        task = result.task
+        if job is None and task.job_id is not None:
+            job = db.session.get(ScanJob, task.job_id)
+
+        circuit_open_until = None
+        if isinstance(error, subprocess.TimeoutExpired):
+            message = f'Scan timed out after {error.timeout}s'
+            if task.target_id is not None:
+                circuit_open_until = record_scan_timeout(task.target_id, True)
+            if circuit_open_until:
+                logger.warning(f"{task.label} keeps timing out; not scanned on schedule before "
+                               f"{circuit_open_until.isoformat()}")
+        else:
+            message = str(error)
+        logger.error(f"Error scanning {task.label}: {message}")
+
+        if job:
+            # Retrying a target whose circuit is open would only burn another timeout
+            job_queue.mark_job_failed(job, message, retry=circuit_open_until is None)
+            return job.status
+        for app_id in task.application_ids:
+            record_scan_error(app_id, error)
+        return 'FAIL'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('application_ids', type=int, nargs='*', help='Applications to scan')
+    parser.add_argument('--all', action='store_true', help='Scan every application')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Concurrent testssl.sh runs (default: SCAN_CONCURRENCY)')
+    args = parser.parse_args()
+    if not args.all and not args.application_ids:
+        parser.error('give application IDs or --all')
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+
+    with app.app_context():
+        if args.all:
+            tasks = [ScanTask(url=target.url, application_ids=target.application_ids, profile=target.profile,
+                              target_id=target.target_id)
+                     for target in claim_due_targets(include_all=True)]
+        else:
+            tasks = []
+            for application in Application.query.filter(Application.id.in_(args.application_ids)):
+                profile = scan_profiles.broadest(application.scan_profile, scan_profiles.FAST)
+                tasks.append(task_for_application(application, profile, full_scan=True))
+            db.session.commit()
+
+    workers = min(args.workers or Config.SCAN_CONCURRENCY, max(len(tasks), 1))
+    print(f"Scanning {len(tasks)} scan targets with {workers} workers...")
+    status_counts = ScanPipeline(scan_workers=workers).run_tasks(tasks)
+    print(f"Done: {status_counts}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Scan window planning.
+
+With Config.SCAN_WINDOW set (e.g. '00:00-06:00'), applications scanned
+daily or less often are no longer scanned the moment they are due. At the
+start of each window the planner picks up every such application that
+would fall due before the next window, predicts each target's scan time
+from its recorded scan durations and spreads the scans evenly over the
+window, so they neither all start in the same minute nor run past its end:
+
+    1. Targets are assigned longest first to Config.SCAN_WINDOW_CONCURRENCY
+       lanes, each to the lane that frees up first.
+    2. Each lane's idle time is split into equal gaps between its scans,
+       and the lanes are offset against each other by a fraction of a gap.
+
+The scans are queued as ScanJobs whose run_after is the planned start;
+planned_start/planned_finish next to started_at/finished_at show how well
+the plan held up (GET /api/scans/plan).
+"""
+
+import heapq
+import logging
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from typing import List, Optional, Tuple
+
+from config import Config
+from api import db
+import job_queue
+from scan_schedule import DueTarget, claim_due_targets
+from scan_store import duration_key, scan_durations
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PlannedScan:
+    """A target's place in the window plan."""
+    target: DueTarget
+    start: datetime
+    finish: datetime  # start + predicted duration
+
+
+def parse_window(value: str) -> Tuple[time, time]:
+    """
+    Parse a 'HH:MM-HH:MM' window. An end before the start crosses midnight.
+
+    Raises:
+        ValueError: If the window is malformed or empty
+    """
+    try:
+        start, end = (time.fromisoformat(part.strip()) for part in value.split('-'))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid scan window {value!r}, expected HH:MM-HH:MM")
+    if start == end:
+        raise ValueError(f"Scan window {value!r} is empty")
+    return start, end
+
+
+def window_bounds(now: datetime, window: Optional[str] = None) -> Tuple[datetime, datetime]:
+    """
+    The window containing now, or else the next one.
+
+    Returns:
+        (start, deadline) of the window
+    """
+    start_time, end_time = parse_window(window or Config.SCAN_WINDOW)
+    start = datetime.combine(now.date(), start_time)
+    if start > now:
+        start -= timedelta(days=1)  # The window may have started yesterday
+    deadline = datetime.combine(start.date(), end_time)
+    if deadline <= start:
+        deadline += timedelta(days=1)
+    if deadline <= now:
+        start, deadline = start + timedelta(days=1), deadline + timedelta(days=1)
+    return start, deadline
+
+
+def predict_durations(targets: List[DueTarget]) -> List[float]:
+    """
+    Predict how long each target's scan takes, in seconds: the longest of
+    its last Config.SCAN_DURATION_HISTORY testssl.sh scans with the same
+    profile (or any profile if there are none), or
+    Config.SCAN_DEFAULT_DURATION for targets never scanned.
+    """
+    history = scan_durations(limit=Config.SCAN_DURATION_HISTORY)
+
+    predictions = []
+    for target in targets:
+        by_profile = history.get(duration_key(target.target_id, target.application_ids[0]), {})
+        predictions.append(max(by_profile.get(target.profile, []), default=0.0)
+                           or max((max(durations) for durations in by_profile.values()), default=0.0)
+                           or float(Config.SCAN_DEFAULT_DURATION))
+    return predictions
+
+
+def plan_scans(targets: List[DueTarget], durations: List[float], start: datetime, deadline: datetime,
+               concurrency: int) -> List[PlannedScan]:
+    """
+    Spread scans with the given predicted durations over [start, deadline]
+    with at most concurrency scans running at a time. If the predicted work
+    does not fit, the overloaded lanes run back to back and finish late.
+
+    Returns:
+        The planned scans, ordered by planned start
+    """
+    window = (deadline - start).total_seconds()
+    lanes: List[List[int]] = [[] for _ in range(max(1, min(concurrency, len(targets))))]
+    loads = [(0.0, lane) for lane in range(len(lanes))]
+
+    # Longest processing time first keeps the busiest lane close to the average
+    for index in sorted(range(len(targets)), key=lambda i: durations[i], reverse=True):
+        load, lane = heapq.heappop(loads)
+        lanes[lane].append(index)
+        heapq.heappush(loads, (load + durations[index], lane))
+
+    plan = []
+    for lane, indexes in enumerate(lanes):
+        if not indexes:
+            continue
+        gap = max(window - sum(durations[i] for i in indexes), 0.0) / len(indexes)
+        offset = gap * lane / len(lanes)
+        for index in indexes:
+            scan_start = start + timedelta(seconds=offset)
+            offset += durations[index]
+            plan.append(PlannedScan(targets[index], scan_start, start + timedelta(seconds=offset)))
+            offset += gap
+
+    plan.sort(key=lambda planned: planned.start)
+    return plan
+
+
+def plan_scan_window(now: Optional[datetime] = None) -> List[PlannedScan]:
+    """
+    Plan the scan window containing now (or the next one) and queue its
+    scans. Applications already planned are not picked up again, so running
+    this again during a window only plans the ones that fell due since.
+    Commits.
+
+    Returns:
+        The queued plan, without targets whose existing job could not be
+        moved to its planned time (see _queue_planned_scan)
+    """
+    now = now or datetime.utcnow()
+    window_start, deadline = window_bounds(now)
+    start = max(now, window_start)
+
+    # Everything that would fall due before the next window is scanned in this one; counting the
+    # interval from the window start keeps daily applications in step with the windows
+    targets = claim_due_targets(due_before=window_start + timedelta(days=1), windowed=True,
+                                scheduled_from=window_start, limit=Config.SCAN_WINDOW_BATCH_SIZE)
+    if not targets:
+        return []
+
+    durations = predict_durations(targets)
+    plan = plan_scans(targets, durations, start, deadline, Config.SCAN_WINDOW_CONCURRENCY)
+
+    late = [planned for planned in plan if planned.finish > deadline]
+    if late:
+        logger.warning(f"Scan window {Config.SCAN_WINDOW}: {len(late)} of {len(plan)} scans are predicted to "
+                       f"finish after {deadline.isoformat()}, the last at {max(p.finish for p in late).isoformat()}; "
+                       f"raise SCAN_WINDOW_CONCURRENCY or widen the window")
+
+    queued = [planned for planned in plan if _queue_planned_scan(planned)]
+    db.session.commit()
+
+    logger.info(f"Planned {len(queued)} scans ({sum(durations):.0f}s predicted) between {start.isoformat()} "
+                f"and {deadline.isoformat()} on {Config.SCAN_WINDOW_CONCURRENCY} lanes")
+    return queued
+
+
+def _queue_planned_scan(planned: PlannedScan) -> bool:
+    """
+    Queue a planned scan. An application's active job is moved to the
+    planned time if it is queued and either planned itself (e.g. left over
+    from an earlier window) or not due before the plan; a job that is due
+    sooner (e.g. a manual scan), running or waiting to retry is left as it
+    is. Does not commit the move.
+
+    Returns:
+        Whether the scan runs as planned
+    """
+    job, created = job_queue.enqueue_scan(planned.target.application_ids[0], run_after=planned.start,
+                                          profile=planned.target.profile, planned_finish=planned.finish,
+                                          return_created=True)
+    if created:
+        return True
+    if job is None:
+        return False  # A concurrent job finished between the conflict and the lookup
+    if job.status == job_queue.QUEUED and (job.planned_start is not None or job.run_after >= planned.start):
+        job.run_after = job.planned_start = planned.start
+        job.planned_finish = planned.finish
+        return True
+    logger.info(f"Not planning a scan of {planned.target.url}: job {job.id} is already {job.status.lower()}, "
+                f"to run from {job.run_after.isoformat()}")
+    return False
@@ -0,0 +1,70 @@
+"""
+Scan profiles: which testssl.sh checks a scan runs.
+
+    cert    certificate and server defaults only (-S)
+    policy  only the checks the active policy's rules and detail sections
+            read (see Policy.required_checks)
+    fast    every check of a default run with --fast (the behavior before
+            profiles existed; scans without a profile are fast scans)
+    full    every check of a default run, without --fast
+
+Each application has a profile. Policy-only applications get a fast scan
+at least once every Config.FULL_SCAN_INTERVAL; manual scans are at least
+fast scans.
+"""
+
+from typing import Dict, List, Optional
+
+from policy import Policy, get_active_policy
+
+CERT = 'cert'
+POLICY = 'policy'
+FAST = 'fast'
+FULL = 'full'
+
+# Narrowest to broadest
+PROFILES = (CERT, POLICY, FAST, FULL)
+
+CERT_CHECKS = ['-S']
+
+# Profiles whose results can stand in for a scan with the given profile
+_COVERED_BY = {
+    CERT: (CERT, FAST, FULL),
+    POLICY: (POLICY, FAST, FULL),
+    FAST: (FAST, FULL),
+    FULL: (FULL,),
+}
+
+
+def scan_arguments(profile: Optional[str], policy: Optional[Policy] = None) -> Dict:
+    """
+    Keyword arguments for TestSSLScanner.scan_url for a profile.
+
+    Returns:
+        {'checks': check flags or None for every check, 'fast': whether to pass --fast}
+    """
+    if profile == CERT:
+        return {'checks': list(CERT_CHECKS), 'fast': True}
+    if profile == POLICY:
+        return {'checks': (policy or get_active_policy()).required_checks(), 'fast': True}
+    return {'checks': None, 'fast': profile != FULL}
+
+
+def covers(profile: Optional[str], requested: str) -> bool:
+    """Whether the result of a scan with profile can stand in for a scan with the requested profile."""
+    return (profile or FAST) in _COVERED_BY[requested]
+
+
+def broadest(*profiles: Optional[str]) -> str:
+    """The broadest of the given profiles."""
+    return max((profile or FAST for profile in profiles), key=PROFILES.index)
+
+
+def stored_checks(checks: Optional[List[str]]) -> Optional[str]:
+    """Checks as stored in Scan.scan_checks (None for every check)."""
+    return ' '.join(checks) if checks is not None else None
+
+
+def parse_checks(value: Optional[str]) -> Optional[List[str]]:
+    """Inverse of stored_checks."""
+    return value.split() if value is not None else None
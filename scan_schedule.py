@@ -0,0 +1,153 @@
+"""
+Per-application scan cadence.
+
+Each application has a scan profile and a scan interval (hourly up to
+weekly); the indexed next_scan_at column says when it is due. The scheduler
+polls for due applications instead of scanning everything at once. Due
+applications are grouped by scan target and each target is scanned once,
+with the broadest profile any of its due applications needs. Every
+application on the target whose profile that scan covers receives the
+result and moves one interval ahead.
+
+With a scan window configured, applications scanned daily or less often
+are left to the window planner (see scan_planner.py), except for their
+first scan.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, not_, or_
+
+from config import Config
+import scan_profiles
+from scan_store import due_scan_profile
+from api import db, Application, ScanTarget
+
+
+@dataclass
+class DueTarget:
+    """A scan target to scan now."""
+    target_id: Optional[int]
+    url: str  # URL of the first due application, the one actually scanned
+    profile: str
+    application_ids: List[int]  # Applications that receive the result, the scanned one first
+
+
+def validate_schedule(profile: Optional[str] = None, interval: Optional[int] = None) -> None:
+    """
+    Raises:
+        ValueError: If the profile is unknown or the interval is out of range
+    """
+    if profile is not None and profile not in scan_profiles.PROFILES:
+        raise ValueError(f"scan_profile must be one of {', '.join(scan_profiles.PROFILES)}")
+    if interval is not None and not Config.MIN_SCAN_INTERVAL <= interval <= Config.MAX_SCAN_INTERVAL:
+        raise ValueError(f"scan_interval must be between {Config.MIN_SCAN_INTERVAL} and "
+                         f"{Config.MAX_SCAN_INTERVAL} seconds")
+
+
+def windowed_applications():
+    """Condition for applications scanned in the scan window rather than as soon as they are due."""
+    return and_(Application.scan_interval >= Config.SCAN_WINDOW_MIN_INTERVAL, Application.last_scan_time.isnot(None))
+
+
+def claim_due_targets(limit: Optional[int] = None, include_all: bool = False,
+                      due_before: Optional[datetime] = None, windowed: Optional[bool] = None,
+                      scheduled_from: Optional[datetime] = None) -> List[DueTarget]:
+    """
+    Pick up the applications that are due, group them by scan target and
+    move each receiving application's next_scan_at one interval ahead, so a
+    later poll does not pick them up again while they are being scanned.
+    Commits.
+
+    Args:
+        limit: Most due applications to pick up (defaults to Config.SCHEDULE_BATCH_SIZE)
+        include_all: Treat every application as due
+        due_before: Pick up applications due before this time (defaults to
+            those due by now)
+        windowed: Only pick up applications scanned in the scan window (True)
+            or the others (False); defaults to the others if Config.SCAN_WINDOW
+            is set, else all
+        scheduled_from: Time the next interval is counted from (defaults to now)
+
+    Returns:
+        The targets to scan, most overdue first
+    """
+    now = datetime.utcnow()
+    query = Application.query
+    if not include_all:
+        if windowed is None and Config.SCAN_WINDOW:
+            windowed = False
+        if windowed is not None:
+            query = query.filter(windowed_applications() if windowed else not_(windowed_applications()))
+        due = Application.next_scan_at < due_before if due_before else Application.next_scan_at <= now
+        query = query.filter(or_(Application.next_scan_at.is_(None), due)).order_by(
+            Application.next_scan_at.nulls_first(), Application.id
+        ).limit(limit or Config.SCHEDULE_BATCH_SIZE)
+    else:
+        query = query.order_by(Application.id)
+    due = query.with_for_update(skip_locked=True).all()
+
+    # Group by target; applications without a target are scanned on their own
+    groups: Dict = {}
+    for application in due:
+        key = application.scan_target_id if application.scan_target_id is not None else ('app', application.id)
+        groups.setdefault(key, []).append(application)
+
+    target_ids = [key for key in groups if not isinstance(key, tuple)]
+
+    # Targets whose circuit breaker is open (see targets.record_scan_timeout) wait for the cool-down
+    if target_ids:
+        for target_id, open_until in db.session.query(ScanTarget.id, ScanTarget.circuit_open_until).filter(
+                ScanTarget.id.in_(target_ids), ScanTarget.circuit_open_until > now):
+            for application in groups.pop(target_id):
+                application.next_scan_at = open_until
+        target_ids = [key for key in groups if not isinstance(key, tuple)]
+
+    siblings: Dict[int, List[Application]] = {}
+    if target_ids:
+        for application in Application.query.filter(Application.scan_target_id.in_(target_ids)).order_by(Application.id):
+            siblings.setdefault(application.scan_target_id, []).append(application)
+
+    targets = []
+    for key, due_applications in groups.items():
+        profile = scan_profiles.broadest(*(due_scan_profile(application.id, application.scan_profile)
+                                           for application in due_applications))
+        due_ids = {application.id for application in due_applications}
+        receivers = due_applications + [
+            application for application in siblings.get(key, [])
+            if application.id not in due_ids and scan_profiles.covers(profile, application.scan_profile)
+        ]
+        for application in receivers:
+            application.next_scan_at = (scheduled_from or now) + timedelta(seconds=application.scan_interval)
+        targets.append(DueTarget(
+            target_id=None if isinstance(key, tuple) else key,
+            url=due_applications[0].url,
+            profile=profile,
+            application_ids=[application.id for application in receivers]
+        ))
+
+    db.session.commit()
+    return targets
+
+
+def reschedule(application: Application) -> None:
+    """Recompute next_scan_at after the application's interval changed."""
+    application.next_scan_at = (application.last_scan_time or datetime.utcnow()) + \
+        timedelta(seconds=application.scan_interval)
+
+
+def back_off_unreachable(application_ids: List[int], failures: int) -> None:
+    """
+    Push back the next scans of an unreachable target's applications: after
+    the n-th consecutive failure the interval is multiplied by 2^(n-1), up
+    to Config.UNREACHABLE_MAX_BACKOFF (but never below the interval itself).
+    """
+    if failures < 2:
+        return
+    now = datetime.utcnow()
+    for application in Application.query.filter(Application.id.in_(application_ids)):
+        delay = min(application.scan_interval * 2 ** (failures - 1),
+                    max(Config.UNREACHABLE_MAX_BACKOFF, application.scan_interval))
+        application.next_scan_at = max(application.next_scan_at or now, now + timedelta(seconds=delay))
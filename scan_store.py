@@ -0,0 +1,462 @@
+"""
+Persistence of scan results.
+
+Turns rule engine output into Scan and Finding rows and keeps the
+denormalized latest-scan columns of Application in sync. The helpers add
+and flush rows on the current db.session but never commit, so callers
+decide the transaction boundary (e.g. saving a scan and completing its job
+together).
+"""
+
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from rule_engine import evaluate_ssl_policy, Finding as RuleFinding
+from policy import get_active_policy
+from sqlalchemy import bindparam, func, insert, literal, or_, select
+from sqlalchemy.orm import aliased
+
+from config import Config
+import scan_profiles
+from bulk_insert import insert_scans, insert_findings
+from scan_details import add_scan_details, compress, serialize_sections
+from api import db, Application, Scan, Finding, STATUS_RANKS, UNKNOWN_STATUS_RANK
+
+
+@dataclass
+class EvaluatedScan:
+    """Rule engine output for testssl.sh results, serialized for storage (see evaluate_scan_result)."""
+    status: str
+    findings: List[RuleFinding]
+    detail_sections: Dict[str, bytes]  # Compressed per section (see scan_details.py), like raw_results
+    raw_results: bytes
+    policy_version: str
+    checks: Optional[List[str]]
+
+
+def evaluate_scan_result(scan_results: Dict, checks: Optional[List[str]] = None) -> EvaluatedScan:
+    """
+    Evaluate testssl.sh results against the active policy and serialize
+    and compress them for save_evaluated_scan. Does not touch the database, so it can run
+    apart from the session that saves the scan (see scan_pipeline.py).
+
+    Args:
+        scan_results: Parsed JSON output from testssl.sh
+        checks: testssl.sh checks the scan ran, None if every check ran
+    """
+    policy = get_active_policy()
+    status, findings, detailed_info = evaluate_ssl_policy(scan_results, policy=policy, checks=checks)
+    return EvaluatedScan(
+        status=status.value,
+        findings=findings,
+        detail_sections=serialize_sections(vars(detailed_info)),
+        raw_results=compress(json.dumps(scan_results)),
+        policy_version=policy.version,
+        checks=checks
+    )
+
+
+def save_evaluated_scan(application_id: int, started_at: datetime, completed_at: datetime,
+                        evaluated: EvaluatedScan, fingerprint: Optional[str] = None,
+                        profile: str = scan_profiles.FAST, split_scan: bool = False) -> Scan:
+    """
+    Add the Scan and Findings of evaluated results to the session.
+
+    Args:
+        split_scan: The check groups ran in parallel (see ScannerBackend.scan_url_split), so the
+            duration is not one of a regular scan with the profile
+
+    Returns:
+        The flushed Scan record
+    """
+    scan = Scan(
+        application_id=application_id,
+        status=evaluated.status,
+        started_at=started_at,
+        completed_at=completed_at,
+        policy_version=evaluated.policy_version,
+        fingerprint=fingerprint,
+        scan_profile=profile,
+        scan_checks=scan_profiles.stored_checks(evaluated.checks),
+        split_scan=split_scan
+    )
+    db.session.add(scan)
+    db.session.flush()  # Get the scan ID for findings
+
+    add_scan_details(scan.id, evaluated.detail_sections, evaluated.raw_results)
+    add_findings(scan.id, evaluated.findings)
+    update_latest_scan(scan, len(evaluated.findings))
+
+    return scan
+
+
+def record_scan_result(application_id: int, started_at: datetime, completed_at: datetime,
+                       scan_results: Dict, fingerprint: Optional[str] = None,
+                       profile: str = scan_profiles.FAST, checks: Optional[List[str]] = None) -> Scan:
+    """
+    Evaluate testssl.sh results and add the Scan and its Findings to the session.
+
+    The raw results and the policy version are stored with the scan so it
+    can be re-evaluated when the policy changes (see reevaluate.py).
+
+    Args:
+        application_id: ID of the scanned application
+        started_at: When the scan started
+        completed_at: When the scan finished
+        scan_results: Parsed JSON output from testssl.sh
+        fingerprint: Hash of the pre-scan probe, if the target was probed
+        profile: Scan profile the results were produced with
+        checks: testssl.sh checks the scan ran, None if every check ran
+
+    Returns:
+        The flushed Scan record
+    """
+    return save_evaluated_scan(application_id, started_at, completed_at,
+                               evaluate_scan_result(scan_results, checks), fingerprint, profile)
+
+
+def find_unchanged_scan(application_id: int, fingerprint: Optional[str],
+                        profile: str = scan_profiles.FAST) -> Optional[Scan]:
+    """
+    Return the full scan whose result can be reused for an unchanged target.
+
+    The application's latest scan qualifies if it was taken with the same
+    fingerprint and its underlying full scan is younger than
+    Config.FINGERPRINT_MAX_AGE, so every target is still fully rescanned
+    periodically. Otherwise the newest recent full scan of any target with
+    the same fingerprint (e.g. another host name behind the same load
+    balancer and certificate) qualifies. Carried-forward scans resolve to
+    the full scan they copy. Only scans whose profile covers the requested
+    profile qualify.
+
+    Returns:
+        The full Scan to carry forward, or None if a full scan is needed
+    """
+    if not fingerprint or not Config.FINGERPRINT_SKIP:
+        return None
+    cutoff = datetime.utcnow() - timedelta(seconds=Config.FINGERPRINT_MAX_AGE)
+
+    latest = db.session.query(Scan).join(
+        Application, Application.latest_scan_id == Scan.id
+    ).filter(Application.id == application_id).first()
+    if latest and latest.fingerprint == fingerprint:
+        source = db.session.get(Scan, latest.carried_from_scan_id) if latest.carried_from_scan_id else latest
+        # Scan errors (no policy version) are never carried forward
+        if (source and source.policy_version is not None and source.completed_at and source.completed_at >= cutoff
+                and scan_profiles.covers(source.scan_profile, profile)):
+            return source
+
+    query = Scan.query.filter(
+        Scan.fingerprint == fingerprint,
+        Scan.carried_from_scan_id.is_(None),
+        Scan.policy_version.isnot(None),
+        Scan.completed_at >= cutoff
+    )
+    query = query.filter(_covering_profile(profile))
+    return query.order_by(Scan.id.desc()).first()
+
+
+def _covering_profile(profile: str):
+    """SQL condition for scans whose profile covers the requested profile."""
+    covering = [candidate for candidate in scan_profiles.PROFILES if scan_profiles.covers(candidate, profile)]
+    if scan_profiles.covers(None, profile):
+        return or_(Scan.scan_profile.is_(None), Scan.scan_profile.in_(covering))
+    return Scan.scan_profile.in_(covering)
+
+
+def due_scan_profile(application_id: int, profile: str) -> str:
+    """
+    Profile for the next scheduled scan of an application with the given
+    profile. Policy-only applications get a fast scan (every check) if they
+    have had none within Config.FULL_SCAN_INTERVAL.
+    """
+    if profile != scan_profiles.POLICY:
+        return profile
+    cutoff = datetime.utcnow() - timedelta(seconds=Config.FULL_SCAN_INTERVAL)
+    source = aliased(Scan)  # Carried-forward copies count from the full scan they copy
+    recent_full_scan = db.session.query(Scan.id).outerjoin(
+        source, source.id == Scan.carried_from_scan_id
+    ).filter(
+        Scan.application_id == application_id,
+        _covering_profile(scan_profiles.FAST),
+        Scan.policy_version.isnot(None),
+        func.coalesce(source.completed_at, Scan.completed_at) >= cutoff
+    ).first()
+    return scan_profiles.POLICY if recent_full_scan else scan_profiles.FAST
+
+
+def duration_key(target_id: Optional[int], application_id: int) -> int:
+    """Key of scan_durations: the scan target, or the negated ID of an application without one."""
+    return target_id if target_id is not None else -application_id
+
+
+def scan_durations(keys: Optional[List[int]] = None, limit: int = 20) -> Dict[int, Dict[str, List[float]]]:
+    """
+    Durations in seconds of the most recent testssl.sh scans of each target
+    over the last 30 days, per scan profile, newest first. Carried-forward
+    copies, failed scans (which record no duration) and split scans (whose
+    check groups ran in parallel) are ignored.
+
+    Args:
+        keys: Only these targets (see duration_key); defaults to all
+        limit: Most scans per target and profile
+    """
+    key = func.coalesce(Application.scan_target_id, -Application.id)
+    profile = func.coalesce(Scan.scan_profile, scan_profiles.FAST)
+    query = db.session.query(
+        key.label('key'),
+        profile.label('profile'),
+        Scan.started_at,
+        Scan.completed_at,
+        func.row_number().over(partition_by=(key, profile), order_by=Scan.completed_at.desc()).label('rank')
+    ).join(Application, Scan.application_id == Application.id).filter(
+        Scan.carried_from_scan_id.is_(None),
+        Scan.split_scan.is_(False),
+        Scan.completed_at > Scan.started_at,
+        Scan.completed_at >= datetime.utcnow() - timedelta(days=30)
+    )
+    if keys is not None:
+        query = query.filter(key.in_(keys))
+    ranked = query.subquery()
+    rows = db.session.query(ranked).filter(ranked.c.rank <= limit).order_by(ranked.c.rank).all()
+
+    durations: Dict[int, Dict[str, List[float]]] = {}
+    for row in rows:
+        durations.setdefault(row.key, {}).setdefault(row.profile, []).append(
+            (row.completed_at - row.started_at).total_seconds())
+    return durations
+
+
+def scan_timeouts(target_id: Optional[int], application_id: int, profile: Optional[str]) -> Dict:
+    """
+    Timeouts for scanning a target, from the distribution of its recent scan
+    durations with the profile: the 95th percentile times
+    Config.SCAN_TIMEOUT_FACTOR, kept between Config.SCAN_TIMEOUT_FLOOR and
+    Config.SCAN_TIMEOUT. Targets with fewer than
+    Config.SCAN_TIMEOUT_MIN_SAMPLES recorded scans get Config.SCAN_TIMEOUT.
+    The per-call openssl timeout shrinks with it (a tenth of the scan
+    timeout, at most Config.OPENSSL_TIMEOUT).
+
+    Returns:
+        {'timeout': seconds for testssl.sh, 'openssl_timeout': seconds per openssl call},
+        keyword arguments for TestSSLScanner.scan_url
+    """
+    key = duration_key(target_id, application_id)
+    durations = sorted(scan_durations([key], limit=Config.SCAN_TIMEOUT_HISTORY)
+                       .get(key, {}).get(profile or scan_profiles.FAST, []))
+    timeout = Config.SCAN_TIMEOUT
+    if len(durations) >= Config.SCAN_TIMEOUT_MIN_SAMPLES:
+        p95 = durations[min(len(durations) - 1, -(-95 * len(durations) // 100) - 1)]  # Nearest rank
+        timeout = int(min(max(p95 * Config.SCAN_TIMEOUT_FACTOR, Config.SCAN_TIMEOUT_FLOOR), Config.SCAN_TIMEOUT))
+    return {'timeout': timeout, 'openssl_timeout': int(min(max(timeout // 10, 5), Config.OPENSSL_TIMEOUT))}
+
+
+def carry_forward_scan(application_id: int, source: Scan, started_at: datetime,
+                       completed_at: datetime, fingerprint: str) -> Scan:
+    """
+    Add a Scan that copies the status, details and findings of another
+    scan: an earlier full scan of an unchanged target, or the scan of a
+    target shared with other applications.
+
+    The details and raw results are not duplicated; the detail view and
+    re-evaluation read those of the source scan via carried_from_scan_id
+    (see scan_details.py).
+
+    Returns:
+        The flushed Scan record
+    """
+    scan = Scan(
+        application_id=application_id,
+        status=source.status,
+        started_at=started_at,
+        completed_at=completed_at,
+        policy_version=source.policy_version,
+        fingerprint=fingerprint,
+        carried_from_scan_id=source.carried_from_scan_id or source.id,
+        scan_profile=source.scan_profile,
+        scan_checks=source.scan_checks
+    )
+    db.session.add(scan)
+    db.session.flush()  # Get the scan ID for findings
+
+    # Copy the findings inside the database instead of loading them
+    copied = db.session.execute(insert(Finding).from_select(
+        ['scan_id', 'category', 'severity', 'name', 'description', 'details'],
+        select(literal(scan.id), Finding.category, Finding.severity, Finding.name,
+               Finding.description, Finding.details).where(Finding.scan_id == source.id)
+    ))
+    update_latest_scan(scan, copied.rowcount)
+
+    return scan
+
+
+def fan_out_scan(scan: Scan, application_ids: List[int]) -> List[int]:
+    """
+    Copy a scan to the other applications that share its scan target, with
+    one bulk insert for the copies and one for their findings (see
+    bulk_insert.py), however many applications share it.
+
+    Returns:
+        The IDs of the copies, one per application other than the scan's own
+    """
+    app_ids = [app_id for app_id in application_ids if app_id != scan.application_id]
+    if not app_ids:
+        return []
+
+    scan_ids = insert_scans([{
+        'application_id': app_id,
+        'status': scan.status,
+        'started_at': scan.started_at,
+        'completed_at': scan.completed_at,
+        'policy_version': scan.policy_version,
+        'fingerprint': scan.fingerprint,
+        'carried_from_scan_id': scan.carried_from_scan_id or scan.id,
+        'scan_profile': scan.scan_profile,
+        'scan_checks': scan.scan_checks
+    } for app_id in app_ids])
+
+    findings = db.session.query(Finding.category, Finding.severity, Finding.name, Finding.description,
+                                Finding.details).filter(Finding.scan_id == scan.id).all()
+    insert_findings([dict(finding._asdict(), scan_id=scan_id) for scan_id in scan_ids for finding in findings])
+
+    update_latest_scans([(app_id, scan_id, scan.status, len(findings), scan.completed_at)
+                         for app_id, scan_id in zip(app_ids, scan_ids)])
+    return scan_ids
+
+
+def add_findings(scan_id: int, findings: List[RuleFinding]) -> None:
+    """Insert Finding rows for rule engine findings of a scan in one bulk write (see bulk_insert.py)."""
+    insert_findings([{
+        'scan_id': scan_id,
+        'category': finding.category,
+        'severity': finding.severity.value,
+        'name': finding.name,
+        'description': finding.description,
+        'details': finding.details
+    } for finding in findings])
+
+
+def record_scan_error(application_id: int, error: Exception) -> Scan:
+    """
+    Add a failed Scan with a SCAN_ERROR finding to the session.
+
+    Returns:
+        The flushed Scan record
+    """
+    now = datetime.utcnow()
+    scan = Scan(
+        application_id=application_id,
+        status='FAIL',
+        started_at=now,
+        completed_at=now
+    )
+    db.session.add(scan)
+    db.session.flush()  # Get the scan ID for findings
+
+    db.session.add(Finding(
+        scan_id=scan.id,
+        category='scan',
+        severity='FAIL',
+        name='SCAN_ERROR',
+        description=f'Scan failed: {str(error)}',
+        details=str(error)
+    ))
+    update_latest_scan(scan, 1)
+
+    return scan
+
+
+def record_scan_unreachable(application_id: int, error: Exception) -> Scan:
+    """
+    Add an UNREACHABLE Scan with a TARGET_UNREACHABLE finding to the session,
+    for a target that failed the pre-flight check (see TestSSLScanner.preflight).
+
+    Returns:
+        The flushed Scan record
+    """
+    now = datetime.utcnow()
+    scan = Scan(
+        application_id=application_id,
+        status='UNREACHABLE',
+        started_at=now,
+        completed_at=now
+    )
+    db.session.add(scan)
+    db.session.flush()  # Get the scan ID for findings
+
+    db.session.add(Finding(
+        scan_id=scan.id,
+        category='scan',
+        severity='FAIL',
+        name='TARGET_UNREACHABLE',
+        description=f'Target unreachable: {str(error)}',
+        details=str(error)
+    ))
+    update_latest_scan(scan, 1)
+
+    return scan
+
+
+def update_latest_scan(scan: Scan, issue_count: int) -> None:
+    """
+    Point the scan's application at it as its latest scan.
+
+    Only moves the pointer forward (by scan ID), so concurrent or late saves
+    of older scans never overwrite a newer result.
+    """
+    update_latest_scans([(scan.application_id, scan.id, scan.status, issue_count, scan.completed_at)])
+
+
+def update_latest_scans(scans: List[Tuple[int, int, str, int, datetime]]) -> None:
+    """
+    Like update_latest_scan, for many scans in one executemany.
+
+    Args:
+        scans: (application ID, scan ID, status, issue count, completed at) of each scan
+    """
+    applications = Application.__table__
+    db.session.execute(
+        applications.update().where(
+            applications.c.id == bindparam('b_application_id'),
+            or_(applications.c.latest_scan_id.is_(None), applications.c.latest_scan_id <= bindparam('b_scan_id'))
+        ).values(
+            latest_scan_id=bindparam('b_scan_id'),
+            latest_status=bindparam('b_status'),
+            latest_status_rank=bindparam('b_status_rank'),
+            latest_issue_count=bindparam('b_issue_count'),
+            last_scan_time=bindparam('b_completed_at')
+        ),
+        [{
+            'b_application_id': application_id,
+            'b_scan_id': scan_id,
+            'b_status': status,
+            'b_status_rank': STATUS_RANKS.get(status, UNKNOWN_STATUS_RANK),
+            'b_issue_count': issue_count,
+            'b_completed_at': completed_at
+        } for application_id, scan_id, status, issue_count, completed_at in scans]
+    )
+
+
+def backfill_latest_scans() -> int:
+    """
+    Fill the latest-scan columns of applications that have scans but no
+    latest_scan_id yet (e.g. after upgrading an existing database).
+
+    Returns:
+        Number of applications updated
+    """
+    latest_ids = db.session.query(
+        Scan.application_id, func.max(Scan.id)
+    ).join(
+        Application, Application.id == Scan.application_id
+    ).filter(
+        Application.latest_scan_id.is_(None)
+    ).group_by(Scan.application_id).all()
+
+    for _, scan_id in latest_ids:
+        scan = db.session.get(Scan, scan_id)
+        update_latest_scan(scan, Finding.query.filter_by(scan_id=scan_id).count())
+    db.session.commit()
+    return len(latest_ids)
@@ -1,11 +1,225 @@
+import asyncio
+import hashlib
 import subprocess
 import json
+import signal
+import socket
+import ssl
 import tempfile
 import os
-from typing import Dict, Optional
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple, Union
 from pathlib import Path
+from urllib.parse import urlparse
 
-class TestSSLScanner:
+SCAN_TIMEOUT = 1200  # 20 minute timeout to allow for complete scan
+OPENSSL_TIMEOUT = 45  # Seconds testssl.sh allows each openssl call
+
+# Disjoint testssl.sh check groups that together cover a default run; a
+# split scan runs one testssl.sh process per group at the same time
+SPLIT_SCAN_GROUPS = {
+    'protocols': ['-p'],
+    'ciphers': ['-s', '-f', '-P'],  # Cipher categories, forward secrecy, server preference
+    'server_defaults': ['-S'],  # Certificate, OCSP and session details
+    'headers': ['-h'],
+    'vulnerabilities': ['-U'],
+    'client_simulation': ['-c']
+}
+
+class TargetUnreachable(Exception):
+    """The target did not accept a TCP connection or answer a TLS ClientHello."""
+
+
+class ScannerBackend(ABC):
+    """
+    Interface of the scan backends.
+
+    A backend scans a URL and returns testssl.sh-compatible JSON that
+    rule_engine.evaluate_ssl_policy evaluates. TestSSLScanner runs every
+    check through testssl.sh; NativeTLSScanner (native_scanner.py) covers
+    protocols and certificate checks in-process. The pre-scan fingerprint
+    probe and pre-flight check only need plain TLS handshakes and are
+    shared by all backends.
+    """
+
+    def supports(self, checks: Optional[List[str]]) -> bool:
+        """Whether the backend can run these testssl.sh checks (None: a default run)."""
+        return True
+
+    @abstractmethod
+    def scan_url(self, url: str, checks: Optional[List[str]] = None, fast: bool = True,
+                 timeout: float = SCAN_TIMEOUT, openssl_timeout: int = OPENSSL_TIMEOUT) -> Dict:
+        """Scan a URL and return testssl.sh-compatible JSON results."""
+
+    @abstractmethod
+    async def scan_url_async(self, url: str, timeout: float = SCAN_TIMEOUT,
+                             checks: Optional[List[str]] = None, fast: bool = True,
+                             openssl_timeout: int = OPENSSL_TIMEOUT) -> Dict:
+        """Asyncio counterpart of scan_url."""
+
+    @abstractmethod
+    def scan_batch(self, urls: List[str], max_parallel: int = 20) -> Dict[str, Union[Dict, Exception]]:
+        """Scan many URLs, returning each URL's results or the exception its scan raised."""
+
+    def supports_split(self) -> bool:
+        """Whether the backend can run every group of SPLIT_SCAN_GROUPS (see scan_url_split)."""
+        return all(self.supports(checks) for checks in SPLIT_SCAN_GROUPS.values())
+
+    async def scan_url_split_async(self, url: str, timeout: float = SCAN_TIMEOUT,
+                                   groups: Optional[Dict[str, List[str]]] = None,
+                                   openssl_timeout: int = OPENSSL_TIMEOUT) -> Dict:
+        """
+        Scan a URL with one concurrent run of scan_url_async per check group.
+
+        Protocol, cipher, certificate, vulnerability and client simulation
+        checks run at the same time instead of one after another, so the
+        wall-clock time is roughly that of the slowest group. The results are
+        merged into one document shaped like the output of scan_url.
+
+        Args:
+            url: The URL to scan (e.g., "https://example.com")
+            timeout: Seconds to wait for each run before killing it
+            groups: Check flags per group (defaults to SPLIT_SCAN_GROUPS)
+            openssl_timeout: Seconds allowed for each openssl call
+
+        Returns:
+            Merged JSON results of all groups
+
+        Raises:
+            RuntimeError, subprocess.TimeoutExpired: If any group fails; the
+                other runs are cancelled, as partial results would read as
+                missing protocols or certificate data to the rule engine
+        """
+        groups = groups or SPLIT_SCAN_GROUPS
+        tasks = [
+            asyncio.ensure_future(self.scan_url_async(url, timeout=timeout, checks=checks,
+                                                      openssl_timeout=openssl_timeout))
+            for checks in groups.values()
+        ]
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in tasks:
+                if task in done and task.exception():
+                    raise task.exception()
+            return merge_scan_results([task.result() for task in tasks])
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def scan_url_split(self, url: str, timeout: float = SCAN_TIMEOUT, openssl_timeout: int = OPENSSL_TIMEOUT) -> Dict:
+        """
+        Synchronous wrapper around scan_url_split_async, for urgent scans of a
+        single host where wall-clock time matters more than CPU use.
+        """
+        return asyncio.run(self.scan_url_split_async(url, timeout=timeout, openssl_timeout=openssl_timeout))
+
+    def probe_fingerprint(self, url: str, timeout: float = 10) -> Dict:
+        """
+        Cheap pre-scan probe of a target's TLS configuration.
+
+        Performs a few TLS handshakes (no testssl.sh) to capture the resolved
+        IPs, the certificate fingerprint and whether it verifies for the host,
+        the highest protocol and cipher the server negotiates, and the lowest
+        protocol it still accepts. The
+        result is hashed so it can be compared with the previous scan.
+
+        Args:
+            url: The URL to probe (e.g., "https://example.com")
+            timeout: Socket timeout in seconds for each connection
+
+        Returns:
+            Dict with the probed attributes and their 'hash'
+
+        Raises:
+            OSError: If the target cannot be resolved or does not complete a handshake
+        """
+        host, port = parse_target(url)
+
+        ips = sorted({info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)})
+
+        # Highest edge: what a modern client negotiates. Try with certificate and
+        # host name verification first, so hosts sharing a certificate that is
+        # only valid for some of them get different fingerprints
+        try:
+            version, cipher, certificate = _handshake(host, port, ssl.create_default_context(), timeout)
+            cert_verified = True
+        except ssl.SSLCertVerificationError:
+            version, cipher, certificate = _handshake(host, port, _probe_context(), timeout)
+            cert_verified = False
+
+        # Lowest edge: the oldest protocol the server still accepts
+        min_protocol = None
+        for max_version in (ssl.TLSVersion.TLSv1, ssl.TLSVersion.TLSv1_1, ssl.TLSVersion.TLSv1_2):
+            context = _probe_context(legacy=True)
+            try:
+                context.maximum_version = max_version
+                min_protocol = _handshake(host, port, context, timeout)[0]
+                break
+            except (OSError, ValueError):
+                continue
+
+        fingerprint = {
+            'ips': ips,
+            'cert_sha256': hashlib.sha256(certificate).hexdigest() if certificate else None,
+            'cert_verified': cert_verified,
+            'max_protocol': version,
+            'max_cipher': cipher,
+            'min_protocol': min_protocol
+        }
+        fingerprint['hash'] = hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()
+        return fingerprint
+
+    async def preflight_async(self, url: str, timeout: float = 5) -> None:
+        """
+        Check that a target is reachable before committing a testssl.sh run to it.
+
+        Opens a TCP connection and sends a TLS ClientHello. Any answer to the
+        ClientHello, including a handshake failure alert or a reset, counts as
+        reachable: testssl.sh reports on such servers. Only a failed name
+        lookup or connect, or silence, means the target is unreachable.
+
+        Args:
+            url: The URL to check (e.g., "https://example.com")
+            timeout: Seconds allowed for the connect and for the handshake each
+
+        Raises:
+            TargetUnreachable: If the target cannot be reached
+        """
+        host, port = parse_target(url)
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        except asyncio.TimeoutError:
+            raise TargetUnreachable(f"TCP connect to {host}:{port} timed out after {timeout}s")
+        except OSError as e:
+            raise TargetUnreachable(f"TCP connect to {host}:{port} failed: {e}")
+
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.wait_for(
+                loop.start_tls(writer.transport, writer.transport.get_protocol(), _probe_context(legacy=True),
+                               server_hostname=host),
+                timeout
+            )
+        except asyncio.TimeoutError:
+            raise TargetUnreachable(f"{host}:{port} accepted the connection but did not answer the TLS ClientHello "
+                                    f"within {timeout}s")
+        except (ssl.SSLError, ConnectionError):
+            pass  # The server answered
+        finally:
+            writer.transport.abort()
+
+    def preflight(self, url: str, timeout: float = 5) -> None:
+        """
+        Synchronous wrapper around preflight_async.
+
+        Raises:
+            TargetUnreachable: If the target cannot be reached
+        """
+        asyncio.run(self.preflight_async(url, timeout))
+
+
+class TestSSLScanner(ScannerBackend):
     """
     Integration with testssl.sh for SSL/TLS scanning.
     """
@@ -21,64 +235,246 @@ class TestSSLScanner:
         if not os.path.exists(testssl_path):
             raise FileNotFoundError(f"testssl.sh not found at {testssl_path}")
     
-    def scan_url(self, url: str) -> Dict:
+    def _build_command(self, url: str, json_output_path: str, checks: Optional[List[str]] = None,
+                       fast: bool = True, openssl_timeout: int = OPENSSL_TIMEOUT) -> List[str]:
+        """
+        Build the testssl.sh command line for a scan writing JSON to json_output_path.
+
+        Args:
+            checks: testssl.sh check flags to run instead of the default set of checks
+            fast: Pass --fast to skip the slowest tests
+            openssl_timeout: Seconds allowed for each openssl call
+        """
+        # Prepare the command with faster options - URL must come last
+        return [
+            self.testssl_path,
+            *(['--fast'] if fast else []),  # Speed up scan by skipping some tests
+            '--openssl-timeout', str(openssl_timeout),  # Reduce timeout for individual OpenSSL calls
+            '--jsonfile-pretty', json_output_path,  # Output in JSON format to file
+            '--warnings', 'off',  # Disable interactive warnings
+            *(checks or []),
+            url
+        ]
+
+    def _build_batch_command(self, targets_file_path: str, json_output_path: str) -> List[str]:
+        """Build the testssl.sh mass-testing command line scanning every target in targets_file_path."""
+        return [
+            self.testssl_path,
+            '--fast',
+            '--openssl-timeout', str(OPENSSL_TIMEOUT),
+            '--jsonfile-pretty', json_output_path,  # One combined file with a scanResult entry per target
+            '--warnings', 'off',
+            '--mode', 'parallel',  # Scan the targets of the file concurrently
+            '--file', targets_file_path
+        ]
+
+    @staticmethod
+    def _check_return_code(returncode: int, stdout: str, stderr: str) -> None:
+        """Raise RuntimeError if testssl.sh exited with a real failure."""
+        # Check if the command had a true failure (return codes 100+ are actual errors)
+        # Return codes 1-9 typically indicate various levels of vulnerabilities found
+        if returncode >= 100:
+            # Return more detailed error information
+            error_msg = f"testssl.sh failed with return code {returncode}"
+            if stdout:
+                error_msg += f": stdout={stdout}"
+            if stderr:
+                error_msg += f", stderr={stderr}"
+            raise RuntimeError(error_msg)
+        elif returncode > 0:
+            # Log that the scan completed with vulnerabilities/warnings but continue processing
+            print(f"testssl.sh scan completed with return code {returncode} (indicating vulnerabilities found)")
+
+    @staticmethod
+    def _read_json_output(json_output_path: str) -> Dict:
+        """Read and parse the JSON output written by testssl.sh."""
+        with open(json_output_path, 'r') as f:
+            return json.load(f)
+
+    def scan_url(self, url: str, checks: Optional[List[str]] = None, fast: bool = True,
+                 timeout: float = SCAN_TIMEOUT, openssl_timeout: int = OPENSSL_TIMEOUT) -> Dict:
         """
         Scan a URL using testssl.sh and return parsed JSON results.
 
         Args:
             url: The URL to scan (e.g., "https://example.com")
+            checks: testssl.sh check flags to run instead of the default set of checks
+            fast: Pass --fast to skip the slowest tests (see scan_profiles.scan_arguments)
+            timeout: Seconds to wait for testssl.sh (see scan_store.scan_timeouts)
+            openssl_timeout: Seconds allowed for each openssl call
 
         Returns:
             Parsed JSON results from testssl.sh
+
+        Raises:
+            subprocess.TimeoutExpired: If the scan does not finish within timeout
         """
         # Create a temporary file to store JSON output
         with tempfile.NamedTemporaryFile(mode='w+', suffix='.json', delete=False) as tmp_file:
             json_output_path = tmp_file.name
 
         try:
-            # Prepare the command with faster options - URL must come last
-            cmd = [
-                self.testssl_path,
-                '--fast',  # Speed up scan by skipping some tests
-                '--openssl-timeout', '45',  # Reduce timeout for individual OpenSSL calls
-                '--jsonfile-pretty', json_output_path,  # Output in JSON format to file
-                '--warnings', 'off',  # Disable interactive warnings
-                url
-            ]
+            cmd = self._build_command(url, json_output_path, checks, fast, openssl_timeout)
 
             # Execute the scan
             result = subprocess.run(
                 cmd,
                 capture_output=True,
                 text=True,
-                timeout=1200  # 20 minute timeout to allow for complete scan
+                timeout=timeout
             )
 
-            # Check if the command had a true failure (return codes 100+ are actual errors)
-            # Return codes 1-9 typically indicate various levels of vulnerabilities found
-            if result.returncode >= 100:
-                # Return more detailed error information
-                error_msg = f"testssl.sh failed with return code {result.returncode}"
-                if result.stdout:
-                    error_msg += f": stdout={result.stdout}"
-                if result.stderr:
-                    error_msg += f", stderr={result.stderr}"
-                raise RuntimeError(error_msg)
-            elif result.returncode > 0:
-                # Log that the scan completed with vulnerabilities/warnings but continue processing
-                print(f"testssl.sh scan completed with return code {result.returncode} (indicating vulnerabilities found)")
-
-            # Read and parse the JSON output
-            with open(json_output_path, 'r') as f:
-                json_data = json.load(f)
-
-            return json_data
+            self._check_return_code(result.returncode, result.stdout, result.stderr)
+
+            return self._read_json_output(json_output_path)
 
         finally:
             # Clean up the temporary file
             if os.path.exists(json_output_path):
                 os.remove(json_output_path)
 
+    async def scan_url_async(self, url: str, timeout: float = SCAN_TIMEOUT,
+                             checks: Optional[List[str]] = None, fast: bool = True,
+                             openssl_timeout: int = OPENSSL_TIMEOUT) -> Dict:
+        """
+        Asyncio counterpart of scan_url.
+
+        testssl.sh runs as an asyncio subprocess in its own process group, so a
+        single event loop can supervise many scans at once. On timeout or
+        cancellation the whole process group (testssl.sh and the openssl
+        children it forks) is killed.
+
+        Args:
+            url: The URL to scan (e.g., "https://example.com")
+            timeout: Seconds to wait for testssl.sh before killing it
+            checks: testssl.sh check flags to run instead of the default set of checks
+            fast: Pass --fast to skip the slowest tests
+            openssl_timeout: Seconds allowed for each openssl call
+
+        Returns:
+            Parsed JSON results from testssl.sh, identical to scan_url
+
+        Raises:
+            subprocess.TimeoutExpired: If the scan does not finish within timeout
+        """
+        with tempfile.NamedTemporaryFile(mode='w+', suffix='.json', delete=False) as tmp_file:
+            json_output_path = tmp_file.name
+
+        try:
+            cmd = self._build_command(url, json_output_path, checks, fast, openssl_timeout)
+
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True  # New process group so children can be killed together
+            )
+
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+            except asyncio.TimeoutError:
+                await self._kill_process_group(process)
+                raise subprocess.TimeoutExpired(cmd, timeout)
+            except asyncio.CancelledError:
+                await self._kill_process_group(process)
+                raise
+
+            self._check_return_code(
+                process.returncode,
+                stdout.decode(errors='replace'),
+                stderr.decode(errors='replace')
+            )
+
+            return await asyncio.to_thread(self._read_json_output, json_output_path)
+
+        finally:
+            if os.path.exists(json_output_path):
+                os.remove(json_output_path)
+
+    def scan_batch(self, urls: List[str], max_parallel: int = 20) -> Dict[str, Union[Dict, Exception]]:
+        """
+        Scan many URLs with a single testssl.sh mass-testing run.
+
+        The URLs are written to a command file for ``--file`` and scanned by
+        one testssl.sh process in ``--mode parallel``, which saves the bash
+        and OpenSSL startup cost of one invocation per URL. The combined JSON
+        output is split back into one result per URL, shaped like the output
+        of scan_url.
+
+        Args:
+            urls: The URLs to scan
+            max_parallel: Maximum number of targets testssl.sh scans at once
+
+        Returns:
+            Dict mapping each URL to its parsed results, or to the exception
+            describing why that target could not be scanned. A failure of the
+            whole run is reported for every URL.
+        """
+        invalid = {}
+        for url in urls:
+            try:
+                parse_target(url)
+            except ValueError as e:
+                invalid[url] = e  # Keep unparseable lines out of the command file
+        urls = [url for url in urls if url not in invalid]
+        if not urls:
+            return invalid
+
+        # Each host:port is scanned once; split_batch_results gives its entry to every URL on it
+        targets = batch_targets(urls)
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as targets_file:
+            targets_file.write(''.join(f"{url}\n" for url in targets))
+            targets_file_path = targets_file.name
+        with tempfile.NamedTemporaryFile(mode='w+', suffix='.json', delete=False) as tmp_file:
+            json_output_path = tmp_file.name
+
+        # Each round of max_parallel targets may take up to a full scan timeout
+        timeout = SCAN_TIMEOUT * -(-len(targets) // max_parallel)
+        try:
+            cmd = self._build_batch_command(targets_file_path, json_output_path)
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                env={**os.environ, 'MAX_PARALLEL': str(max_parallel)},
+                start_new_session=True  # New process group so the per-target children can be killed together
+            )
+            try:
+                stdout, stderr = process.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired as e:
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass  # Already exited
+                process.wait()
+                return {**invalid, **{url: e for url in urls}}
+
+            # testssl.sh's exit code summarizes all targets, so failures are judged per target below
+            try:
+                combined = self._read_json_output(json_output_path)
+            except (OSError, ValueError):
+                error = RuntimeError(
+                    f"testssl.sh batch failed with return code {process.returncode}: stderr={stderr}"
+                )
+                return {**invalid, **{url: error for url in urls}}
+
+            return {**invalid, **split_batch_results(combined, urls)}
+
+        finally:
+            for path in (targets_file_path, json_output_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    @staticmethod
+    async def _kill_process_group(process: asyncio.subprocess.Process) -> None:
+        """Kill the process group led by process and reap it."""
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass  # Already exited
+        await process.wait()
+
     def scan_url_to_file(self, url: str, output_path: str) -> Dict:
         """
         Scan a URL using testssl.sh and save results to a specified file.
@@ -90,20 +486,13 @@ class TestSSLScanner:
         Returns:
             Parsed JSON results from testssl.sh
         """
-        cmd = [
-            self.testssl_path,
-            '--fast',
-            '--openssl-timeout', '45',  # Reduce timeout for individual OpenSSL calls
-            '--jsonfile-pretty', output_path,
-            '--warnings', 'off',  # Disable interactive warnings
-            url
-        ]
+        cmd = self._build_command(url, output_path)
 
         result = subprocess.run(
             cmd,
             capture_output=True,
             text=True,
-            timeout=1200  # 20 minute timeout to allow for complete scan
+            timeout=SCAN_TIMEOUT
         )
 
         if result.returncode != 0:
@@ -120,6 +509,116 @@ class TestSSLScanner:
 
         return json_data
 
+
+def parse_target(url: str) -> Tuple[str, int]:
+    """Return the (host, port) pair testssl.sh would scan for a URL."""
+    parsed = urlparse(url if '://' in url else f'https://{url}')
+    if not parsed.hostname:
+        raise ValueError(f"Cannot determine host from {url!r}")
+    return parsed.hostname, parsed.port or 443
+
+
+def merge_scan_results(results: List[Dict]) -> Dict:
+    """
+    Merge the JSON of several testssl.sh runs against the same target into one document.
+
+    The per-target sections of all runs are combined into a single
+    scanResult entry. Sections every run reports (e.g. pretest) are kept
+    once, with entries deduplicated by id; scanTime is the longest run.
+    """
+    merged = {key: value for key, value in results[0].items() if key != 'scanResult'}
+    entry: Dict = {}
+    for result in results:
+        for section in result.get('scanResult', [])[:1]:
+            for key, value in section.items():
+                if key not in entry:
+                    entry[key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list) and isinstance(entry[key], list):
+                    seen = {item.get('id') for item in entry[key] if isinstance(item, dict)}
+                    entry[key].extend(item for item in value if not (isinstance(item, dict) and item.get('id') in seen))
+    merged['scanResult'] = [entry]
+
+    scan_times = [result['scanTime'] for result in results if isinstance(result.get('scanTime'), (int, float))]
+    if scan_times:
+        merged['scanTime'] = max(scan_times)
+    return merged
+
+
+def _batch_key(host: str, port) -> Tuple[str, str]:
+    """The host:port a URL or scanResult entry of a mass-testing run is matched by."""
+    return host.rstrip('.').lower(), str(port)
+
+
+def batch_targets(urls: List[str]) -> List[str]:
+    """
+    The URLs to put in the command file of a mass-testing run: the first of
+    the (parseable) URLs on each host:port, in order.
+    """
+    targets = {}
+    for url in urls:
+        host, port = parse_target(url)
+        targets.setdefault(_batch_key(host, port), url)
+    return list(targets.values())
+
+
+def split_batch_results(combined: Dict, urls: List[str]) -> Dict[str, Union[Dict, Exception]]:
+    """
+    Split the combined JSON of a testssl.sh mass-testing run into per-URL results.
+
+    Each URL gets a copy of the run's top-level fields with only its own
+    scanResult entry, matched by host and port; URLs on the same host:port
+    (scanned once, see batch_targets) each get that entry. A URL without an
+    entry, or whose entry only reports a fatal scan problem, gets a
+    RuntimeError.
+    """
+    metadata = {key: value for key, value in combined.items() if key != 'scanResult'}
+    entries = {}
+    for entry in combined.get('scanResult', []):
+        entries.setdefault(_batch_key(str(entry.get('targetHost', '')), entry.get('port', '')), entry)
+
+    results = {}
+    for url in urls:
+        try:
+            host, port = parse_target(url)
+        except ValueError as e:
+            results[url] = e
+            continue
+
+        entry = entries.get(_batch_key(host, port))
+        if entry is None:
+            results[url] = RuntimeError(f"testssl.sh returned no result for {url}")
+            continue
+
+        problems = [
+            item.get('finding', '') for value in entry.values() if isinstance(value, list)
+            for item in value if isinstance(item, dict) and item.get('id') == 'scanProblem'
+            and item.get('severity') == 'FATAL'
+        ]
+        if problems:
+            results[url] = RuntimeError(f"testssl.sh could not scan {url}: {'; '.join(problems)}")
+            continue
+
+        results[url] = {**metadata, 'scanResult': [entry]}
+    return results
+
+
+def _probe_context(legacy: bool = False) -> ssl.SSLContext:
+    """TLS client context for probing: no verification, optionally allowing legacy protocols and ciphers."""
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    if legacy:
+        context.minimum_version = ssl.TLSVersion.TLSv1
+        context.set_ciphers('ALL:@SECLEVEL=0')
+    return context
+
+
+def _handshake(host: str, port: int, context: ssl.SSLContext, timeout: float) -> Tuple[str, str, Optional[bytes]]:
+    """Complete one TLS handshake and return (protocol, cipher, DER certificate)."""
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        with context.wrap_socket(sock, server_hostname=host) as tls_sock:
+            return tls_sock.version(), tls_sock.cipher()[0], tls_sock.getpeercert(binary_form=True)
+
 # Example usage
 def example_usage():
     # Initialize scanner (assuming testssl.sh is installed in default location)
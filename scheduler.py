@@ -1,9 +1,10 @@
 # scheduler.py
 from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime
-import json
 import logging
+import resource
 import sys
 import os
 
@@ -11,8 +12,16 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from scanner import TestSSLScanner
-from rule_engine import evaluate_ssl_policy
-from api import db, Application, Scan, Finding
+from config import Config
+from api import app, db
+from scan_schedule import claim_due_targets
+from targets import backfill_scan_targets, application_limit_keys
+from scan_limits import FairScanQueue
+from scan_pipeline import ScanPipeline, ScanTask
+from worker import ScanWorker
+from job_queue import enqueue_due_applications
+from reevaluate import reevaluate_stale_scans
+import scan_planner
 
 # Configure logging
 logging.basicConfig(
@@ -26,124 +35,175 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+def memory_usage():
+    """
+    Current and peak resident memory of the process, in MB.
+
+    The current value is read from /proc and is None where that is not available.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+    if sys.platform == 'darwin':
+        peak /= 1024  # Bytes on macOS
+    try:
+        with open('/proc/self/statm') as f:
+            current = int(f.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+    except OSError:
+        current = None
+    return current, peak
+
+def memory_summary():
+    current, peak = memory_usage()
+    if current is None:
+        return f"peak RSS {peak:.0f} MB"
+    return f"RSS {current:.0f} MB, peak {peak:.0f} MB"
+
 class SSLScanScheduler:
     """
-    Scheduler for automated SSL/TLS scans every 24 hours.
+    Scheduler for automated SSL/TLS scans on each application's own interval.
     """
     
-    def __init__(self):
+    def __init__(self, max_workers=None, scanner=None):
+        """
+        Args:
+            max_workers: Maximum number of concurrent scans (defaults to Config.SCAN_CONCURRENCY)
+            scanner: Scanner to use (defaults to a TestSSLScanner)
+        """
         self.scheduler = BlockingScheduler()
-        self.scanner = TestSSLScanner()
+        self.scanner = scanner or TestSSLScanner()
+        self.max_workers = max_workers or Config.SCAN_CONCURRENCY
         
-    def scan_all_applications(self):
+    def scan_due_applications(self, include_all=False):
         """
-        Scan all applications in the database.
+        Scan the applications that are due (see scan_schedule.py).
+
+        Due applications are grouped by scan target and each target is
+        scanned once, with the result saved for every application sharing
+        it. Targets are scanned on ``max_workers`` threads of the scan
+        pipeline (see scan_pipeline.py), within the per-host and per-network
+        limits of scan_limits.py, while the pipeline evaluates and saves
+        finished scans. Each result is committed on its own, in short-lived
+        sessions, so one slow or failing target does not hold back or roll
+        back the others and memory stays flat over a run of the whole fleet.
+        The process's memory use is logged after each run.
+
+        Args:
+            include_all: Scan every application, due or not
         """
-        logger.info("Starting scheduled scan of all applications")
-        
         try:
-            # Get all applications from the database
-            applications = Application.query.all()
-            
-            if not applications:
-                logger.info("No applications found to scan")
+            with app.app_context():
+                backfill_scan_targets()
+                targets = claim_due_targets(include_all=include_all)
+
+            if not targets:
                 return
-            
-            logger.info(f"Found {len(applications)} applications to scan")
-            
-            for app in applications:
-                try:
-                    logger.info(f"Scanning {app.url}")
-                    
-                    # Record scan start time
-                    scan_start_time = datetime.utcnow()
-                    
-                    # Perform the scan
-                    scan_results = self.scanner.scan_url(app.url)
-                    scan_end_time = datetime.utcnow()
-                    
-                    # Evaluate the results
-                    status, findings, detailed_info = evaluate_ssl_policy(scan_results)
-
-                    # Create scan record
-                    scan = Scan(
-                        application_id=app.id,
-                        status=status.value,
-                        started_at=scan_start_time,
-                        completed_at=scan_end_time,
-                        detailed_ssl_info=json.dumps({
-                            'protocol_info': detailed_info.protocol_info,
-                            'cipher_info': detailed_info.cipher_info,
-                            'certificate_info': detailed_info.certificate_info,
-                            'vulnerabilities': detailed_info.vulnerabilities,
-                            'handshake_simulation': detailed_info.handshake_simulation,
-                            'misc_info': detailed_info.misc_info
-                        })
-                    )
-                    
-                    db.session.add(scan)
-                    db.session.flush()  # Get the scan ID for findings
-                    
-                    # Create finding records
-                    for finding in findings:
-                        db_finding = Finding(
-                            scan_id=scan.id,
-                            category=finding.category,
-                            severity=finding.severity.value,
-                            name=finding.name,
-                            description=finding.description,
-                            details=finding.details
-                        )
-                        db.session.add(db_finding)
-                    
-                    logger.info(f"Completed scan for {app.url} with status: {status.value}")
-                    
-                except Exception as e:
-                    logger.error(f"Error scanning {app.url}: {str(e)}")
-                    # Create a failed scan record
-                    scan = Scan(
-                        application_id=app.id,
-                        status='FAIL',
-                        started_at=datetime.utcnow(),
-                        completed_at=datetime.utcnow()
-                    )
-                    db.session.add(scan)
-                    db.session.flush()  # Get the scan ID for findings
-                    db_finding = Finding(
-                        scan_id=scan.id,
-                        category='scan',
-                        severity='FAIL',
-                        name='SCAN_ERROR',
-                        description=f'Scan failed: {str(e)}',
-                        details=str(e)
-                    )
-                    db.session.add(db_finding)
-            
-            # Commit all changes to the database
-            db.session.commit()
-            logger.info("Scheduled scan completed for all applications")
-            
+
+            logger.info(f"Found {sum(len(target.application_ids) for target in targets)} applications on "
+                        f"{len(targets)} scan targets to scan with {self.max_workers} workers")
+
+            # Per-host and per-network caps, networks served round-robin (see scan_limits.py)
+            with app.app_context():
+                keys = application_limit_keys([target.application_ids[0] for target in targets])
+            queue = FairScanQueue()
+            for target in targets:
+                task = ScanTask(url=target.url, application_ids=target.application_ids, profile=target.profile,
+                                target_id=target.target_id)
+                task.on_scanned = lambda task=task: queue.done(task)
+                queue.put(task, keys.get(target.application_ids[0], set()))
+
+            pipeline = ScanPipeline(self.scanner, scan_workers=min(self.max_workers, len(targets)))
+            status_counts = pipeline.run(lambda index: queue.get())
+
+            logger.info(f"Scan of {len(targets)} scan targets completed: {status_counts}; "
+                        f"memory: {memory_summary()}")
+
         except Exception as e:
             logger.error(f"Error during scheduled scan: {str(e)}")
-            db.session.rollback()
-    
+
+    def scan_all_applications(self):
+        """
+        Scan all applications now, regardless of their schedule.
+        """
+        logger.info("Starting scan of all applications")
+        self.scan_due_applications(include_all=True)
+
+    def enqueue_due_applications(self, include_all=False):
+        """
+        Queue a scan job per due scan target instead of scanning in-process.
+        The jobs are executed by run_worker.py replicas.
+        """
+        try:
+            with app.app_context():
+                backfill_scan_targets()
+                jobs = enqueue_due_applications(include_all=include_all)
+            if jobs:
+                logger.info(f"Queued scan jobs for {len(jobs)} scan targets")
+        except Exception as e:
+            logger.error(f"Error queueing scheduled scan: {str(e)}")
+
+    def plan_scan_window(self):
+        """
+        Plan and queue the scans of the scan window (see scan_planner.py).
+        """
+        try:
+            with app.app_context():
+                backfill_scan_targets()
+                scan_planner.plan_scan_window()
+        except Exception as e:
+            logger.error(f"Error planning the scan window: {str(e)}")
+
+    def enqueue_all_applications(self):
+        """
+        Queue a scan job for every scan target, regardless of schedule.
+        """
+        logger.info("Queueing scan of all applications")
+        self.enqueue_due_applications(include_all=True)
+
+    def reevaluate_stale_scans(self):
+        """
+        Re-evaluate stored scans whose policy version is outdated (see reevaluate.py).
+        """
+        try:
+            with app.app_context():
+                counts = reevaluate_stale_scans()
+            if counts['updated'] or counts['failed']:
+                logger.info(f"Re-evaluated scans against the current policy: {counts}")
+        except Exception as e:
+            logger.error(f"Error re-evaluating scans: {str(e)}")
+
     def start(self):
         """
-        Start the scheduler with a cron job for daily scans.
-        By default, runs at 2:00 AM every day.
+        Start the scheduler. Applications are scanned when their next_scan_at
+        passes, checked every Config.SCHEDULE_POLL_INTERVAL seconds.
         """
         logger.info("Starting SSL scan scheduler")
         
-        # Schedule the scan to run every day at 2:00 AM
+        # Scan locally, or hand the scans to the worker replicas through the job queue
+        due_job = self.enqueue_due_applications if Config.SCAN_DISPATCH == 'queue' else self.scan_due_applications
+
+        # A poll that is still scanning when the next one is due is not run twice
         self.scheduler.add_job(
-            self.scan_all_applications,
-            CronTrigger(hour=2, minute=0),  # Daily at 2:00 AM
-            id='daily_ssl_scan',
-            name='Daily SSL/TLS scan of all applications',
+            due_job,
+            IntervalTrigger(seconds=Config.SCHEDULE_POLL_INTERVAL),
+            id='due_ssl_scans',
+            name='SSL/TLS scans of due applications',
+            max_instances=1,
+            coalesce=True,
             replace_existing=True
         )
         
-        logger.info("Scheduler job added: Daily SSL scan at 2:00 AM")
+        logger.info(f"Scheduler job added: scans of due applications every {Config.SCHEDULE_POLL_INTERVAL}s")
+
+        if Config.SCAN_WINDOW:
+            self._start_scan_window()
+
+        # Re-apply the policy to stored scans whenever the policy file changes
+        self.scheduler.add_job(
+            self.reevaluate_stale_scans,
+            IntervalTrigger(seconds=Config.REEVALUATE_INTERVAL),
+            id='reevaluate_stale_scans',
+            name='Re-evaluate scans against the current policy',
+            replace_existing=True
+        )
         
         try:
             logger.info("Scheduler started. Waiting for jobs...")
@@ -152,69 +212,28 @@ class SSLScanScheduler:
             logger.info("Scheduler interrupted by user")
             self.scheduler.shutdown()
     
-    def add_application_scan(self, app_id):
-        """
-        Add a one-time scan for a specific application.
-        """
-        def scan_single_application():
-            try:
-                app = Application.query.get(app_id)
-                if not app:
-                    logger.error(f"Application with ID {app_id} not found")
-                    return
-                
-                logger.info(f"Manually scanning {app.url}")
-                
-                scan_start_time = datetime.utcnow()
-                scan_results = self.scanner.scan_url(app.url)
-                scan_end_time = datetime.utcnow()
-                
-                status, findings, detailed_info = evaluate_ssl_policy(scan_results)
-
-                scan = Scan(
-                    application_id=app.id,
-                    status=status.value,
-                    started_at=scan_start_time,
-                    completed_at=scan_end_time,
-                    detailed_ssl_info=json.dumps({
-                        'protocol_info': detailed_info.protocol_info,
-                        'cipher_info': detailed_info.cipher_info,
-                        'certificate_info': detailed_info.certificate_info,
-                        'vulnerabilities': detailed_info.vulnerabilities,
-                        'handshake_simulation': detailed_info.handshake_simulation,
-                        'misc_info': detailed_info.misc_info
-                    })
-                )
-                
-                db.session.add(scan)
-                db.session.flush()
-                
-                for finding in findings:
-                    db_finding = Finding(
-                        scan_id=scan.id,
-                        category=finding.category,
-                        severity=finding.severity.value,
-                        name=finding.name,
-                        description=finding.description,
-                        details=finding.details
-                    )
-                    db.session.add(db_finding)
-                
-                db.session.commit()
-                logger.info(f"Manual scan completed for {app.url}")
-                
-            except Exception as e:
-                logger.error(f"Error in manual scan for app {app_id}: {str(e)}")
-                db.session.rollback()
-        
-        # Add the job to run immediately
+    def _start_scan_window(self):
+        """
+        Plan the scan window each time it opens. Planned scans are queued
+        jobs; without scan workers (local dispatch) this process runs them.
+        """
+        window_start, _ = scan_planner.parse_window(Config.SCAN_WINDOW)
         self.scheduler.add_job(
-            scan_single_application,
-            'date',
-            run_date=datetime.utcnow(),
-            id=f'manual_scan_{app_id}_{datetime.utcnow().timestamp()}',
+            self.plan_scan_window,
+            CronTrigger(hour=window_start.hour, minute=window_start.minute, timezone=Config.SCHEDULER_TIMEZONE),
+            id='plan_scan_window',
+            name='Plan the scans of the scan window',
             replace_existing=True
         )
+        logger.info(f"Scheduler job added: scan window {Config.SCAN_WINDOW} planned when it opens")
+
+        # Started inside the window: plan what is left of it now
+        now = datetime.utcnow()
+        if scan_planner.window_bounds(now)[0] <= now:
+            self.plan_scan_window()
+
+        if Config.SCAN_DISPATCH != 'queue':
+            ScanWorker(concurrency=Config.SCAN_WINDOW_CONCURRENCY, scanner=self.scanner).start_background()
 
 # Example usage
 if __name__ == "__main__":
@@ -222,8 +241,10 @@ if __name__ == "__main__":
     from api import app
 
     # Initialize the database
+    from schema import upgrade_schema
     with app.app_context():
         db.create_all()
+        upgrade_schema()
 
     # Create and start the scheduler
     scheduler = SSLScanScheduler()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Upgrades of the tables of an existing database.
+
+db.create_all() creates missing tables but never changes existing ones, so
+columns added to a model after its table was created (UPGRADE_COLUMNS) are
+added here with ALTER TABLE ... ADD COLUMN, together with the indexes of
+those tables that are missing, and string columns that were widened
+(WIDEN_COLUMNS) are altered to their new length on PostgreSQL. Like scan_details.migrate_legacy_columns,
+each step inspects the table first, so upgrading is safe to run on every
+start; on PostgreSQL the statements are also IF NOT EXISTS, so services
+starting together can all run it. Run it after create_all() and before
+anything reads the new columns (the API, scheduler and workers do on
+start).
+
+upgrade_database runs the whole start-up path: create the tables, add the
+new columns, move scan details off the scans table (see
+scan_details.migrate_legacy_columns), then fill the new columns for
+existing rows.
+
+Usage:
+    python schema.py    # Upgrade the database in DATABASE_URL
+"""
+
+import logging
+import os
+import sys
+from typing import Dict, Tuple
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, literal, text
+from sqlalchemy.schema import CreateIndex
+
+from api import app, db, Application, Scan, ScanJob, ScanTarget
+
+logger = logging.getLogger(__name__)
+
+# Columns added to each model after its table may already have been created, in the order they are added
+UPGRADE_COLUMNS: Dict[type, Tuple[str, ...]] = {
+    Application: ('latest_scan_id', 'latest_status', 'latest_status_rank', 'latest_issue_count', 'last_scan_time',
+                  'scan_target_id', 'scan_profile', 'scan_interval', 'next_scan_at'),
+    Scan: ('policy_version', 'fingerprint', 'carried_from_scan_id', 'scan_profile', 'scan_checks',
+           'failed_policy_version', 'split_scan'),
+    ScanTarget: ('unreachable_count', 'unreachable_since', 'timeout_count', 'circuit_open_until'),
+    ScanJob: ('full_scan', 'scan_profile', 'planned_start', 'planned_finish'),
+}
+
+# String columns whose length grew after their table may already have been created (for the UNREACHABLE status)
+WIDEN_COLUMNS: Dict[type, Tuple[str, ...]] = {
+    Application: ('latest_status',),
+    Scan: ('status',),
+}
+
+
+def column_ddl(column) -> str:
+    """The column definition of ALTER TABLE ... ADD COLUMN for a model column."""
+    dialect = db.engine.dialect
+    ddl = f"{column.name} {column.type.compile(dialect=dialect)}"
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        ddl += f" DEFAULT {literal(default, column.type).compile(dialect=dialect, compile_kwargs={'literal_binds': True})}"
+        if not column.nullable:
+            ddl += " NOT NULL"  # Existing rows get the default
+    for foreign_key in column.foreign_keys:
+        ddl += f" REFERENCES {foreign_key.column.table.name} ({foreign_key.column.name})"
+    return ddl
+
+
+def add_missing_columns(model, names: Tuple[str, ...]) -> int:
+    """
+    Add the columns of a model that its (existing) table lacks, and the
+    missing indexes of the table. Does not commit.
+
+    Returns:
+        Number of columns added
+    """
+    table = model.__table__
+    inspector = inspect(db.session.connection())
+    if not inspector.has_table(table.name):
+        return 0  # create_all creates it with every column
+    existing = {column['name'] for column in inspector.get_columns(table.name)}
+    missing = [name for name in names if name not in existing]
+    if_not_exists = ' IF NOT EXISTS' if db.engine.dialect.name == 'postgresql' else ''
+    for name in missing:
+        db.session.execute(text(f"ALTER TABLE {table.name} ADD COLUMN{if_not_exists} {column_ddl(table.c[name])}"))
+        logger.info(f"Added column {table.name}.{name}")
+
+    # Indexes on columns added by a later upgrade are left to that upgrade
+    columns = existing | set(missing)
+    indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in indexes and {column.name for column in index.columns} <= columns:
+            db.session.execute(CreateIndex(index, if_not_exists=True))
+            logger.info(f"Added index {index.name}")
+    return len(missing)
+
+
+def widen_columns(model, names: Tuple[str, ...]) -> int:
+    """
+    Alter string columns of a model's (existing) table that are shorter than
+    the model's to the model's length. Only PostgreSQL enforces the length;
+    SQLite accepts longer values. Does not commit.
+
+    Returns:
+        Number of columns widened
+    """
+    table = model.__table__
+    inspector = inspect(db.session.connection())
+    if db.engine.dialect.name != 'postgresql' or not inspector.has_table(table.name):
+        return 0
+    lengths = {column['name']: getattr(column['type'], 'length', None) for column in inspector.get_columns(table.name)}
+    widened = 0
+    for name in names:
+        column = table.c[name]
+        if lengths.get(name) is not None and lengths[name] < column.type.length:
+            db.session.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {name} "
+                                    f"TYPE {column.type.compile(dialect=db.engine.dialect)}"))
+            logger.info(f"Widened column {table.name}.{name} to {column.type.length}")
+            widened += 1
+    return widened
+
+
+def upgrade_schema() -> int:
+    """
+    Add the columns in UPGRADE_COLUMNS that the database lacks, widen the
+    columns in WIDEN_COLUMNS, and commit.
+
+    Returns:
+        Number of columns added
+    """
+    if db.engine.dialect.name == 'postgresql':
+        # Needed by the trigram indexes of applications, like on create_all
+        db.session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    added = sum(add_missing_columns(model, names) for model, names in UPGRADE_COLUMNS.items())
+    for model, names in WIDEN_COLUMNS.items():
+        widen_columns(model, names)
+    db.session.commit()
+    return added
+
+
+def upgrade_database() -> None:
+    """Create missing tables, upgrade existing ones and fill the new columns of existing rows."""
+    from scan_details import migrate_legacy_columns
+    from scan_store import backfill_latest_scans
+    from targets import backfill_scan_targets
+
+    db.create_all()
+    upgrade_schema()
+    moved = migrate_legacy_columns()
+    if moved:
+        logger.info(f"Moved the details of {moved} scans to scan_details")
+    backfill_latest_scans()
+    backfill_scan_targets()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+    with app.app_context():
+        upgrade_database()
+    print("Database upgraded")
+
+
+if __name__ == "__main__":
+    main()
@@ -27,7 +27,10 @@ else:
 
 print('Creating database tables...')
 with app.app_context():
-    db.create_all()
+    # Creates missing tables, adds the columns newer versions added to existing ones and
+    # moves scan details of older databases to scan_details
+    from schema import upgrade_database
+    upgrade_database()
 print('Database tables created successfully!')
 "
 
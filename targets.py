@@ -0,0 +1,171 @@
+"""
+Scan targets shared by applications.
+
+testssl.sh scans a host:port pair (with the host as SNI), not a URL, so
+applications whose URLs differ only in path, case or default port are the
+same target. Each application points at a normalized ScanTarget; the
+scheduler scans each due target once and copies the result to its
+applications (see scan_schedule.py). Targets on different host names that
+present the same TLS fingerprint (resolved IPs, certificate, protocols)
+additionally share full scans through find_unchanged_scan.
+
+Like scan_store, the helpers add and flush on db.session but never commit.
+"""
+
+import ipaddress
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from config import Config
+from scanner import parse_target
+from scan_limits import target_limit_keys
+import scan_profiles
+from api import db, Application, ScanTarget
+
+
+def canonical_target(url: str) -> Tuple[str, int, str]:
+    """
+    Normalize a URL to the (host, port, sni) triple testssl.sh scans.
+
+    Raises:
+        ValueError: If the URL has no usable host
+    """
+    host, port = parse_target(url)
+    host = host.rstrip('.').lower()
+    try:
+        ipaddress.ip_address(host)
+        return host, port, ''  # No SNI is sent to IP addresses
+    except ValueError:
+        pass
+    try:
+        host = host.encode('idna').decode('ascii')
+    except UnicodeError:
+        raise ValueError(f"Invalid host name in {url!r}")
+    return host, port, host
+
+
+def get_or_create_target(url: str) -> ScanTarget:
+    """Return the ScanTarget for a URL, adding it to the session if it is new."""
+    host, port, sni = canonical_target(url)
+    target = ScanTarget.query.filter_by(host=host, port=port, sni=sni).first()
+    if target:
+        return target
+
+    target = ScanTarget(host=host, port=port, sni=sni)
+    try:
+        with db.session.begin_nested():
+            db.session.add(target)
+    except IntegrityError:
+        # Another process created the same target concurrently
+        target = ScanTarget.query.filter_by(host=host, port=port, sni=sni).one()
+    return target
+
+
+def assign_scan_target(application: Application) -> ScanTarget:
+    """Point an application at the target for its URL."""
+    application.scan_target = get_or_create_target(application.url)
+    return application.scan_target
+
+
+def backfill_scan_targets() -> int:
+    """
+    Assign targets to applications that have none yet (e.g. after upgrading
+    an existing database) and commit.
+
+    Returns:
+        Number of applications updated
+    """
+    applications = Application.query.filter(Application.scan_target_id.is_(None)).all()
+    for application in applications:
+        try:
+            assign_scan_target(application)
+        except ValueError:
+            continue  # Scanned (and failed) on its own
+    db.session.commit()
+    return len(applications)
+
+
+def target_application_ids(application: Application, profile: Optional[str] = None) -> List[int]:
+    """
+    IDs of the applications sharing the application's target, the application itself first.
+
+    Args:
+        profile: Only include other applications whose scan profile a scan with this profile covers
+    """
+    if application.scan_target_id is None:
+        return [application.id]
+    others = db.session.query(Application.id, Application.scan_profile).filter(
+        Application.scan_target_id == application.scan_target_id,
+        Application.id != application.id
+    ).order_by(Application.id)
+    return [application.id] + [app_id for app_id, app_profile in others
+                               if profile is None or scan_profiles.covers(profile, app_profile)]
+
+
+def record_target_probe(target_id: int, probe: Dict) -> None:
+    """Store the resolved IPs and fingerprint of a target's latest probe."""
+    db.session.query(ScanTarget).filter(ScanTarget.id == target_id).update({
+        'resolved_ips': json.dumps(probe['ips']),
+        'fingerprint': probe['hash'],
+        'probed_at': datetime.utcnow()
+    }, synchronize_session=False)
+
+
+def record_target_reachability(target_id: int, reachable: bool) -> int:
+    """
+    Count a target's consecutive failed pre-flight checks.
+
+    Returns:
+        The number of consecutive failures, 0 if the target was reachable
+    """
+    target = db.session.get(ScanTarget, target_id)
+    if reachable:
+        target.unreachable_count = 0
+        target.unreachable_since = None
+    else:
+        if not target.unreachable_count:
+            target.unreachable_since = datetime.utcnow()
+        target.unreachable_count = (target.unreachable_count or 0) + 1
+    return target.unreachable_count
+
+
+def record_scan_timeout(target_id: int, timed_out: bool) -> Optional[datetime]:
+    """
+    Count a target's consecutive scan timeouts. After
+    Config.CIRCUIT_BREAKER_THRESHOLD of them the circuit opens: the target is
+    not scanned on schedule for Config.CIRCUIT_BREAKER_COOLDOWN. The first
+    scan after the cool-down closes it again if it finishes, or reopens it
+    if it times out as well. A finished scan resets the count.
+
+    Returns:
+        When the circuit closes again, if it is open
+    """
+    target = db.session.get(ScanTarget, target_id)
+    if not timed_out:
+        target.timeout_count = 0
+        target.circuit_open_until = None
+        return None
+    target.timeout_count = (target.timeout_count or 0) + 1
+    if target.timeout_count >= Config.CIRCUIT_BREAKER_THRESHOLD:
+        target.circuit_open_until = datetime.utcnow() + timedelta(seconds=Config.CIRCUIT_BREAKER_COOLDOWN)
+    return target.circuit_open_until
+
+
+def application_limit_keys(application_ids: List[int]) -> Dict[int, Set[str]]:
+    """Concurrency limit keys (see scan_limits.py) of the targets of applications, by application ID."""
+    rows = db.session.query(Application.id, Application.url, ScanTarget.host, ScanTarget.resolved_ips).outerjoin(
+        ScanTarget, Application.scan_target_id == ScanTarget.id
+    ).filter(Application.id.in_(application_ids))
+    keys = {}
+    for app_id, url, host, resolved_ips in rows:
+        if host is None:
+            try:
+                host = canonical_target(url)[0]
+            except ValueError:
+                keys[app_id] = set()
+                continue
+        keys[app_id] = target_limit_keys(host, resolved_ips)
+    return keys
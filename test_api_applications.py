@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test the keyset pagination and filters of GET /api/applications.
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import reset_database
+from api import app, db, Application, STATUS_RANKS, UNKNOWN_STATUS_RANK, _encode_cursor
+
+NOW = datetime.utcnow().replace(microsecond=0)
+
+# (status, hours since the last scan); several share a status or scan time to exercise the id tie-break
+APPLICATIONS = [
+    ('PASS', 1), ('FAIL', 2), (None, None), ('WARN', 1), ('FAIL', 5),
+    ('PASS', 2), (None, None), ('WARN', 3), ('UNREACHABLE', 1), ('FAIL', 1),
+]
+
+def create_applications():
+    reset_database()
+    for i, (status, age) in enumerate(APPLICATIONS, start=1):
+        db.session.add(Application(
+            id=i, url=f'https://app{i}.example.com', name=f'App {i}',
+            latest_status=status, latest_status_rank=STATUS_RANKS.get(status, UNKNOWN_STATUS_RANK),
+            last_scan_time=NOW - timedelta(hours=age) if age is not None else None
+        ))
+    db.session.commit()
+
+def fetch_all(client, **params):
+    """IDs of every page of a listing, fetched two at a time."""
+    ids, cursor = [], None
+    while True:
+        query = dict(params, limit=2, **({'cursor': cursor} if cursor else {}))
+        response = client.get('/api/applications', query_string=query)
+        assert response.status_code == 200, response.get_json()
+        page = response.get_json()
+        assert len(page['items']) <= 2
+        ids += [item['id'] for item in page['items']]
+        cursor = page['next_cursor']
+        if not cursor:
+            return ids
+
+def test_pages_follow_a_stable_order():
+    """Paging through each sort returns every application once, in the sort order."""
+    with app.app_context():
+        create_applications()
+        rows = Application.query.all()
+        by_status = [a.id for a in sorted(rows, key=lambda a: (a.latest_status_rank, a.id))]
+        scanned = sorted((a for a in rows if a.last_scan_time), key=lambda a: (a.last_scan_time, a.id), reverse=True)
+        never = sorted((a for a in rows if not a.last_scan_time), key=lambda a: a.id, reverse=True)
+        by_last_scan = [a.id for a in scanned + never]
+
+    client = app.test_client()
+    assert fetch_all(client) == list(range(1, len(APPLICATIONS) + 1))
+    assert fetch_all(client, sort='status') == by_status
+    assert fetch_all(client, sort='last_scan') == by_last_scan
+    # Filters apply on every page
+    assert fetch_all(client, sort='status', status='FAIL,UNKNOWN') == [2, 5, 10, 3, 7]
+    assert fetch_all(client, sort='last_scan', max_age=1.5) == [10, 9, 4, 1]
+    print("✅ Pages follow a stable order for every sort")
+
+def test_malformed_cursors_are_rejected():
+    """Cursors that were not issued for the requested sort get a 400, not a 500."""
+    with app.app_context():
+        create_applications()
+    client = app.test_client()
+    cursors = {
+        'id': ['not base64!', _encode_cursor({'a': 1}), _encode_cursor([None]), _encode_cursor([None, 'x']),
+               _encode_cursor([None, True]), _encode_cursor(['x', 3])],
+        'status': [_encode_cursor(['FAIL', 3]), _encode_cursor([None, 3]), _encode_cursor([1.5, 3]),
+                   _encode_cursor([[1], 3])],
+        'last_scan': [_encode_cursor(['yesterday', 3]), _encode_cursor([17, 3]), _encode_cursor([{'t': 1}, 3]),
+                      _encode_cursor(['2024-01-01T00:00:00+02:00', 3])],
+    }
+    for sort, values in cursors.items():
+        for cursor in values:
+            response = client.get('/api/applications', query_string={'sort': sort, 'cursor': cursor})
+            assert response.status_code == 400, (sort, cursor, response.status_code)
+    print("✅ Malformed cursors are rejected with 400")
+
+if __name__ == "__main__":
+    test_pages_follow_a_stable_order()
+    test_malformed_cursors_are_rejected()
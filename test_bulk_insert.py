@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test the bulk insert path of scans and findings against the ORM path.
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import reset_database
+from api import app, db, Application, Scan, Finding
+from bulk_insert import FINDING_COLUMNS, _copy_value, insert_scans, insert_findings
+
+def test_copy_value_escapes_text_format():
+    """Values are escaped for COPY's text format and None is NULL."""
+    assert _copy_value(None) == '\\N'
+    assert _copy_value('a\\b') == 'a\\\\b'
+    assert _copy_value('a\tb') == 'a\\tb'
+    assert _copy_value('a\nb') == 'a\\nb'
+    assert _copy_value('a\rb') == 'a\\rb'
+    assert _copy_value('C:\\new\tline\r\n') == 'C:\\\\new\\tline\\r\\n'
+    assert _copy_value(42) == '42'
+    # The text 'None' and '\N' are values, not NULL
+    assert _copy_value('None') == 'None'
+    assert _copy_value('\\N') == '\\\\N'
+    print("✅ COPY values are escaped")
+
+def test_insert_scans_returns_ids_in_row_order():
+    """The returned IDs belong to the rows in the order they were given."""
+    with app.app_context():
+        reset_database()
+        db.session.add_all([Application(id=1, url='https://a.example.com'), Application(id=2, url='https://b.example.com')])
+        db.session.commit()
+
+        start = datetime(2024, 1, 1)
+        rows = [{'application_id': 1 + i % 2, 'status': ('PASS', 'WARN', 'FAIL')[i % 3],
+                 'started_at': start + timedelta(minutes=i)} for i in range(7)]
+        scan_ids = insert_scans(rows)
+        db.session.commit()
+
+        assert len(scan_ids) == len(rows)
+        for scan_id, row in zip(scan_ids, rows):
+            scan = db.session.get(Scan, scan_id)
+            assert (scan.application_id, scan.status, scan.started_at) == \
+                (row['application_id'], row['status'], row['started_at'])
+        assert insert_scans([]) == []
+    print("✅ insert_scans returns IDs in row order")
+
+def test_insert_findings_matches_orm_path():
+    """insert_findings stores the same rows as adding Finding objects to the session."""
+    with app.app_context():
+        reset_database()
+        db.session.add(Application(id=1, url='https://a.example.com'))
+        bulk_scan, orm_scan = (Scan(application_id=1, status='FAIL', started_at=datetime(2024, 1, 1)) for _ in range(2))
+        db.session.add_all([bulk_scan, orm_scan])
+        db.session.flush()
+
+        findings = [
+            {'category': 'protocol', 'severity': 'FAIL', 'name': 'TLS1', 'description': 'TLS 1.0 offered',
+             'details': 'offered (deprecated)'},
+            {'category': 'cipher', 'severity': 'WARN', 'name': 'CBC', 'description': 'Tab\tand\nnewline\\',
+             'details': None},
+            {'category': 'certificate', 'severity': 'INFO', 'name': 'EXPIRY', 'description': None, 'details': ''},
+        ]
+        insert_findings([dict(finding, scan_id=bulk_scan.id) for finding in findings])
+        db.session.add_all([Finding(scan_id=orm_scan.id, **finding) for finding in findings])
+        db.session.commit()
+
+        def stored(scan_id):
+            return [tuple(getattr(finding, column) for column in FINDING_COLUMNS if column != 'scan_id')
+                    for finding in Finding.query.filter_by(scan_id=scan_id).order_by(Finding.id)]
+        assert stored(bulk_scan.id) == stored(orm_scan.id)
+        assert len(stored(bulk_scan.id)) == len(findings)
+    print("✅ insert_findings stores the same rows as the ORM")
+
+if __name__ == "__main__":
+    test_copy_value_escapes_text_format()
+    test_insert_scans_returns_ids_in_row_order()
+    test_insert_findings_matches_orm_path()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test the persistent scan job queue: deduplication, profile upgrades, claiming, retries and reclaiming.
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import reset_database
+from config import Config
+from api import app, db, Application, Finding, Scan, ScanJob
+import job_queue
+import scan_profiles
+
+def create_application():
+    reset_database()
+    application = Application(url='https://app.example.com', name='App')
+    db.session.add(application)
+    db.session.commit()
+    return application.id
+
+def make_runnable(job):
+    """Let a job waiting for its retry backoff run now."""
+    job.run_after = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+def test_enqueue_merges_into_the_active_job():
+    """Queueing an application twice returns its active job; a finished job lets a new one be queued."""
+    with app.app_context():
+        app_id = create_application()
+        job, created = job_queue.enqueue_scan(app_id, return_created=True)
+        again, created_again = job_queue.enqueue_scan(app_id, return_created=True)
+        assert created and not created_again
+        assert again.id == job.id
+        assert ScanJob.query.count() == 1
+
+        job_queue.complete_job(job_queue.claim_next_job('w1'), scan_id=None)
+        assert job_queue.enqueue_scan(app_id).id != job.id
+    print("✅ Repeated scan requests merge into the active job")
+
+def test_enqueue_upgrades_to_a_broader_profile():
+    """A queued job is upgraded to a broader profile and a full scan, never downgraded."""
+    with app.app_context():
+        app_id = create_application()
+        job = job_queue.enqueue_scan(app_id, profile=scan_profiles.CERT)
+        job_queue.enqueue_scan(app_id, profile=scan_profiles.FAST, full_scan=True)
+        job_queue.enqueue_scan(app_id, profile=scan_profiles.POLICY)
+        db.session.refresh(job)
+        assert (job.scan_profile, job.full_scan) == (scan_profiles.FAST, True)
+
+        # A running job is left as it is
+        job_queue.claim_next_job('w1')
+        job_queue.enqueue_scan(app_id, profile=scan_profiles.FULL)
+        db.session.refresh(job)
+        assert job.scan_profile == scan_profiles.FAST
+    print("✅ Queued jobs are upgraded to broader profiles")
+
+def test_retries_back_off_then_fail_with_a_failed_scan():
+    """Failed attempts are retried with exponential backoff, then the job fails with a failed Scan."""
+    with app.app_context():
+        app_id = create_application()
+        job = job_queue.enqueue_scan(app_id, max_attempts=2)
+
+        job_queue.fail_job(job_queue.claim_next_job('w1'), 'boom')
+        db.session.refresh(job)
+        assert job.status == job_queue.RETRY and job.worker_id is None
+        assert job.run_after > datetime.utcnow() + timedelta(seconds=Config.JOB_RETRY_BACKOFF - 5)
+        assert job_queue.claim_next_job('w1') is None  # Not before the backoff
+
+        make_runnable(job)
+        claimed = job_queue.claim_next_job('w1')
+        assert claimed.id == job.id and claimed.attempts == 2
+        job_queue.fail_job(claimed, 'boom again')
+        db.session.refresh(job)
+        assert job.status == job_queue.FAILED and job.finished_at is not None
+
+        scan = db.session.get(Scan, job.scan_id)
+        assert scan.status == 'FAIL' and scan.application_id == app_id
+        assert Finding.query.filter_by(scan_id=scan.id, name='SCAN_ERROR').count() == 1
+        assert db.session.get(Application, app_id).latest_scan_id == scan.id
+    print("✅ Retries back off, then the job fails with a failed scan")
+
+def test_stale_jobs_are_reclaimed():
+    """A running job whose worker stopped heartbeating is returned to the queue."""
+    with app.app_context():
+        app_id = create_application()
+        job = job_queue.enqueue_scan(app_id)
+        job_queue.claim_next_job('w1')
+        assert job_queue.reclaim_stale_jobs() == 0
+        assert job_queue.heartbeat(job.id, 'w1')
+
+        job.heartbeat_at = datetime.utcnow() - timedelta(seconds=Config.JOB_STALE_AFTER + 1)
+        db.session.commit()
+        assert job_queue.reclaim_stale_jobs() == 1
+        db.session.refresh(job)
+        assert job.status == job_queue.RETRY and job.worker_id is None
+        assert 'w1' in job.error
+        # The old worker learns it lost the job
+        assert not job_queue.heartbeat(job.id, 'w1')
+    print("✅ Stale jobs are reclaimed")
+
+def test_claimed_jobs_are_not_claimed_again():
+    """A job claimed by one worker is not handed to another, by queue order or by ID."""
+    with app.app_context():
+        app_id = create_application()
+        job = job_queue.enqueue_scan(app_id)
+        claimed = job_queue.claim_next_job('w1')
+        assert claimed.id == job.id and claimed.worker_id == 'w1' and claimed.status == job_queue.RUNNING
+
+        assert job_queue.claim_next_job('w2') is None
+        assert job_queue.claim_job(job.id, 'w2') is None
+        db.session.refresh(job)
+        assert (job.worker_id, job.attempts) == ('w1', 1)
+    print("✅ Claimed jobs are not claimed again")
+
+def test_claim_job_takes_the_given_job():
+    """claim_job claims the requested job even when older jobs are waiting."""
+    with app.app_context():
+        reset_database()
+        db.session.add_all([Application(id=1, url='https://old.example.com'),
+                            Application(id=2, url='https://manual.example.com')])
+        db.session.commit()
+        job_queue.enqueue_scan(1, run_after=datetime.utcnow() - timedelta(hours=1))
+        manual = job_queue.enqueue_scan(2)
+
+        claimed = job_queue.claim_job(manual.id, 'api')
+        assert claimed.id == manual.id and claimed.status == job_queue.RUNNING
+        assert job_queue.claim_next_job('w1').application_id == 1
+    print("✅ claim_job claims the given job")
+
+if __name__ == "__main__":
+    test_enqueue_merges_into_the_active_job()
+    test_enqueue_upgrades_to_a_broader_profile()
+    test_retries_back_off_then_fail_with_a_failed_scan()
+    test_stale_jobs_are_reclaimed()
+    test_claimed_jobs_are_not_claimed_again()
+    test_claim_job_takes_the_given_job()
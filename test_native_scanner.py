@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test the in-process TLS scan backend: certificate parsing, the handshake
+messages it exchanges, and that its output evaluates like testssl.sh JSON.
+"""
+import sys
+import os
+import ssl
+from datetime import datetime
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from native_scanner import (NativeTLSScanner, parse_certificate, build_scan_document, client_hello,
+                            server_hello_version)
+from rule_engine import evaluate_ssl_policy, Severity
+
+# Self-signed RSA 1024 certificate for localhost (SAN localhost, 127.0.0.1; OCSP http://ocsp.example.com),
+# valid 2026-10-16 21:10:27 to 2026-11-05 21:10:27
+CERTIFICATE = ssl.PEM_cert_to_DER_cert("""-----BEGIN CERTIFICATE-----
+MIICdTCCAd6gAwIBAgIUBZpA08yfEZFui52IlBq8J09uw0YwDQYJKoZIhvcNAQEL
+BQAwIzESMBAGA1UEAwwJbG9jYWxob3N0MQ0wCwYDVQQKDARUZXN0MB4XDTI2MTAx
+NjIxMTAyN1oXDTI2MTEwNTIxMTAyN1owIzESMBAGA1UEAwwJbG9jYWxob3N0MQ0w
+CwYDVQQKDARUZXN0MIGfMA0GCSqGSIb3DQEBAQUAA4GNADCBiQKBgQDbyWWUMw4g
+AvZbtmhKU6xW1OxYH7qU5WjEoqhH464wVVn7qm5PH7f+y84A5H+h96CAG/sSo2Xu
+G+69gSBbyxMyQ79gASXOrkBEiniPzyrlDdj5CH0Borf7OeQQnawZGVtAjV+zyQba
+9h1L1WGoDMUAPqmfnDDqf1+sAR7YfSySSwIDAQABo4GlMIGiMB0GA1UdDgQWBBT4
+As+08yn+VhfFNXgO6SFITOiYIDAfBgNVHSMEGDAWgBT4As+08yn+VhfFNXgO6SFI
+TOiYIDAPBgNVHRMBAf8EBTADAQH/MBoGA1UdEQQTMBGCCWxvY2FsaG9zdIcEfwAA
+ATAzBggrBgEFBQcBAQQnMCUwIwYIKwYBBQUHMAGGF2h0dHA6Ly9vY3NwLmV4YW1w
+bGUuY29tMA0GCSqGSIb3DQEBCwUAA4GBALIj191MF8hLMfFxceLHutwvr8EasDUT
+TQxbvqYn0HIiBpFNkYCA97t8h+fGCED9NxwwWYwgngupFVt6tO+YLEOnAH36sAIb
+FklXLdMpGgyLfng8ro8zsgZAqiH81pceZ+ryxycA4l0fHDC+BVUflgUTQ4KAQkFF
+VL4NcOXy0wp4
+-----END CERTIFICATE-----
+""")
+
+def test_parse_certificate():
+    """Names, validity, key and extensions are read from the DER certificate."""
+    certificate = parse_certificate(CERTIFICATE)
+    assert certificate['common_name'] == 'localhost'
+    assert certificate['issuer'] == 'localhost (Test)'
+    assert certificate['subject_alt_names'] == ['localhost', '127.0.0.1']
+    assert certificate['not_after'] == datetime(2026, 11, 5, 21, 10, 27)
+    assert (certificate['key_algorithm'], certificate['key_bits']) == ('RSA', 1024)
+    assert certificate['signature_algorithm'] == 'SHA256 with RSA'
+    assert certificate['ocsp_url'] == 'http://ocsp.example.com'
+    assert not certificate['must_staple']
+    print("✅ Certificates are parsed without external libraries")
+
+def test_server_hello_version():
+    """ClientHellos offer one version; TLS 1.3 ServerHellos are recognized by supported_versions."""
+    hello = client_hello('example.com', 0x0304)
+    assert hello[0] == 22 and hello[5] == 1
+    assert b'example.com' in hello and b'\x00\x2b\x00\x03\x02\x03\x04' in hello
+    assert b'example.com' not in client_hello('192.0.2.1', 0x0303)
+
+    tls12 = b'\x03\x03' + bytes(32) + b'\x00' + b'\xc0\x2f' + b'\x00'
+    tls13 = b'\x03\x03' + bytes(32) + b'\x00' + b'\x13\x01' + b'\x00' + b'\x00\x06' + b'\x00\x2b\x00\x02\x03\x04'
+    assert server_hello_version(tls12) == 0x0303
+    assert server_hello_version(tls13) == 0x0304
+    print("✅ Protocol versions are read from the ServerHello")
+
+def test_document_evaluates_like_testssl():
+    """The native document is evaluated by the policy and reported like a testssl.sh scan."""
+    protocols = {'SSLv3': False, 'TLS1': True, 'TLS1_1': False, 'TLS1_2': True, 'TLS1_3': None}
+    handshake = {'protocol': 'TLSv1.2', 'cipher': 'ECDHE-RSA-AES128-GCM-SHA256', 'bits': 128,
+                 'certificate': CERTIFICATE, 'verify_error': 'self-signed certificate'}
+    document = build_scan_document('localhost', 443, '127.0.0.1', ['-p', '-S'], protocols, handshake,
+                                   [CERTIFICATE], False, now=datetime(2026, 10, 26))
+
+    status, findings, detailed_info = evaluate_ssl_policy(document, checks=['-p', '-S'])
+    assert status == Severity.FAIL
+    assert [finding.name for finding in findings if finding.severity == Severity.FAIL] == ['TLS1']
+    assert detailed_info.protocol_info['TLS1']['supported']
+    assert detailed_info.protocol_info['TLS1_3']['severity'] == 'WARN'
+
+    entries = {entry['id']: entry for entry in document['scanResult'][0]['serverDefaults']}
+    assert entries['cert_keySize'] == {'id': 'cert_keySize', 'severity': 'HIGH', 'finding': 'RSA 1024 bits'}
+    assert entries['cert_expirationStatus']['finding'] == 'expires < 30 days (10)'
+    assert entries['cert_chain_of_trust']['severity'] == 'CRITICAL'
+    assert entries['cert_trust']['finding'] == 'Ok via SAN'
+    assert entries['OCSP_stapling']['finding'] == 'not offered'
+    assert detailed_info.misc_info['cert_keySize']['finding'] == 'RSA 1024 bits'
+
+    assert NativeTLSScanner().supports(['-S']) and NativeTLSScanner().supports(['-p', '-S'])
+    assert not NativeTLSScanner().supports(None) and not NativeTLSScanner().supports(['-S', '-U'])
+    print("✅ Native scan results evaluate like testssl.sh output")
+
+if __name__ == "__main__":
+    test_parse_certificate()
+    test_server_hello_version()
+    test_document_evaluates_like_testssl()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test the declarative policy: compilation, evaluation and hot reload of the policy file.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from rule_engine import evaluate_ssl_policy, Severity
+from policy import compile_policy, PolicyStore, PolicyError
+
+SCAN_RESULTS = {
+    "scanResult": [{
+        "protocols": [
+            {"id": "TLS1_2", "severity": "OK", "finding": "offered"},
+            {"id": "TLS1_3", "severity": "OK", "finding": "offered with final"}
+        ],
+        "serverDefaults": [
+            {"id": "cert_keySize", "severity": "INFO", "finding": "RSA 1024 bits"},
+            {"id": "OCSP_stapling", "severity": "LOW", "finding": "not offered"}
+        ]
+    }]
+}
+
+WEAK_KEY_RULE = {
+    "name": "WEAK_KEY",
+    "category": "certificate",
+    "severity": "FAIL",
+    "description": "Key is {finding}",
+    "match": {"id": "cert_keySize", "finding_not_regex": "(2048|3072|4096) bits"}
+}
+
+def test_rules_keyed_by_testssl_id():
+    """Rules match testssl ids and render their templates."""
+    policy = compile_policy({"rules": [WEAK_KEY_RULE, {
+        "name": "{ID}_MISSING",
+        "category": "configuration",
+        "severity": "WARN",
+        "match": {"id_regex": "^OCSP_", "severity": ["LOW", "MEDIUM"]}
+    }]})
+
+    status, findings, _ = evaluate_ssl_policy(SCAN_RESULTS, policy=policy)
+    assert status == Severity.FAIL
+    assert [(f.name, f.severity) for f in findings] == [('WEAK_KEY', Severity.FAIL),
+                                                        ('OCSP_STAPLING_MISSING', Severity.WARN)]
+    assert findings[0].description == 'Key is RSA 1024 bits'
+    print("✅ Rules keyed by testssl id produce the expected findings")
+
+def test_absent_rule():
+    """Absent rules fire only when no entry matches."""
+    policy = compile_policy({"rules": [{
+        "name": "TLS_1.3_NOT_ENABLED",
+        "category": "protocol",
+        "severity": "WARN",
+        "type": "absent",
+        "match": {"section": "protocols", "id": "TLS1_3", "severity": ["OK"]}
+    }]})
+    assert evaluate_ssl_policy(SCAN_RESULTS, policy=policy)[1] == []
+
+    without_tls13 = {"scanResult": [{"protocols": SCAN_RESULTS["scanResult"][0]["protocols"][:1]}]}
+    status, findings, _ = evaluate_ssl_policy(without_tls13, policy=policy)
+    assert status == Severity.WARN and findings[0].name == 'TLS_1.3_NOT_ENABLED'
+    print("✅ Absent rules fire only when nothing matches")
+
+def test_invalid_policy_rejected():
+    """Unknown match keys and bad severities are rejected at compile time."""
+    for bad_rule in ({**WEAK_KEY_RULE, "severity": "PASS"}, {**WEAK_KEY_RULE, "match": {"ids": "x"}}):
+        try:
+            compile_policy({"rules": [bad_rule]})
+        except PolicyError:
+            continue
+        raise AssertionError(f"Rule should have been rejected: {bad_rule}")
+    print("✅ Invalid rules are rejected")
+
+def test_hot_reload():
+    """The store recompiles the policy when the file changes and keeps it on errors."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'policy.json')
+        with open(path, 'w') as f:
+            json.dump({"rules": []}, f)
+
+        store = PolicyStore(path, check_interval=0)
+        first = store.get()
+        assert evaluate_ssl_policy(SCAN_RESULTS, policy=first)[0] == Severity.PASS
+
+        with open(path, 'w') as f:
+            json.dump({"rules": [WEAK_KEY_RULE]}, f)
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000_000))
+        second = store.get()
+        assert second is not first and second.version != first.version
+        assert evaluate_ssl_policy(SCAN_RESULTS, policy=second)[0] == Severity.FAIL
+
+        with open(path, 'w') as f:
+            f.write('{not json')
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 2_000_000_000))
+        assert store.get() is second
+    print("✅ Policy file changes are picked up without a restart")
+
+def test_required_checks_follow_rules_and_details():
+    """Policy-only scans run just the testssl.sh checks the rules and detail sections read."""
+    protocol_rule = {'name': '{ID}', 'category': 'protocol', 'severity': 'FAIL',
+                     'match': {'section': 'protocols', 'id_regex': 'TLS1', 'severity': ['HIGH']}}
+    ocsp_rule = {'name': 'OCSP', 'category': 'configuration', 'severity': 'WARN',
+                 'match': {'section_category': 'ocsp'}}
+
+    policy = compile_policy({'rules': [protocol_rule, ocsp_rule], 'detail_sections': ['protocol_info']})
+    assert policy.required_checks() == ['-p', '-S']
+
+    policy = compile_policy({'rules': [protocol_rule], 'detail_sections': ['protocol_info', 'handshake_simulation']})
+    assert policy.required_checks() == ['-p', '-c']
+
+    # Rules that can match anywhere, and the misc details, need a full run
+    misc_rule = {'name': 'ANY', 'category': 'misc', 'severity': 'WARN', 'match': {'severity': ['CRITICAL']}}
+    assert compile_policy({'rules': [protocol_rule, misc_rule], 'detail_sections': []}).required_checks() is None
+    assert compile_policy({'rules': [protocol_rule]}).required_checks() is None
+
+    try:
+        compile_policy({'rules': [], 'detail_sections': ['nope']})
+        assert False, "unknown detail section accepted"
+    except PolicyError:
+        pass
+    print("✅ Required testssl.sh checks are derived from the policy")
+
+def test_partial_scan_skips_uncovered_rules():
+    """Rules reading checks a partial scan did not run are not evaluated."""
+    policy = compile_policy({"rules": [{
+        "name": "TLS_1.3_NOT_ENABLED",
+        "category": "protocol",
+        "severity": "WARN",
+        "type": "absent",
+        "match": {"section": "protocols", "id": "TLS1_3", "severity": ["OK"]}
+    }]})
+    cert_only = {"scanResult": [{"serverDefaults": []}]}
+    assert evaluate_ssl_policy(cert_only, policy=policy, checks=['-S'])[1] == []
+    assert evaluate_ssl_policy(cert_only, policy=policy)[1][0].name == 'TLS_1.3_NOT_ENABLED'
+    print("✅ Partial scans are evaluated only against the rules they cover")
+
+if __name__ == "__main__":
+    test_rules_keyed_by_testssl_id()
+    test_absent_rule()
+    test_invalid_policy_rejected()
+    test_hot_reload()
+    test_required_checks_follow_rules_and_details()
+    test_partial_scan_skips_uncovered_rules()
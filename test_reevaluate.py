@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test re-evaluating stored scans against a changed policy.
+"""
+import sys
+import os
+from datetime import datetime
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import reset_database
+from bench_rule_engine import build_full_scan_results
+from api import app, db, Application, Finding, Scan, ScanDetails
+from policy import compile_policy, get_active_policy
+import reevaluate
+from scan_details import compress
+from scan_store import evaluate_scan_result, save_evaluated_scan
+
+# A policy without rules passes every scan
+NO_RULES = compile_policy({'rules': []}, version='no-rules')
+
+def create_scans():
+    """An application whose latest scan fails the active policy, and an older scan with unreadable raw results."""
+    reset_database()
+    db.session.add(Application(id=1, url='https://a.example.com'))
+    evaluated = evaluate_scan_result(build_full_scan_results())
+    broken = save_evaluated_scan(1, datetime(2024, 1, 1), datetime(2024, 1, 1, 0, 1), evaluated)
+    db.session.get(ScanDetails, broken.id).raw_results = compress('{"scanResult": [')
+    latest = save_evaluated_scan(1, datetime(2024, 1, 2), datetime(2024, 1, 2, 0, 1), evaluated)
+    db.session.commit()
+    return broken.id, latest.id
+
+def test_policy_change_updates_stored_scans():
+    """A changed policy rewrites the status and findings of stored scans and the application's latest columns."""
+    with app.app_context():
+        broken_id, latest_id = create_scans()
+        application = db.session.get(Application, 1)
+        assert (application.latest_status, application.latest_issue_count) == ('FAIL', 2)
+
+        counts = reevaluate.reevaluate_stale_scans(workers=1, policy=NO_RULES)
+        assert counts == {'updated': 1, 'failed': 1}
+
+        db.session.expire_all()
+        scan = db.session.get(Scan, latest_id)
+        assert (scan.status, scan.policy_version) == ('PASS', NO_RULES.version)
+        assert Finding.query.filter_by(scan_id=latest_id).count() == 0
+        application = db.session.get(Application, 1)
+        assert (application.latest_status, application.latest_status_rank, application.latest_issue_count) == \
+            ('PASS', 2, 0)
+        # The scan that could not be evaluated keeps its results
+        broken = db.session.get(Scan, broken_id)
+        assert (broken.status, broken.policy_version) == ('FAIL', get_active_policy().version)
+    print("✅ A policy change updates stored scans")
+
+def test_failed_scans_wait_for_the_next_policy_change():
+    """A scan that fails to evaluate is not retried with the same policy, but is with the next one."""
+    with app.app_context():
+        broken_id, _ = create_scans()
+        assert reevaluate.reevaluate_stale_scans(workers=1, policy=NO_RULES) == {'updated': 1, 'failed': 1}
+        assert db.session.get(Scan, broken_id).failed_policy_version == NO_RULES.version
+
+        # Nothing is left to do, so no worker processes are started
+        executor = reevaluate.ProcessPoolExecutor
+
+        def no_pool(*args, **kwargs):
+            raise AssertionError("a process pool was started without stale scans")
+        reevaluate.ProcessPoolExecutor = no_pool
+        try:
+            assert reevaluate.reevaluate_stale_scans(workers=1, policy=NO_RULES) == {'updated': 0, 'failed': 0}
+        finally:
+            reevaluate.ProcessPoolExecutor = executor
+
+        changed = compile_policy({'rules': []}, version='no-rules-2')
+        assert reevaluate.reevaluate_stale_scans(workers=1, policy=changed) == {'updated': 1, 'failed': 1}
+    print("✅ Failed scans wait for the next policy change")
+
+if __name__ == "__main__":
+    test_policy_change_updates_stored_scans()
+    test_failed_scans_wait_for_the_next_policy_change()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test splitting the combined output of a testssl.sh mass-testing run into per-URL results,
+and merging the outputs of split-section runs into one document.
+"""
+import sys
+import os
+import json
+import stat
+import tempfile
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import scanner
+from scanner import batch_targets, split_batch_results, merge_scan_results
+from rule_engine import evaluate_ssl_policy, Severity
+
+COMBINED = {
+    'Invocation': 'testssl.sh --mode parallel --file targets.txt',
+    'version': '3.2',
+    'scanResult': [
+        {'targetHost': 'a.example.com', 'ip': '192.0.2.1', 'port': '443',
+         'protocols': [{'id': 'TLS1', 'severity': 'LOW', 'finding': 'offered (deprecated)'}]},
+        {'targetHost': 'b.example.com', 'ip': '192.0.2.2', 'port': '8443',
+         'protocols': [{'id': 'TLS1_3', 'severity': 'OK', 'finding': 'offered with final'}]},
+        {'targetHost': 'bad.example.com', 'ip': '', 'port': '443',
+         'scanProblem': [{'id': 'scanProblem', 'severity': 'FATAL', 'finding': 'No IPv4/IPv6 address(es)'}]},
+    ],
+    'scanTime': 42
+}
+
+def test_results_are_matched_by_host_and_port():
+    """Each URL gets its own scanResult entry plus the run's top-level fields."""
+    results = split_batch_results(COMBINED, ['https://a.example.com/app', 'https://A.example.com:443/other',
+                                             'b.example.com:8443'])
+
+    assert results['https://a.example.com/app']['scanResult'][0]['ip'] == '192.0.2.1'
+    assert results['https://A.example.com:443/other'] == results['https://a.example.com/app']
+    assert results['b.example.com:8443']['scanResult'][0]['ip'] == '192.0.2.2'
+    assert results['b.example.com:8443']['version'] == '3.2'
+    assert evaluate_ssl_policy(results['https://a.example.com/app'])[0] == Severity.FAIL
+    assert evaluate_ssl_policy(results['b.example.com:8443'])[0] == Severity.PASS
+    print("✅ Batch results are split per URL")
+
+def test_per_target_failures():
+    """Missing and fatally failed targets become exceptions without affecting the others."""
+    results = split_batch_results(COMBINED, ['https://a.example.com', 'https://bad.example.com',
+                                             'https://missing.example.com', 'https://b.example.com'])
+
+    assert isinstance(results['https://a.example.com'], dict)
+    assert isinstance(results['https://bad.example.com'], RuntimeError)
+    assert 'No IPv4/IPv6' in str(results['https://bad.example.com'])
+    assert isinstance(results['https://missing.example.com'], RuntimeError)
+    assert isinstance(results['https://b.example.com'], RuntimeError)  # Scanned on port 8443 only
+    print("✅ Per-target failures are reported per URL")
+
+# Stand-in for testssl.sh --mode parallel --file: logs the command file's lines and reports each as scanned
+FAKE_TESTSSL = """#!{python}
+import json, os, sys
+args = sys.argv[1:]
+lines = [line.strip() for line in open(args[args.index('--file') + 1]) if line.strip()]
+with open(os.environ['FAKE_TESTSSL_LOG'], 'w') as log:
+    json.dump(lines, log)
+entries = []
+for line in lines:
+    host_port = line.split('://')[-1].split('/')[0]
+    host, _, port = host_port.partition(':')
+    entries.append({{'targetHost': host, 'ip': '192.0.2.1', 'port': port or '443',
+                     'protocols': [{{'id': 'TLS1_3', 'severity': 'OK', 'finding': 'offered with final'}}]}})
+with open(args[args.index('--jsonfile-pretty') + 1], 'w') as output:
+    json.dump({{'version': '3.2', 'scanResult': entries}}, output)
+"""
+
+def test_batch_targets_are_deduplicated():
+    """URLs on the same host:port are scanned once and each gets the result."""
+    assert batch_targets(['https://a.example.com/app', 'https://A.example.com:443/other', 'a.example.com.',
+                          'b.example.com:8443', 'https://a.example.com/app']) == \
+        ['https://a.example.com/app', 'b.example.com:8443']
+
+    directory = tempfile.mkdtemp()
+    script, log = os.path.join(directory, 'testssl.sh'), os.path.join(directory, 'targets.json')
+    with open(script, 'w') as f:
+        f.write(FAKE_TESTSSL.format(python=sys.executable))
+    os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+    os.environ['FAKE_TESTSSL_LOG'] = log
+    try:
+        urls = ['https://a.example.com/app', 'https://A.example.com/other', 'https://a.example.com/app',
+                'b.example.com:8443', 'not a url:port']
+        results = scanner.TestSSLScanner(testssl_path=script).scan_batch(urls)
+    finally:
+        del os.environ['FAKE_TESTSSL_LOG']
+
+    with open(log) as f:
+        assert json.load(f) == ['https://a.example.com/app', 'b.example.com:8443']
+    assert set(results) == set(urls)
+    assert results['https://A.example.com/other'] == results['https://a.example.com/app']
+    assert results['b.example.com:8443']['scanResult'][0]['port'] == '8443'
+    assert isinstance(results['not a url:port'], ValueError)
+    print("✅ Each host:port of a batch is scanned once")
+
+def test_split_section_results_are_merged():
+    """Sections of per-group runs end up in one scanResult entry, shared sections only once."""
+    pretest = [{'id': 'pre_128cipher', 'severity': 'INFO', 'finding': 'No 128 cipher limit bug'}]
+    runs = [
+        {'version': '3.2', 'scanTime': 20, 'scanResult': [{'targetHost': 'a.example.com', 'pretest': pretest,
+            'protocols': [{'id': 'TLS1_3', 'severity': 'OK', 'finding': 'offered with final'}]}]},
+        {'version': '3.2', 'scanTime': 95, 'scanResult': [{'targetHost': 'a.example.com', 'pretest': pretest,
+            'vulnerabilities': [{'id': 'heartbleed', 'severity': 'OK', 'finding': 'not vulnerable'}]}]},
+    ]
+    merged = merge_scan_results(runs)
+
+    assert len(merged['scanResult']) == 1
+    entry = merged['scanResult'][0]
+    assert entry['pretest'] == pretest
+    assert [item['id'] for item in entry['protocols']] == ['TLS1_3']
+    assert [item['id'] for item in entry['vulnerabilities']] == ['heartbleed']
+    assert merged['scanTime'] == 95
+    assert evaluate_ssl_policy(merged)[0] == Severity.PASS
+    print("✅ Split-section results are merged into one document")
+
+if __name__ == "__main__":
+    test_results_are_matched_by_host_and_port()
+    test_per_target_failures()
+    test_batch_targets_are_deduplicated()
+    test_split_section_results_are_merged()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Test the per-section storage and summary of detailed SSL info.
+"""
+import sys
+import os
+import json
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_rule_engine import build_full_scan_results
+from rule_engine import extract_detailed_ssl_info
+from scan_details import SECTIONS, SUMMARY, serialize_sections, summarize, decompress, content_encoding
+
+def full_details():
+    return vars(extract_detailed_ssl_info(build_full_scan_results()))
+
+def test_sections_round_trip():
+    """Every section and the summary are stored as compressed JSON on their own."""
+    details = full_details()
+    sections = serialize_sections(details)
+    assert set(sections) == set(SECTIONS) | {SUMMARY}
+    for section in SECTIONS:
+        assert json.loads(decompress(sections[section])) == details[section]
+        assert content_encoding(sections[section]) in ('deflate', 'zstd')
+    print("✅ Sections round-trip through compressed storage")
+
+def test_summary_keeps_what_the_summary_tab_reads():
+    """The summary drops per-cipher and client entries but keeps protocols, weak ciphers and the rating."""
+    details = full_details()
+    summary = summarize(details)
+
+    assert summary['protocol_info'] == details['protocol_info']
+    assert 'handshake_simulation' not in summary
+    assert 'cipherlist_STRONG_FS' in summary['cipher_info']
+    # Strong per-cipher entries are left to the Ciphers tab; RC4 still counts against the grade
+    ciphers = summary['cipher_info']
+    assert not any(key.startswith('cipher_x') and 'RC4' not in entry['finding'] for key, entry in ciphers.items())
+    assert any('RC4' in entry['finding'] for entry in ciphers.values())
+    assert {'overall_grade', 'final_score'} <= set(summary['misc_info'])
+    assert len(json.dumps(summary)) < len(json.dumps(details)) // 5
+    print("✅ The summary keeps what the Summary tab and grade read")
+
+if __name__ == "__main__":
+    test_sections_round_trip()
+    test_summary_keeps_what_the_summary_tab_reads()
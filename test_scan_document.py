@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Test that the indexed ScanDocument gives the same results as evaluating the raw testssl.sh JSON.
+"""
+import sys
+import os
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from rule_engine import (evaluate_ssl_policy, extract_detailed_ssl_info, extract_cipher_info,
+                         ScanDocument, CIPHER, MISC)
+from bench_rule_engine import build_full_scan_results
+
+def test_index_by_id_and_category():
+    """Entries are indexed by id and sections by category in a single pass."""
+    scan_results = build_full_scan_results()
+    document = ScanDocument.from_scan_results(scan_results)
+
+    assert document.entries('TLS1_3')[0]['finding'] == 'offered with final'
+    assert len(document.entries('heartbleed')) == 1
+    assert document.entries('no-such-id') == []
+
+    assert [section.key for section in document.category(CIPHER)] == ['ciphers', 'cipherTests']
+    assert 'protocols' not in [section.key for section in document.category(MISC)]
+    assert ScanDocument.of(document) is document
+    print("✅ ScanDocument indexes entries by id and sections by category")
+
+def test_document_and_raw_results_agree():
+    """Checks and extractors give identical output for raw JSON and a prebuilt ScanDocument."""
+    scan_results = {
+        "scanResult": [{
+            "protocols": [{"id": "TLS1", "severity": "LOW", "finding": "offered"}],
+            "cipher_strength": {"id": "cipher_rc4", "severity": "HIGH", "finding": "RC4 offered"},
+            "heartbleed": [{"id": "heartbleed", "severity": "OK", "finding": "not vulnerable"}],
+            "cert_validity": "62 days",
+        }]
+    }
+    document = ScanDocument.from_scan_results(scan_results)
+
+    status, findings, _ = evaluate_ssl_policy(scan_results)
+    status_from_document, findings_from_document, _ = evaluate_ssl_policy(document)
+    assert status.value == status_from_document.value == 'FAIL'
+    assert [f.name for f in findings] == [f.name for f in findings_from_document] == \
+        ['TLS1', 'cipher_rc4', 'TLS_1.3_NOT_ENABLED']
+
+    assert extract_detailed_ssl_info(scan_results) == extract_detailed_ssl_info(document)
+    assert extract_cipher_info(scan_results['scanResult'][0]) == extract_cipher_info(document)
+    print("✅ Raw results and ScanDocument give identical evaluations")
+
+if __name__ == "__main__":
+    test_index_by_id_and_category()
+    test_document_and_raw_results_agree()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test the per-host and per-network concurrency limits of parallel scans.
+"""
+import sys
+import os
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+from scan_limits import registrable_domain, limit_keys, FairScanQueue, pick_fair
+
+DEFAULT_CAPS = (Config.MAX_SCANS_PER_IP, Config.MAX_SCANS_PER_SUBNET, Config.MAX_SCANS_PER_DOMAIN)
+
+def set_caps(ip, subnet, domain):
+    Config.MAX_SCANS_PER_IP, Config.MAX_SCANS_PER_SUBNET, Config.MAX_SCANS_PER_DOMAIN = ip, subnet, domain
+
+def test_limit_keys():
+    """Targets are keyed by address, subnet and registrable domain."""
+    assert registrable_domain('a.b.example.com') == 'example.com'
+    assert registrable_domain('shop.example.co.uk') == 'example.co.uk'
+    assert registrable_domain('192.0.2.1') is None
+
+    assert limit_keys('a.example.com', ['192.0.2.10']) == {
+        'domain:example.com', 'ip:192.0.2.10', 'net:192.0.2.0/24'
+    }
+    assert limit_keys('2001:db8::1') == {'ip:2001:db8::1', 'net:2001:db8::/64'}
+    print("✅ Targets are keyed by address, subnet and registrable domain")
+
+def test_fair_queue_respects_caps():
+    """The queue hands out scans within the caps, serving networks round-robin."""
+    set_caps(1, 2, 0)
+    queue = FairScanQueue()
+    for i in range(4):
+        queue.put(f'big{i}', limit_keys(f'app{i}.big.example', [f'192.0.2.{i % 2}']))
+    queue.put('small', limit_keys('small.example', ['198.51.100.1']))
+
+    first, second, third = queue.get(), queue.get(), queue.get()
+    # The second network is served before the first gets its second scan
+    assert (first, second) == ('big0', 'small')
+    assert third == 'big1'
+
+    # 192.0.2.0/24 is at its cap of two until a scan finishes
+    queue.done(first)
+    assert queue.get() == 'big2'
+    set_caps(*DEFAULT_CAPS)
+    print("✅ Scans are handed out within the caps, networks round-robin")
+
+def test_pick_fair_prefers_idle_networks():
+    """Workers claim the oldest job whose network has the fewest running scans."""
+    set_caps(2, 4, 8)
+    busy = limit_keys('a.example.com', ['192.0.2.1'])
+    idle = limit_keys('b.example.org', ['198.51.100.1'])
+    running = {key: 2 for key in busy}
+    assert pick_fair([busy, idle], running) == 1
+
+    running = {'net:192.0.2.0/24': 1}
+    assert pick_fair([busy, idle], running) == 1
+    assert pick_fair([busy], running) == 0
+    assert pick_fair([busy], {key: 8 for key in busy}) is None
+    set_caps(*DEFAULT_CAPS)
+    print("✅ Idle networks are preferred and full ones skipped")
+
+if __name__ == "__main__":
+    test_limit_keys()
+    test_fair_queue_respects_caps()
+    test_pick_fair_prefers_idle_networks()
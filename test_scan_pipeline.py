@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Test the scan -> evaluate -> write stages of the scan pipeline with a fake scanner.
+"""
+import sys
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import reset_database
+from bench_rule_engine import build_full_scan_results
+from config import Config
+from api import app, db, Application, Finding, Scan, ScanDetails, ScanTarget
+import scan_pipeline
+import scan_profiles
+from scan_pipeline import ScanPipeline, ScanTask
+from scan_store import find_unchanged_scan
+from scanner import TargetUnreachable
+
+SCAN_RESULTS = build_full_scan_results()
+
+class FakeScanner:
+    """Reachable targets with the given fingerprints; records every stage event in events."""
+
+    def __init__(self, events, fingerprints=None):
+        self.events = events
+        self.fingerprints = fingerprints or {}
+        self.lock = threading.Lock()
+
+    def preflight(self, url, timeout=None):
+        pass
+
+    def supports_split(self):
+        return False
+
+    def probe_fingerprint(self, url, timeout=None):
+        fingerprint = self.fingerprints.get(url)
+        return {'hash': fingerprint, 'resolved_ips': []} if fingerprint else None
+
+    def scan_url(self, url, **kwargs):
+        with self.lock:
+            self.events.append(('scan', url))
+        return SCAN_RESULTS
+
+class UnreachableScanner(FakeScanner):
+    """Targets failing the pre-flight check."""
+
+    def preflight(self, url, timeout=None):
+        raise TargetUnreachable(f"TCP connect to {url} failed: connection refused")
+
+class SlowChecksScanner(FakeScanner):
+    """Targets whose pre-flight check takes a while; manual scans can be split."""
+
+    def preflight(self, url, timeout=None):
+        time.sleep(0.5)
+
+    def supports_split(self):
+        return True
+
+    def scan_url_split(self, url, **kwargs):
+        return self.scan_url(url, **kwargs)
+
+def create_tasks(count, events=None):
+    """An application per task, with on_finished recording the write in events."""
+    reset_database()
+    tasks = []
+    for i in range(1, count + 1):
+        application = Application(id=i, url=f'https://app{i}.example.com', name=f'App {i}')
+        db.session.add(application)
+        task = ScanTask(url=application.url, application_ids=[i], profile=scan_profiles.FAST)
+        if events is not None:
+            task.on_finished = lambda status, url=application.url: events.append(('write', url))
+        tasks.append(task)
+    db.session.commit()
+    return tasks
+
+def record_evaluations(events):
+    """Make the evaluate stage record each evaluation in events. Returns a function undoing it."""
+    evaluate = scan_pipeline.evaluate_scan_result
+
+    def recording(scan_results, checks=None):
+        events.append(('evaluate', None))
+        return evaluate(scan_results, checks)
+    scan_pipeline.evaluate_scan_result = recording
+    return lambda: setattr(scan_pipeline, 'evaluate_scan_result', evaluate)
+
+def run_with_timeout(pipeline, tasks, timeout=30):
+    """Run the tasks, failing instead of hanging if the pipeline never returns."""
+    outcome = {}
+    thread = threading.Thread(target=lambda: outcome.update(counts=pipeline.run_tasks(tasks)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "the pipeline did not finish"
+    return outcome['counts']
+
+def test_stages_run_in_order():
+    """Each result is scanned, then evaluated, then written; one scan thread writes in task order."""
+    events = []
+    undo = record_evaluations(events)
+    try:
+        with app.app_context():
+            tasks = create_tasks(5, events)
+        counts = run_with_timeout(ScanPipeline(FakeScanner(events), scan_workers=1, write_batch=2), tasks)
+    finally:
+        undo()
+
+    assert sum(counts.values()) == 5
+    urls = [task.url for task in tasks]
+    assert [url for stage, url in events if stage == 'write'] == urls
+    for url in urls:
+        assert events.index(('scan', url)) < events.index(('write', url))
+    # Every write is preceded by its own evaluation
+    stages = [stage for stage, _ in events]
+    for position, stage in enumerate(stages):
+        if stage == 'write':
+            assert stages[:position].count('evaluate') > stages[:position].count('write')
+    with app.app_context():
+        assert Scan.query.count() == 5
+    print("✅ Results go through scan, evaluate and write in order")
+
+def test_slow_writes_hold_back_scans():
+    """With full queues the scan threads wait for the write stage instead of buffering results."""
+    events = []
+    with app.app_context():
+        tasks = create_tasks(10)
+
+    release = threading.Event()
+    save = scan_pipeline.save_evaluated_scan
+
+    def slow_save(*args, **kwargs):
+        release.wait(30)
+        return save(*args, **kwargs)
+    scan_pipeline.save_evaluated_scan = slow_save
+    try:
+        pipeline = ScanPipeline(FakeScanner(events), scan_workers=1, queue_size=1, write_batch=1)
+        outcome = {}
+        thread = threading.Thread(target=lambda: outcome.update(counts=pipeline.run_tasks(tasks)), daemon=True)
+        thread.start()
+
+        # One result being written, one in each queue, one being evaluated and one waiting to be queued
+        deadline = time.time() + 10
+        while len(events) < 5 and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.3)
+        assert len(events) == 5, events
+    finally:
+        release.set()
+        scan_pipeline.save_evaluated_scan = save
+    thread.join(30)
+    assert not thread.is_alive()
+    assert sum(outcome['counts'].values()) == 10 and len(events) == 10
+    print("✅ Slow writes hold back the scan threads")
+
+def test_failing_on_scanned_callback_loses_nothing():
+    """A raising on_scanned callback neither drops the result nor blocks tasks with the same fingerprint."""
+    events = []
+    with app.app_context():
+        tasks = create_tasks(3)
+
+    def fail():
+        raise RuntimeError("callback failed")
+    for task in tasks:
+        task.on_scanned = fail
+    scanner = FakeScanner(events, fingerprints={task.url: 'same-fingerprint' for task in tasks})
+
+    skip = Config.FINGERPRINT_SKIP
+    Config.FINGERPRINT_SKIP = True
+    try:
+        counts = run_with_timeout(ScanPipeline(scanner, scan_workers=2), tasks)
+    finally:
+        Config.FINGERPRINT_SKIP = skip
+
+    assert sum(counts.values()) == 3
+    # The first scan ran testssl.sh; the others waited for it and carried it forward
+    assert len(events) == 1
+    with app.app_context():
+        assert Scan.query.count() == 3
+        assert Scan.query.filter(Scan.carried_from_scan_id.isnot(None)).count() == 2
+    print("✅ A failing on_scanned callback loses no result")
+
+def test_failed_save_rolls_back_only_its_scan():
+    """A scan of a write batch failing to save is rolled back alone; the others are committed."""
+    events = []
+    with app.app_context():
+        tasks = create_tasks(5)
+    pipeline = ScanPipeline(FakeScanner(events))
+    batch = [pipeline._scan(task) for task in tasks]
+    for result in batch:
+        result.evaluated = scan_pipeline.evaluate_scan_result(result.scan_results, result.checks)
+
+    save = scan_pipeline.save_evaluated_scan
+
+    def failing_save(application_id, *args, **kwargs):
+        scan = save(application_id, *args, **kwargs)  # Flushed, then lost with the failure
+        if application_id == 3:
+            raise RuntimeError("disk full")
+        return scan
+    scan_pipeline.save_evaluated_scan = failing_save
+    try:
+        assert pipeline._write_batch(batch) == ['FAIL'] * 5
+    finally:
+        scan_pipeline.save_evaluated_scan = save
+
+    with app.app_context():
+        for application in Application.query:
+            scans = Scan.query.filter_by(application_id=application.id).all()
+            assert len(scans) == 1 and application.latest_scan_id == scans[0].id
+            if application.id == 3:
+                # Only the failed scan recorded in its place
+                assert scans[0].policy_version is None
+                assert [finding.name for finding in Finding.query.filter_by(scan_id=scans[0].id)] == ['SCAN_ERROR']
+                assert db.session.get(ScanDetails, scans[0].id) is None
+            else:
+                assert scans[0].policy_version is not None
+                assert db.session.get(ScanDetails, scans[0].id) is not None
+    print("✅ A failed save rolls back only its own scan")
+
+def test_unchanged_targets_are_carried_forward():
+    """A fingerprint matching a recent full scan carries it forward; a change, full_scan or age rescans."""
+    events = []
+    with app.app_context():
+        create_tasks(1)
+    url = 'https://app1.example.com'
+    scanner = FakeScanner(events, fingerprints={url: 'fingerprint-1'})
+
+    def scan(full_scan=False):
+        task = ScanTask(url=url, application_ids=[1], profile=scan_profiles.FAST, full_scan=full_scan)
+        run_with_timeout(ScanPipeline(scanner), [task])
+        with app.app_context():
+            return db.session.get(Scan, db.session.get(Application, 1).latest_scan_id).carried_from_scan_id
+
+    skip, max_age = Config.FINGERPRINT_SKIP, Config.FINGERPRINT_MAX_AGE
+    Config.FINGERPRINT_SKIP = True
+    try:
+        assert scan() is None
+        with app.app_context():
+            source_id = db.session.get(Application, 1).latest_scan_id
+        assert scan() == source_id and len(events) == 1
+
+        # A changed certificate or cipher changes the fingerprint
+        scanner.fingerprints[url] = 'fingerprint-2'
+        assert scan() is None and len(events) == 2
+        assert scan() is not None and len(events) == 2
+        assert scan(full_scan=True) is None and len(events) == 3
+
+        with app.app_context():
+            full_id = db.session.get(Application, 1).latest_scan_id
+            # Another application behind the same fingerprint reuses it, a broader profile does not
+            db.session.add(Application(id=2, url='https://alias.example.com'))
+            db.session.commit()
+            assert find_unchanged_scan(2, 'fingerprint-2', scan_profiles.CERT).id == full_id
+            assert find_unchanged_scan(2, 'fingerprint-2', scan_profiles.FULL) is None
+            assert find_unchanged_scan(2, 'fingerprint-3', scan_profiles.CERT) is None
+
+        # Full scans older than FINGERPRINT_MAX_AGE are not carried forward
+        Config.FINGERPRINT_MAX_AGE = 0
+        assert scan() is None and len(events) == 4
+    finally:
+        Config.FINGERPRINT_SKIP, Config.FINGERPRINT_MAX_AGE = skip, max_age
+    print("✅ Unchanged targets are carried forward")
+
+def test_unreachable_targets_back_off():
+    """Failed pre-flight checks record UNREACHABLE scans and double the interval from the second failure on."""
+    events = []
+    with app.app_context():
+        reset_database()
+        interval = 3600
+        db.session.add_all([
+            ScanTarget(id=1, host='dead.example.com', port=443, sni='dead.example.com'),
+            Application(id=1, url='https://dead.example.com', scan_target_id=1, scan_interval=interval),
+            Application(id=2, url='https://dead.example.com/other', scan_target_id=1, scan_interval=interval),
+        ])
+        db.session.commit()
+
+    def scan(scanner):
+        task = ScanTask(url='https://dead.example.com', application_ids=[1, 2], profile=scan_profiles.FAST,
+                        target_id=1)
+        return run_with_timeout(ScanPipeline(scanner), [task])
+
+    before = datetime.utcnow()
+    assert scan(UnreachableScanner(events)) == {'UNREACHABLE': 1}
+    with app.app_context():
+        assert db.session.get(ScanTarget, 1).unreachable_count == 1
+        # The first failure keeps the interval
+        backed_off = before + timedelta(seconds=2 * interval)
+        assert all(application.next_scan_at is None or application.next_scan_at < backed_off
+                   for application in Application.query)
+
+    before = datetime.utcnow()
+    scan(UnreachableScanner(events))
+    with app.app_context():
+        target = db.session.get(ScanTarget, 1)
+        assert target.unreachable_count == 2 and target.unreachable_since is not None
+        for application in Application.query:
+            assert application.latest_status == 'UNREACHABLE'
+            assert application.next_scan_at >= before + timedelta(seconds=2 * interval)
+        assert Scan.query.filter_by(status='UNREACHABLE').count() == 4
+    assert events == []  # testssl.sh never ran
+
+    # Once the target answers again the count is reset
+    scan(FakeScanner(events))
+    with app.app_context():
+        target = db.session.get(ScanTarget, 1)
+        assert (target.unreachable_count, target.unreachable_since) == (0, None)
+    print("✅ Unreachable targets are recorded and backed off")
+
+def test_durations_cover_the_testssl_run_only():
+    """The stored start is when testssl.sh started; split manual scans are marked as such."""
+    events = []
+    with app.app_context():
+        tasks = create_tasks(2)
+    tasks[1].full_scan = True
+    split = Config.SPLIT_MANUAL_SCANS
+    Config.SPLIT_MANUAL_SCANS = True
+    try:
+        run_with_timeout(ScanPipeline(SlowChecksScanner(events)), tasks)
+    finally:
+        Config.SPLIT_MANUAL_SCANS = split
+
+    with app.app_context():
+        scheduled, manual = Scan.query.order_by(Scan.application_id)
+        assert (scheduled.completed_at - scheduled.started_at).total_seconds() < 0.5
+        assert (scheduled.split_scan, manual.split_scan) == (False, True)
+    print("✅ Scan durations cover the testssl.sh run only")
+
+def test_backends_without_split_scan_manual_scans_whole():
+    """A manual scan on a backend that cannot split it runs as one scan."""
+    events = []
+    with app.app_context():
+        tasks = create_tasks(1)
+    tasks[0].full_scan = True
+    assert run_with_timeout(ScanPipeline(FakeScanner(events)), tasks) == {'FAIL': 1}
+    assert events == [('scan', tasks[0].url)]
+    with app.app_context():
+        assert not Scan.query.one().split_scan
+    print("✅ Manual scans run whole on backends that cannot split them")
+
+if __name__ == "__main__":
+    test_stages_run_in_order()
+    test_slow_writes_hold_back_scans()
+    test_failing_on_scanned_callback_loses_nothing()
+    test_failed_save_rolls_back_only_its_scan()
+    test_unchanged_targets_are_carried_forward()
+    test_unreachable_targets_back_off()
+    test_durations_cover_the_testssl_run_only()
+    test_backends_without_split_scan_manual_scans_whole()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test scan scheduling and scan window planning: due targets, windows, lanes and queued plans.
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import reset_database
+from config import Config
+from api import app, db, Application, ScanJob, ScanTarget
+import job_queue
+import scan_profiles
+from scan_planner import plan_scans, plan_scan_window, window_bounds
+from scan_schedule import DueTarget, claim_due_targets
+
+START = datetime(2024, 1, 1, 0, 0)
+
+def due_targets(count):
+    return [DueTarget(target_id=i, url=f'https://app{i}.example.com', profile=scan_profiles.FAST,
+                      application_ids=[i]) for i in range(1, count + 1)]
+
+def test_window_bounds_cross_midnight():
+    """A window ending before it starts runs over midnight; outside it the next one is returned."""
+    day = datetime(2024, 1, 10)
+    assert window_bounds(day.replace(hour=23), '22:00-06:00') == (day.replace(hour=22), datetime(2024, 1, 11, 6))
+    assert window_bounds(day.replace(hour=3), '22:00-06:00') == (datetime(2024, 1, 9, 22), day.replace(hour=6))
+    assert window_bounds(day.replace(hour=12), '22:00-06:00') == (day.replace(hour=22), datetime(2024, 1, 11, 6))
+    assert window_bounds(day.replace(hour=6), '22:00-06:00') == (day.replace(hour=22), datetime(2024, 1, 11, 6))
+    assert window_bounds(day.replace(hour=7), '01:00-05:00') == (datetime(2024, 1, 11, 1), datetime(2024, 1, 11, 5))
+    assert window_bounds(day.replace(hour=2), '01:00-05:00') == (day.replace(hour=1), day.replace(hour=5))
+    print("✅ Windows across midnight are bounded correctly")
+
+def test_plan_balances_lanes_and_spreads_gaps():
+    """Longest scans go to the least loaded lane; each lane's idle time is split into equal gaps."""
+    durations = [600.0, 500.0, 400.0, 300.0, 200.0, 100.0]
+    deadline = START + timedelta(hours=1)
+    plan = plan_scans(due_targets(6), durations, START, deadline, concurrency=2)
+
+    assert len(plan) == 6
+    assert [planned.start for planned in plan] == sorted(planned.start for planned in plan)
+    assert all(START <= planned.start and planned.finish <= deadline for planned in plan)
+    for planned in plan:
+        assert (planned.finish - planned.start).total_seconds() == durations[planned.target.target_id - 1]
+
+    # Longest processing time first: lanes {600, 300, 200} (1100s) and {500, 400, 100} (1000s); each
+    # lane's idle time is split into three gaps and the second lane starts half a gap later
+    gap, gap2 = (3600 - 1100) / 3, (3600 - 1000) / 3
+    expected = {1: 0, 4: 600 + gap, 5: 900 + 2 * gap,
+                2: gap2 / 2, 3: gap2 / 2 + 500 + gap2, 6: gap2 / 2 + 900 + 2 * gap2}
+    for planned in plan:
+        assert abs((planned.start - START).total_seconds() - expected[planned.target.target_id]) < 1e-3
+
+    # Never more than concurrency scans at once
+    for planned in plan:
+        assert sum(1 for other in plan if other.start <= planned.start < other.finish) <= 2
+    print("✅ Lanes are balanced and gaps spread evenly")
+
+def test_plan_overflows_back_to_back():
+    """Work that does not fit runs back to back and finishes late, at most concurrency at a time."""
+    plan = plan_scans(due_targets(3), [3600.0] * 3, START, START + timedelta(hours=1), concurrency=2)
+    assert sum(1 for planned in plan if planned.start == START) == 2
+    assert max(planned.finish for planned in plan) == START + timedelta(hours=2)
+    print("✅ Overloaded windows run back to back")
+
+def create_target_applications():
+    """Target 1 with a due and a not-yet-due application, target 2 due but with its circuit open."""
+    reset_database()
+    now = datetime.utcnow()
+    open_until = now + timedelta(hours=1)
+    db.session.add_all([
+        ScanTarget(id=1, host='a.example.com', port=443, sni='a.example.com'),
+        ScanTarget(id=2, host='b.example.com', port=443, sni='b.example.com', circuit_open_until=open_until),
+        Application(id=1, url='https://a.example.com/one', scan_target_id=1, scan_profile=scan_profiles.FAST,
+                    scan_interval=3600, next_scan_at=now - timedelta(minutes=5)),
+        Application(id=2, url='https://a.example.com/two', scan_target_id=1, scan_profile=scan_profiles.CERT,
+                    scan_interval=7200, next_scan_at=now + timedelta(hours=1)),
+        Application(id=3, url='https://a.example.com/three', scan_target_id=1, scan_profile=scan_profiles.FULL,
+                    scan_interval=3600, next_scan_at=now + timedelta(hours=1)),
+        Application(id=4, url='https://b.example.com', scan_target_id=2, scan_profile=scan_profiles.FAST,
+                    scan_interval=3600, next_scan_at=now - timedelta(minutes=5)),
+    ])
+    db.session.commit()
+    return now, open_until
+
+def test_due_targets_are_grouped_and_open_circuits_skipped():
+    """Due applications are grouped per target and shared with covered siblings; open circuits wait."""
+    with app.app_context():
+        now, open_until = create_target_applications()
+        targets = claim_due_targets()
+
+        assert len(targets) == 1
+        target = targets[0]
+        assert (target.target_id, target.profile, target.url) == (1, scan_profiles.FAST, 'https://a.example.com/one')
+        # The cert sibling is covered by the fast scan; the full one is not
+        assert target.application_ids == [1, 2]
+        next_scans = {application.id: application.next_scan_at for application in Application.query}
+        assert next_scans[1] >= now + timedelta(seconds=3600) and next_scans[2] >= now + timedelta(seconds=7200)
+        assert next_scans[3] < now + timedelta(hours=2)
+        assert next_scans[4] == open_until
+
+        # Nothing is picked up twice
+        assert claim_due_targets() == []
+    print("✅ Due targets are grouped and open circuits skipped")
+
+def test_plan_moves_or_reports_existing_jobs():
+    """Queued planned jobs move to the new plan; jobs due sooner or running are left and not reported."""
+    window = Config.SCAN_WINDOW
+    Config.SCAN_WINDOW = '00:00-06:00'
+    try:
+        with app.app_context():
+            reset_database()
+            now = datetime.utcnow().replace(hour=1, minute=0, second=0, microsecond=0)
+            for i in range(1, 5):
+                db.session.add(Application(id=i, url=f'https://app{i}.example.com', scan_interval=24 * 3600,
+                                           last_scan_time=now - timedelta(days=1),
+                                           next_scan_at=now - timedelta(minutes=i)))
+            db.session.commit()
+
+            stale = job_queue.enqueue_scan(1, run_after=now - timedelta(days=1), planned_finish=now)
+            manual = job_queue.enqueue_scan(2, run_after=now - timedelta(minutes=1))
+            running = job_queue.enqueue_scan(3, run_after=now - timedelta(minutes=1))
+            running.status = job_queue.RUNNING
+            db.session.commit()
+
+            plan = plan_scan_window(now)
+            planned = {p.target.application_ids[0]: p for p in plan}
+            assert set(planned) == {1, 4}
+
+            stale = db.session.get(ScanJob, stale.id)
+            assert (stale.run_after, stale.planned_start, stale.planned_finish) == \
+                (planned[1].start, planned[1].start, planned[1].finish)
+            manual = db.session.get(ScanJob, manual.id)
+            assert manual.run_after == now - timedelta(minutes=1) and manual.planned_start is None
+            new = ScanJob.query.filter_by(application_id=4).one()
+            assert (new.run_after, new.planned_finish) == (planned[4].start, planned[4].finish)
+    finally:
+        Config.SCAN_WINDOW = window
+    print("✅ Existing jobs are moved to the plan or left out of it")
+
+if __name__ == "__main__":
+    test_window_bounds_cross_midnight()
+    test_plan_balances_lanes_and_spreads_gaps()
+    test_plan_overflows_back_to_back()
+    test_due_targets_are_grouped_and_open_circuits_skipped()
+    test_plan_moves_or_reports_existing_jobs()
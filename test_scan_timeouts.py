@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test adaptive scan timeouts from scan durations and the circuit breaker of targets that keep timing out.
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import reset_database
+from config import Config
+from api import app, db, Application, Scan, ScanTarget
+import scan_profiles
+from scan_store import scan_durations, scan_timeouts
+from targets import record_scan_timeout
+
+def create_target(durations, profile=scan_profiles.FAST, **scan_fields):
+    """Target 1 with application 1, and a finished scan of it per duration in seconds, newest last."""
+    reset_database()
+    db.session.add_all([ScanTarget(id=1, host='a.example.com', port=443, sni='a.example.com'),
+                        Application(id=1, url='https://a.example.com', scan_target_id=1)])
+    start = datetime.utcnow() - timedelta(days=1)
+    for i, duration in enumerate(durations):
+        started_at = start + timedelta(minutes=30 * i)
+        db.session.add(Scan(application_id=1, status='PASS', started_at=started_at, scan_profile=profile,
+                            completed_at=started_at + timedelta(seconds=duration), **scan_fields))
+    db.session.commit()
+
+def test_too_few_samples_get_the_default_timeout():
+    """Targets with fewer than SCAN_TIMEOUT_MIN_SAMPLES scans of the profile get SCAN_TIMEOUT."""
+    with app.app_context():
+        create_target([100] * (Config.SCAN_TIMEOUT_MIN_SAMPLES - 1))
+        assert scan_timeouts(1, 1, scan_profiles.FAST)['timeout'] == Config.SCAN_TIMEOUT
+        # Scans with another profile do not count
+        create_target([100] * Config.SCAN_TIMEOUT_MIN_SAMPLES, profile=scan_profiles.FULL)
+        assert scan_timeouts(1, 1, scan_profiles.FAST)['timeout'] == Config.SCAN_TIMEOUT
+        assert scan_timeouts(1, 1, scan_profiles.FULL)['timeout'] == 100 * Config.SCAN_TIMEOUT_FACTOR
+    print("✅ Targets without enough history get the default timeout")
+
+def test_timeouts_are_clamped():
+    """The p95 times SCAN_TIMEOUT_FACTOR is kept between SCAN_TIMEOUT_FLOOR and SCAN_TIMEOUT."""
+    with app.app_context():
+        create_target([200] * 18 + [300] * 2)  # The nearest-rank p95 of 20 samples is the 19th
+        timeouts = scan_timeouts(1, 1, scan_profiles.FAST)
+        assert timeouts['timeout'] == 300 * Config.SCAN_TIMEOUT_FACTOR
+        assert timeouts['openssl_timeout'] == min(timeouts['timeout'] // 10, Config.OPENSSL_TIMEOUT)
+
+        create_target([5, 6, 7])
+        timeouts = scan_timeouts(1, 1, scan_profiles.FAST)
+        assert timeouts['timeout'] == Config.SCAN_TIMEOUT_FLOOR
+        assert timeouts['openssl_timeout'] == Config.SCAN_TIMEOUT_FLOOR // 10
+
+        create_target([Config.SCAN_TIMEOUT] * 3)
+        assert scan_timeouts(1, 1, scan_profiles.FAST) == {'timeout': Config.SCAN_TIMEOUT,
+                                                           'openssl_timeout': Config.OPENSSL_TIMEOUT}
+    print("✅ Adaptive timeouts are clamped")
+
+def test_split_and_carried_scans_are_not_samples():
+    """Split manual scans and carried-forward copies record no duration of the profile."""
+    with app.app_context():
+        create_target([10, 20, 30])
+        source, split, carried = Scan.query.order_by(Scan.id)
+        split.split_scan = True
+        carried.carried_from_scan_id = source.id
+        db.session.commit()
+        assert scan_durations([1]) == {1: {scan_profiles.FAST: [10.0]}}
+    print("✅ Split and carried-forward scans are not duration samples")
+
+def test_circuit_breaker_opens_and_closes():
+    """CIRCUIT_BREAKER_THRESHOLD timeouts in a row open the circuit; a finished scan closes it."""
+    with app.app_context():
+        create_target([])
+        for _ in range(Config.CIRCUIT_BREAKER_THRESHOLD - 1):
+            assert record_scan_timeout(1, True) is None
+        before = datetime.utcnow()
+        open_until = record_scan_timeout(1, True)
+        assert open_until >= before + timedelta(seconds=Config.CIRCUIT_BREAKER_COOLDOWN)
+        db.session.commit()
+
+        target = db.session.get(ScanTarget, 1)
+        assert (target.timeout_count, target.circuit_open_until) == (Config.CIRCUIT_BREAKER_THRESHOLD, open_until)
+        # The first scan after the cool-down timing out as well reopens it
+        assert record_scan_timeout(1, True) >= open_until
+
+        assert record_scan_timeout(1, False) is None
+        db.session.commit()
+        target = db.session.get(ScanTarget, 1)
+        assert (target.timeout_count, target.circuit_open_until) == (0, None)
+    print("✅ The circuit breaker opens and closes")
+
+if __name__ == "__main__":
+    test_too_few_samples_get_the_default_timeout()
+    test_timeouts_are_clamped()
+    test_split_and_carried_scans_are_not_samples()
+    test_circuit_breaker_opens_and_closes()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Test the testssl.sh scanner against local servers and stub commands: the pre-flight check, the
+fingerprint probe, scan timeouts and split scans.
+"""
+import sys
+import os
+import asyncio
+import socket
+import ssl
+import stat
+import subprocess
+import tempfile
+import time
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import scanner
+from scanner import SPLIT_SCAN_GROUPS, TargetUnreachable
+from native_scanner import NativeTLSScanner
+
+# A fatal handshake_failure alert, as servers send when they share no cipher with the client
+HANDSHAKE_FAILURE_ALERT = b'\x15\x03\x03\x00\x02\x02\x28'
+
+def stub_scanner(script='#!/bin/sh\n'):
+    """A TestSSLScanner running the given script instead of testssl.sh."""
+    path = os.path.join(tempfile.mkdtemp(), 'testssl.sh')
+    with open(path, 'w') as f:
+        f.write(script)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return scanner.TestSSLScanner(testssl_path=path)
+
+def closed_port():
+    """A local port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+async def preflight_against(handle, timeout):
+    """Run the pre-flight check against a local server answering connections with handle."""
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        await stub_scanner().preflight_async(f'https://127.0.0.1:{port}', timeout=timeout)
+    finally:
+        server.close()
+        await server.wait_closed()
+
+def preflight_error(handle, timeout=0.5):
+    """The TargetUnreachable the pre-flight check raised against the server, or None."""
+    try:
+        asyncio.run(preflight_against(handle, timeout))
+    except TargetUnreachable as e:
+        return e
+    return None
+
+def test_preflight_refused_connection_is_unreachable():
+    """A refused TCP connection means the target is unreachable."""
+    try:
+        stub_scanner().preflight(f'https://127.0.0.1:{closed_port()}', timeout=2)
+    except TargetUnreachable as e:
+        assert 'failed' in str(e)
+    else:
+        assert False, "a refused connection passed the pre-flight check"
+    print("✅ Refused connections are unreachable")
+
+def test_preflight_silent_server_times_out():
+    """A server accepting the connection but never answering the ClientHello is unreachable."""
+    async def silent(reader, writer):
+        while await reader.read(1 << 16):  # Reads the ClientHello, then waits for the client to give up
+            pass
+        writer.close()
+
+    error = preflight_error(silent, timeout=0.3)
+    assert error is not None and 'did not answer the TLS ClientHello' in str(error)
+    print("✅ Silent servers time out")
+
+def test_preflight_handshake_answer_is_reachable():
+    """A server answering the ClientHello, even with a handshake failure alert or a reset, is reachable."""
+    async def alert(reader, writer):
+        await reader.read(1 << 16)
+        writer.write(HANDSHAKE_FAILURE_ALERT)
+        await writer.drain()
+        writer.close()
+
+    async def reset(reader, writer):
+        await reader.read(1 << 16)
+        writer.transport.abort()
+
+    assert preflight_error(alert) is None
+    assert preflight_error(reset) is None
+    print("✅ Servers answering the handshake are reachable")
+
+def fake_handshakes(server):
+    """A _handshake answering like a server with the given certificate, TLS 1.3 cipher and lowest protocol."""
+    legacy = {ssl.TLSVersion.TLSv1: 'TLSv1', ssl.TLSVersion.TLSv1_1: 'TLSv1.1', ssl.TLSVersion.TLSv1_2: 'TLSv1.2'}
+
+    def handshake(host, port, context, timeout):
+        if context.maximum_version in legacy:
+            version = legacy[context.maximum_version]
+            if version < server['min_protocol']:
+                raise ssl.SSLError(f"{version} is not accepted")
+            return version, 'ECDHE-RSA-AES128-GCM-SHA256', server['certificate']
+        return 'TLSv1.3', server['cipher'], server['certificate']
+    return handshake
+
+def probe(server):
+    """probe_fingerprint of a local URL with the handshakes answered like the server."""
+    handshake = scanner._handshake
+    scanner._handshake = fake_handshakes(server)
+    try:
+        return stub_scanner().probe_fingerprint('https://127.0.0.1:8443')
+    finally:
+        scanner._handshake = handshake
+
+def test_fingerprint_changes_with_the_tls_configuration():
+    """The same answers give the same hash; a new certificate, cipher or lowest protocol changes it."""
+    server = {'certificate': b'certificate', 'cipher': 'TLS_AES_256_GCM_SHA384', 'min_protocol': 'TLSv1.2'}
+    fingerprint = probe(server)
+    assert (fingerprint['ips'], fingerprint['max_protocol'], fingerprint['min_protocol']) == \
+        (['127.0.0.1'], 'TLSv1.3', 'TLSv1.2')
+    assert probe(dict(server))['hash'] == fingerprint['hash']
+
+    for change in ({'certificate': b'renewed certificate'}, {'cipher': 'TLS_CHACHA20_POLY1305_SHA256'},
+                   {'min_protocol': 'TLSv1'}):
+        assert probe(dict(server, **change))['hash'] != fingerprint['hash'], change
+    print("✅ Fingerprints change with the TLS configuration")
+
+# Stand-in for a testssl.sh run that hangs: records its process group, forks a child like openssl and sleeps
+HANGING_TESTSSL = """#!/bin/sh
+echo $$ > "$FAKE_TESTSSL_PGID"
+sleep 60 &
+sleep 60
+"""
+
+def process_group_alive(pgid):
+    """Whether a process of the group is still running (zombies waiting to be reaped by init are not)."""
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue  # Exited meanwhile
+        if int(fields[2]) == pgid and fields[0] != 'Z':
+            return True
+    return False
+
+def test_scan_timeout_kills_the_process_group():
+    """A scan running past its timeout raises TimeoutExpired and leaves no process of its group behind."""
+    pgid_file = os.path.join(tempfile.mkdtemp(), 'pgid')
+    os.environ['FAKE_TESTSSL_PGID'] = pgid_file
+    start = time.monotonic()
+    try:
+        asyncio.run(stub_scanner(HANGING_TESTSSL).scan_url_async('https://a.example.com', timeout=1))
+    except subprocess.TimeoutExpired as e:
+        assert e.timeout == 1
+    else:
+        assert False, "the hanging scan did not time out"
+    finally:
+        del os.environ['FAKE_TESTSSL_PGID']
+    assert time.monotonic() - start < 10
+
+    with open(pgid_file) as f:
+        pgid = int(f.read())
+    deadline = time.monotonic() + 5
+    while process_group_alive(pgid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not process_group_alive(pgid)
+    print("✅ Timed-out scans kill their process group")
+
+def test_split_scans_need_every_group():
+    """Only backends running every check group split scans; the groups stay within a default run."""
+    assert stub_scanner().supports_split()
+    assert not NativeTLSScanner().supports_split()
+    checks = [check for group in SPLIT_SCAN_GROUPS.values() for check in group]
+    assert len(checks) == len(set(checks))
+    assert '-E' not in checks  # Per-protocol cipher listing is not part of a default run
+    print("✅ Split scans need every check group")
+
+if __name__ == "__main__":
+    test_preflight_refused_connection_is_unreachable()
+    test_preflight_silent_server_times_out()
+    test_preflight_handshake_answer_is_reachable()
+    test_fingerprint_changes_with_the_tls_configuration()
+    test_scan_timeout_kills_the_process_group()
+    test_split_scans_need_every_group()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test scheduled scans: bounded concurrency and failures of single targets.
+"""
+import sys
+import os
+import threading
+import time
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import reset_database
+from bench_rule_engine import build_full_scan_results
+from api import app, db, Application, Finding, Scan
+from scheduler import SSLScanScheduler
+
+SCAN_RESULTS = build_full_scan_results()
+
+class CountingScanner:
+    """Scans taking a moment each, counting how many run at once; scans of failing_url raise."""
+
+    def __init__(self, failing_url):
+        self.failing_url = failing_url
+        self.running = 0
+        self.most_running = 0
+        self.scanned = []
+        self.lock = threading.Lock()
+
+    def preflight(self, url, timeout=None):
+        pass
+
+    def supports_split(self):
+        return False
+
+    def probe_fingerprint(self, url, timeout=None):
+        return None
+
+    def scan_url(self, url, **kwargs):
+        with self.lock:
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        try:
+            time.sleep(0.2)
+            if url == self.failing_url:
+                raise RuntimeError("testssl.sh exited with code 1")
+            return SCAN_RESULTS
+        finally:
+            with self.lock:
+                self.running -= 1
+                self.scanned.append(url)
+
+def test_scans_run_on_a_bounded_pool_and_failures_stay_isolated():
+    """No more than max_workers scans run at once, and one failing target does not stop the others."""
+    with app.app_context():
+        reset_database()
+        for i in range(1, 9):
+            db.session.add(Application(id=i, url=f'https://app{i}.example.com'))
+        db.session.commit()
+
+    scanner = CountingScanner(failing_url='https://app3.example.com')
+    SSLScanScheduler(max_workers=3, scanner=scanner).scan_all_applications()
+
+    assert len(scanner.scanned) == 8
+    assert 1 < scanner.most_running <= 3
+    with app.app_context():
+        for application in Application.query:
+            scan = db.session.get(Scan, application.latest_scan_id)
+            errors = Finding.query.filter_by(scan_id=scan.id, name='SCAN_ERROR').count()
+            if application.id == 3:
+                assert scan.status == 'FAIL' and errors == 1
+            else:
+                assert scan.policy_version is not None and errors == 0
+    print("✅ Scans run on a bounded pool and a failure stays with its target")
+
+if __name__ == "__main__":
+    test_scans_run_on_a_bounded_pool_and_failures_stay_isolated()
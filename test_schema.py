@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test upgrading a database created by the original schema on start-up.
+"""
+import sys
+import os
+import json
+
+# Add the current directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import reset_database
+from sqlalchemy import inspect, text
+
+from config import Config
+from api import app, db, Application, Scan, ScanDetails
+from schema import upgrade_database, upgrade_schema
+from scan_details import load_section
+
+DETAILED_SSL_INFO = {'protocol_info': {'TLS1': {'severity': 'LOW', 'finding': 'offered (deprecated)'}},
+                     'misc_info': {'overall_grade': {'severity': 'INFO', 'finding': 'B'}}}
+
+# The tables as the first release created them
+BASELINE_SCHEMA = (
+    """CREATE TABLE applications (
+        id INTEGER NOT NULL PRIMARY KEY,
+        url VARCHAR(255) NOT NULL UNIQUE,
+        name VARCHAR(255),
+        created_at DATETIME,
+        updated_at DATETIME
+    )""",
+    """CREATE TABLE scans (
+        id INTEGER NOT NULL PRIMARY KEY,
+        application_id INTEGER NOT NULL REFERENCES applications (id),
+        status VARCHAR(10) NOT NULL,
+        started_at DATETIME NOT NULL,
+        completed_at DATETIME,
+        raw_output_path VARCHAR(500),
+        detailed_ssl_info TEXT
+    )""",
+    """CREATE TABLE findings (
+        id INTEGER NOT NULL PRIMARY KEY,
+        scan_id INTEGER NOT NULL REFERENCES scans (id),
+        category VARCHAR(50) NOT NULL,
+        severity VARCHAR(10) NOT NULL,
+        name VARCHAR(100) NOT NULL,
+        description TEXT,
+        details TEXT
+    )""",
+)
+
+def create_baseline_database():
+    """A database with the original tables, one application and two scans of it."""
+    reset_database()
+    db.drop_all()
+    for statement in BASELINE_SCHEMA:
+        db.session.execute(text(statement))
+    db.session.execute(text("INSERT INTO applications (id, url, name) VALUES (1, 'https://a.example.com', 'A')"))
+    db.session.execute(text(
+        "INSERT INTO scans (id, application_id, status, started_at, completed_at) VALUES "
+        "(1, 1, 'PASS', '2024-01-01 00:00:00', '2024-01-01 00:01:00'), "
+        "(2, 1, 'FAIL', '2024-01-02 00:00:00', '2024-01-02 00:01:00')"
+    ))
+    db.session.execute(text("UPDATE scans SET detailed_ssl_info = :info WHERE id = 2"),
+                       {'info': json.dumps(DETAILED_SSL_INFO)})
+    db.session.execute(text(
+        "INSERT INTO findings (scan_id, category, severity, name) VALUES "
+        "(2, 'protocol', 'FAIL', 'TLS1'), (2, 'cipher', 'WARN', 'CBC')"
+    ))
+    db.session.commit()
+
+def test_startup_upgrades_baseline_database():
+    """Start-up adds the new columns and indexes and fills them for existing applications."""
+    with app.app_context():
+        create_baseline_database()
+        upgrade_database()
+
+        columns = {column['name'] for column in inspect(db.engine).get_columns('applications')}
+        assert {'latest_scan_id', 'latest_status', 'latest_status_rank', 'last_scan_time'} <= columns
+        indexes = {index['name'] for index in inspect(db.engine).get_indexes('applications')}
+        assert 'ix_applications_status_rank_id' in indexes
+
+        columns = {column['name'] for column in inspect(db.engine).get_columns('scans')}
+        assert {'policy_version', 'fingerprint', 'carried_from_scan_id', 'scan_profile', 'scan_checks'} <= columns
+        # Details moved to scan_details
+        assert 'detailed_ssl_info' not in columns
+        scan = db.session.get(Scan, 2)
+        assert load_section(scan, 'protocol_info') == DETAILED_SSL_INFO['protocol_info']
+        assert load_section(scan, 'summary')['misc_info'] == DETAILED_SSL_INFO['misc_info']
+        assert load_section(db.session.get(Scan, 1), 'protocol_info') == {}
+
+        application = db.session.get(Application, 1)
+        assert application.scan_target.host == 'a.example.com'
+        assert (application.scan_profile, application.scan_interval) == (Config.DEFAULT_SCAN_PROFILE, Config.DEFAULT_SCAN_INTERVAL)
+        assert (application.latest_scan_id, application.latest_status, application.latest_issue_count) == (2, 'FAIL', 2)
+        assert application.latest_status_rank == 0
+
+        # A second start finds nothing left to add
+        assert upgrade_schema() == 0
+    print("✅ Start-up upgrades a database created by the original schema")
+
+def test_malformed_legacy_details_do_not_stop_the_upgrade():
+    """Scans whose detailed_ssl_info is not a JSON object get empty sections; the others are moved."""
+    with app.app_context():
+        create_baseline_database()
+        db.session.execute(text(
+            "INSERT INTO scans (id, application_id, status, started_at, detailed_ssl_info) VALUES "
+            "(3, 1, 'PASS', '2024-01-03 00:00:00', '{\"protocol_info\": '), "
+            "(4, 1, 'PASS', '2024-01-04 00:00:00', '[1, 2]')"
+        ))
+        db.session.commit()
+        upgrade_database()
+
+        assert 'detailed_ssl_info' not in {column['name'] for column in inspect(db.engine).get_columns('scans')}
+        assert load_section(db.session.get(Scan, 2), 'protocol_info') == DETAILED_SSL_INFO['protocol_info']
+        for scan_id in (3, 4):
+            assert db.session.get(ScanDetails, scan_id) is not None
+            assert load_section(db.session.get(Scan, scan_id), 'protocol_info') == {}
+            assert load_section(db.session.get(Scan, scan_id), 'summary') == {}
+    print("✅ Malformed legacy details do not stop the upgrade")
+
+def test_new_database_needs_no_upgrade():
+    """Tables created by create_all already have every column."""
+    with app.app_context():
+        reset_database()
+        assert upgrade_schema() == 0
+    print("✅ A new database needs no upgrade")
+
+if __name__ == "__main__":
+    test_startup_upgrades_baseline_database()
+    test_malformed_legacy_details_do_not_stop_the_upgrade()
+    test_new_database_needs_no_upgrade()
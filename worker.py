@@ -0,0 +1,158 @@
+"""
+Scan worker that executes jobs from the persistent scan job queue.
+
+Each worker process runs a fixed number of scan threads; each thread claims
+a job and scans the application, and the result is evaluated and saved by
+the shared scan pipeline (see scan_pipeline.py), which completes the job.
+Run as many worker processes (on as many nodes) as needed - they coordinate
+only through the scan_jobs table.
+"""
+
+import logging
+import os
+import signal
+import socket
+import threading
+from typing import Optional
+
+from config import Config
+from scanner import TestSSLScanner
+from api import app, db, Application
+from scan_pipeline import ScanPipeline, ScanTask, task_for_application
+import job_queue
+
+logger = logging.getLogger(__name__)
+
+
+class ScanWorker:
+    """
+    Claims and runs scan jobs until stopped.
+    """
+
+    def __init__(self, concurrency=None, scanner=None):
+        """
+        Args:
+            concurrency: Number of jobs run in parallel (defaults to Config.WORKER_CONCURRENCY)
+            scanner: Scanner to use (defaults to a TestSSLScanner)
+        """
+        self.concurrency = concurrency or Config.WORKER_CONCURRENCY
+        self.scanner = scanner or TestSSLScanner()
+        self.worker_name = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+
+    def start(self):
+        """Run worker threads until stop() is called or SIGTERM/SIGINT is received."""
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        signal.signal(signal.SIGINT, lambda signum, frame: self.stop())
+
+        for thread in self.start_background():
+            thread.join()
+        logger.info(f"Scan worker {self.worker_name} stopped")
+
+    def start_background(self):
+        """
+        Start the worker's scan pipeline without waiting for it or
+        installing signal handlers, e.g. to run queued jobs inside another
+        process.
+
+        Returns:
+            The started threads
+        """
+        logger.info(f"Starting scan worker {self.worker_name} with {self.concurrency} threads")
+        thread = threading.Thread(
+            target=lambda: ScanPipeline(self.scanner, scan_workers=self.concurrency).run(self._next_task),
+            name='scan-worker', daemon=True
+        )
+        thread.start()
+        return [thread]
+
+    def stop(self):
+        """Stop claiming new jobs; running jobs are finished first."""
+        logger.info("Stopping scan worker after running jobs finish")
+        self._stop.set()
+
+    def _next_task(self, index):
+        """Pipeline source of scan thread index: its next claimed job, None once stopped."""
+        worker_id = f"{self.worker_name}:{index}"
+        while not self._stop.is_set():
+            try:
+                task = self.claim_task(worker_id)
+                if task:
+                    return task
+            except Exception as e:
+                logger.error(f"Worker {worker_id} error: {str(e)}")
+
+            self._stop.wait(Config.JOB_POLL_INTERVAL)
+        return None
+
+    def run_next_job(self, worker_id):
+        """
+        Reclaim stale jobs, then claim and run the next runnable job.
+
+        Returns:
+            True if a job was run, False if the queue had nothing runnable
+        """
+        return self._run_task(self.claim_task(worker_id))
+
+    def run_job(self, job_id, worker_id):
+        """
+        Claim and run a specific queued job, e.g. the one a manual scan request queued.
+
+        Returns:
+            True if the job was run, False if it was no longer queued (e.g. another worker claimed it)
+        """
+        return self._run_task(self.claim_task(worker_id, job_id=job_id))
+
+    def _run_task(self, task):
+        if not task:
+            return False
+        ScanPipeline(self.scanner).run_tasks([task])
+        return True
+
+    def claim_task(self, worker_id, job_id=None) -> Optional[ScanTask]:
+        """
+        Reclaim stale jobs, then claim the next runnable job (or the given
+        one) as a pipeline task, which completes or fails the job. The
+        result is also saved for every other application sharing the scan
+        target. The job's heartbeat runs until the result is saved.
+
+        Returns:
+            The task, or None if the queue had nothing runnable (or the job was not claimable)
+        """
+        with app.app_context():
+            reclaimed = job_queue.reclaim_stale_jobs()
+            if reclaimed:
+                logger.warning(f"Reclaimed {reclaimed} stale scan jobs")
+
+            while True:
+                job = job_queue.claim_job(job_id, worker_id) if job_id else job_queue.claim_next_job(worker_id)
+                if not job:
+                    return None
+                application = db.session.get(Application, job.application_id)
+                if application:
+                    break
+                job_queue.fail_job(job, f'Application {job.application_id} not found')
+                if job_id:
+                    return None
+
+            task = task_for_application(application, job.scan_profile, full_scan=job.full_scan, job_id=job.id,
+                                        worker_id=worker_id)
+            db.session.commit()  # Don't hold a transaction open for the length of the scan
+            logger.info(f"Job {job.id}: scanning {task.url} (attempt {job.attempts}/{job.max_attempts})")
+
+        stop_heartbeat = threading.Event()
+        threading.Thread(
+            target=self._heartbeat_loop, args=(task.job_id, worker_id, stop_heartbeat), daemon=True
+        ).start()
+        task.on_finished = lambda status: stop_heartbeat.set()
+        return task
+
+    def _heartbeat_loop(self, job_id, worker_id, stop_event):
+        while not stop_event.wait(Config.JOB_HEARTBEAT_INTERVAL):
+            try:
+                with app.app_context():
+                    if not job_queue.heartbeat(job_id, worker_id):
+                        logger.warning(f"Job {job_id} is no longer held by {worker_id}")
+                        return
+            except Exception as e:
+                logger.error(f"Heartbeat for job {job_id} failed: {str(e)}")